@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# 游标分页时下一页游标放在响应头中，列表接口的响应体保持为数组
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Any, row_id: UUID) -> str:
+    """把 (排序键, id) 编码为不透明游标"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, str(row_id)], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, datetime_key: bool = False) -> Tuple[Any, UUID]:
+    """解析游标，格式错误时返回 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if datetime_key:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, UUID(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_after(sort_column, id_column, cursor: Tuple[Any, UUID], descending: bool = False):
+    """(sort, id) 严格位于游标之后的条件，与 ORDER BY sort, id 同向"""
+    sort_value, row_id = cursor
+    if descending:
+        return or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id))
+
+
+def select_columns(
+    fields: Optional[str],
+    available: Dict[str, Any],
+    summary: Sequence[str],
+    required: Sequence[str] = ("id",),
+    default: str = "all",
+) -> List[Any]:
+    """
+    解析 fields= 参数为需要查询的列
+
+    - 不传：按 default（all 或 summary）
+    - all：全部列
+    - summary：预定义的摘要列
+    - 逗号分隔的列名：只查询这些列（required 中的列总是包含，用于生成游标）
+    """
+    fields = fields or default
+    if fields == "all":
+        names = list(available)
+    elif fields == "summary":
+        names = list(summary)
+    else:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    for name in reversed(required):
+        if name not in names:
+            names.insert(0, name)
+    return [available[name].label(name) for name in names]
@@ -1,83 +1,151 @@
-from fastapi import APIRouter, UploadFile, File, Depends
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional, AsyncIterator
+from tempfile import SpooledTemporaryFile
 import json
 
 from app.api.deps import verify_admin_token
+from app.core.config import get_settings
+from app.services.har_parser import CHUNK_SIZE, HarParseError, HarRequestFilter
+from app.services.har_correlation import CorrelationIndex, IGNORED_REQUEST_HEADERS
 
 router = APIRouter()
 
+# 请求体上传时，超过该大小的部分写入临时文件
+SPOOL_MAX_SIZE = 1024 * 1024
+
+async def _open_upload(request: Request) -> UploadFile:
+    """
+    取得上传的 HAR：multipart 表单中的 file 字段，或直接以请求体上传
+
+    两种方式都落到 SpooledTemporaryFile（超过 1MB 写入磁盘），不会把整个文件读入内存。
+    StreamingResponse 开始后不能再读取请求体，所以需要在返回响应前完成。
+    """
+    if request.headers.get('content-type', '').startswith('multipart/form-data'):
+        form = await request.form()
+        upload = form.get('file')
+        if upload is None or isinstance(upload, str):
+            await form.close()
+            raise HTTPException(status_code=400, detail="Missing file field")
+        return upload
+
+    upload = UploadFile(SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE), filename='upload.har')
+    async for chunk in request.stream():
+        await upload.write(chunk)
+    await upload.seek(0)
+    return upload
+
+
+async def _iter_requests(upload: UploadFile) -> AsyncIterator[List[Dict[str, Any]]]:
+    """分块读取并增量解析、过滤，解析在线程池中进行，不阻塞事件循环"""
+    settings = get_settings()
+    parser = HarRequestFilter(settings.har_max_entry_bytes, settings.har_max_response_bytes)
+    while chunk := await upload.read(CHUNK_SIZE):
+        entries = await run_in_threadpool(parser.feed, chunk)
+        if entries:
+            yield entries
+    yield await run_in_threadpool(parser.close)
+
+
+async def _ndjson_stream(upload: UploadFile) -> AsyncIterator[bytes]:
+    """NDJSON 输出：每个请求一行，解析失败时以 {"error": ...} 行结束"""
+    try:
+        async for entries in _iter_requests(upload):
+            if entries:
+                yield ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries).encode('utf-8')
+    except HarParseError as e:
+        yield (json.dumps({'error': str(e)}, ensure_ascii=False) + '\n').encode('utf-8')
+    finally:
+        await upload.close()
+
+
 @router.post("/har/parse")
 async def parse_har(
-    file: UploadFile = File(...),
+    request: Request,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
     _: bool = Depends(verify_admin_token)
 ):
-    """解析 HAR 文件，返回请求列表"""
-    content = await file.read()
-    har_data = json.loads(content)
-
-    entries = har_data.get('log', {}).get('entries', [])
-
-    # 过滤静态资源和埋点
-    static_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp',
-                        '.css', '.js', '.map', '.woff', '.woff2', '.ttf']
-    analytics_domains = ['google-analytics', 'googletagmanager', 'doubleclick',
-                        'sentry', 'datadog']
-
-    filtered_entries = []
-    for entry in entries:
-        url = entry['request']['url']
-
-        # 跳过静态资源
-        if any(url.endswith(ext) for ext in static_extensions):
-            continue
-
-        # 跳过埋点域名
-        if any(domain in url for domain in analytics_domains):
-            continue
-
-        filtered_entries.append({
-            'url': url,
-            'method': entry['request']['method'],
-            'status': entry['response']['status'],
-            'headers': {h['name']: h['value'] for h in entry['request']['headers']},
-            'postData': entry['request'].get('postData', {}).get('text'),
-            'time': entry['time']
-        })
-
-    return {'entries': filtered_entries}
+    """
+    解析 HAR 文件，返回请求列表
+
+    支持 multipart（file 字段）或直接上传请求体，内容分块增量解析。
+    format=ndjson 时边解析边流式返回，否则返回 offset / limit 指定的一页及总数。
+    """
+    upload = await _open_upload(request)
+
+    if format == "ndjson":
+        return StreamingResponse(_ndjson_stream(upload), media_type="application/x-ndjson")
+
+    page = []
+    total = 0
+    try:
+        async for entries in _iter_requests(upload):
+            for entry in entries:
+                if total >= offset and (limit is None or len(page) < limit):
+                    page.append(entry)
+                total += 1
+    except HarParseError as e:
+        raise HTTPException(status_code=400, detail=f"HAR 解析失败: {e}")
+    finally:
+        await upload.close()
+
+    return {'entries': page, 'total': total, 'offset': offset, 'limit': limit}
+
+# 生成 Flow 时总是保留的请求头
+KEY_HEADERS = ('accept', 'content-type', 'authorization', 'cookie')
 
 @router.post("/har/generate-flow")
 async def generate_flow(
     selected_entries: List[Dict[str, Any]],
     _: bool = Depends(verify_admin_token)
 ):
-    """从选中的请求生成 Flow 配置"""
+    """
+    从选中的请求生成 Flow 配置
+
+    请求中出现的、来自之前响应的值会替换为 ${var}，并在产生该值的步骤上生成 extract 规则
+    """
+    return await run_in_threadpool(_build_flow, selected_entries)
+
+def _build_flow(selected_entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    index = CorrelationIndex()
     flow_steps = []
 
     for idx, entry in enumerate(selected_entries):
         step = {
             'name': f'step_{idx + 1}',
             'method': entry['method'],
-            'url': entry['url'],
+            'url': index.substitute(entry['url'], idx),
             'headers': {}
         }
 
-        # 提取关键 headers
+        # 提取关键 headers，以及值来自之前响应的 headers（如 x-csrf-token）
         raw_headers = entry.get('headers', {})
-        # 转为小写 key 方便匹配
-        headers_lower = {k.lower(): v for k, v in raw_headers.items()}
-        
-        for key in ['accept', 'content-type', 'authorization', 'cookie']:
-            if key in headers_lower:
-                step['headers'][key] = headers_lower[key]
+        for name, value in raw_headers.items():
+            key = name.lower()
+            if key in IGNORED_REQUEST_HEADERS and key not in KEY_HEADERS:
+                continue
+            if key.startswith(':') or not isinstance(value, str):
+                continue
+            substituted = value if key == 'cookie' else index.substitute(value, idx)
+            if key in KEY_HEADERS or substituted != value:
+                step['headers'][key] = substituted
 
         # 提取 body
         if entry.get('postData'):
             try:
-                step['body'] = json.loads(entry['postData'])
-            except:
-                step['body'] = entry['postData']
+                step['body'] = index.substitute_value(json.loads(entry['postData']), idx)
+            except ValueError:
+                step['body'] = index.substitute(entry['postData'], idx)
 
         flow_steps.append(step)
+        index.add_response(idx, entry.get('responseHeaders'), entry.get('responseBody'))
+
+    for idx, step in enumerate(flow_steps):
+        rules = index.extract_rules(idx)
+        if rules:
+            step['extract'] = rules
 
-    return {'flow': flow_steps}
+    return {'flow': flow_steps, 'correlations': index.correlations}
@@ -1,29 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import Optional
 from uuid import UUID
 
 from app.db.models import Run
 from app.schemas.site import RunResponse
 from app.api.deps import get_db, verify_admin_token
+from app.api.pagination import (
+    NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_after, select_columns,
+)
+from app.services.run_store import load_run_steps
 
 router = APIRouter()
 
-@router.get("/sites/{site_id}/runs", response_model=List[RunResponse])
+# 列表只查询摘要列，不加载步骤详情
+RUN_SUMMARY_COLUMNS = (
+    Run.id, Run.site_id, Run.status, Run.started_at,
+    Run.finished_at, Run.summary, Run.auth_failed,
+)
+RUN_COLUMNS = {column.name: column for column in RUN_SUMMARY_COLUMNS}
+
+@router.get("/sites/{site_id}/runs")
 async def list_site_runs(
     site_id: UUID,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     _: bool = Depends(verify_admin_token)
 ):
-    """获取站点的执行记录"""
-    result = await db.execute(
-        select(Run)
+    """获取站点的执行记录（按 started_at, id 倒序游标分页）"""
+    columns = select_columns(fields, RUN_COLUMNS, list(RUN_COLUMNS), required=('id', 'started_at'))
+    # 走 runs(site_id, started_at DESC, id DESC) 复合索引
+    query = (
+        select(*columns)
         .where(Run.site_id == site_id)
-        .order_by(Run.started_at.desc())
-        .limit(50)
+        .order_by(Run.started_at.desc(), Run.id.desc())
+        .limit(limit + 1)
     )
-    runs = result.scalars().all()
+    if cursor:
+        query = query.where(
+            keyset_after(Run.started_at, Run.id, decode_cursor(cursor, datetime_key=True), descending=True)
+        )
+
+    runs = [dict(row) for row in (await db.execute(query)).mappings().all()]
+    if len(runs) > limit:
+        runs = runs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(runs[-1]['started_at'], runs[-1]['id'])
+
     return runs
 
 @router.get("/runs/{run_id}", response_model=RunResponse)
@@ -39,4 +65,9 @@ async def get_run(
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
 
-    return run
+    response = RunResponse.model_validate(run)
+    # 新记录的步骤存储在 run_steps 中，旧记录仍使用 Run.steps
+    if run.steps is None:
+        response.steps = await load_run_steps(db, run.id)
+
+    return response
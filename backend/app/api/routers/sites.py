@@ -1,26 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 from uuid import UUID
+from datetime import datetime
 
 from app.db.models import Site
 from app.schemas.site import SiteCreate, SiteUpdate, SiteResponse
 from app.api.deps import get_db, verify_admin_token
-from app.services.worker import Worker
+from app.api.pagination import (
+    NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_after, select_columns,
+)
+from app.services.dispatcher import dispatcher
 from app.services.scheduler import scheduler
+from app.services.flow_plan import flow_plan_cache
+from app.services.credential_manager import get_credential_manager
+from app.services.site_cache import site_cache
+from app.services.session_store import clear_session
 
 router = APIRouter()
-worker = Worker()
 
-@router.get("/sites", response_model=List[SiteResponse])
+# 可通过 fields= 选择的列；summary 不包含 auth / flow / schedule 等大字段
+SITE_COLUMNS = {
+    column.name: column for column in (
+        Site.id, Site.name, Site.enabled, Site.paused, Site.tags, Site.base_url,
+        Site.auth, Site.flow, Site.schedule, Site.last_run_at, Site.next_run_at,
+        Site.last_run_status, Site.created_at, Site.updated_at,
+    )
+}
+SITE_SUMMARY_FIELDS = (
+    'id', 'name', 'enabled', 'paused', 'tags', 'base_url',
+    'last_run_at', 'next_run_at', 'last_run_status', 'created_at', 'updated_at',
+)
+
+@router.get("/sites")
 async def list_sites(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     _: bool = Depends(verify_admin_token)
 ):
-    """获取所有站点"""
-    result = await db.execute(select(Site))
-    sites = result.scalars().all()
+    """
+    获取站点列表（按 name, id 游标分页，每页最多 limit 条，还有下一页时返回 X-Next-Cursor）
+
+    默认只返回摘要列，fields=all 返回全部列，也可以用逗号分隔指定列
+    """
+    columns = select_columns(fields, SITE_COLUMNS, SITE_SUMMARY_FIELDS, required=('id', 'name'), default='summary')
+    # 多取一条判断是否还有下一页
+    query = select(*columns).order_by(Site.name, Site.id).limit(limit + 1)
+
+    if cursor:
+        query = query.where(keyset_after(Site.name, Site.id, decode_cursor(cursor)))
+
+    sites = [dict(row) for row in (await db.execute(query)).mappings().all()]
+    if len(sites) > limit:
+        sites = sites[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sites[-1]['name'], sites[-1]['id'])
+
     return sites
 
 @router.post("/sites", response_model=SiteResponse)
@@ -37,6 +75,7 @@ async def create_site(
 
     # 调度站点
     scheduler.schedule_site(site)
+    site_cache.put(site.id, site.name)
 
     return site
 
@@ -69,13 +108,25 @@ async def update_site(
     if not site:
         raise HTTPException(status_code=404, detail="Site not found")
 
+    update_data = site_data.model_dump(exclude_unset=True)
+
+    # auth 变更时丢弃旧凭证的解密缓存和用旧凭证登录的会话
+    if 'auth' in update_data and update_data['auth'] != site.auth:
+        get_credential_manager().invalidate(site.auth)
+        await clear_session(db, site_id)
+
     # 更新字段
-    for key, value in site_data.model_dump(exclude_unset=True).items():
+    for key, value in update_data.items():
         setattr(site, key, value)
+    site.updated_at = datetime.utcnow()
 
     await db.commit()
     await db.refresh(site)
 
+    # 使预编译的 FlowPlan 和站点元数据缓存失效
+    flow_plan_cache.invalidate(site_id)
+    site_cache.invalidate(site_id)
+
     # 重新调度
     scheduler.schedule_site(site)
 
@@ -96,6 +147,10 @@ async def delete_site(
 
     # 取消调度
     scheduler.unschedule_site(site_id)
+    flow_plan_cache.invalidate(site_id)
+    site_cache.invalidate(site_id)
+    get_credential_manager().invalidate(site.auth)
+    await clear_session(db, site_id)
 
     await db.delete(site)
     await db.commit()
@@ -109,7 +164,8 @@ async def run_site_now(
     _: bool = Depends(verify_admin_token)
 ):
     """立即执行站点任务"""
-    result = await worker.run_site(site_id, trigger='manual')
+    # 手动运行走高优先级通道，排在定时任务之前
+    result = await dispatcher.submit(site_id, trigger='manual')
     return result
 
 @router.post("/sites/{site_id}/pause")
@@ -126,6 +182,7 @@ async def pause_site(
         raise HTTPException(status_code=404, detail="Site not found")
 
     site.paused = True
+    site.updated_at = datetime.utcnow()
     await db.commit()
 
     scheduler.unschedule_site(site_id)
@@ -146,8 +203,21 @@ async def resume_site(
         raise HTTPException(status_code=404, detail="Site not found")
 
     site.paused = False
+    site.updated_at = datetime.utcnow()
     await db.commit()
 
     scheduler.schedule_site(site)
 
     return {"message": "Site resumed"}
+
+@router.delete("/sites/{site_id}/session")
+async def clear_site_session(
+    site_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_admin_token)
+):
+    """清除站点保存的会话，下次运行重新登录"""
+    await clear_session(db, site_id)
+    await db.commit()
+
+    return {"message": "Site session cleared"}
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from typing import List
+from sqlalchemy import case, select, func
+from typing import List, Optional
+from datetime import date, datetime, time, timedelta
 
-from app.db.models import Site, Run
+from app.db.models import Site, Run, SiteDailyStats
 from app.api.deps import get_db, verify_admin_token
+from app.services.coordination import replica_id
+from app.services.credential_manager import get_credential_manager
+from app.api.pagination import decode_cursor, encode_cursor, keyset_after
 from app.services.scheduler import scheduler
+from app.services.dispatcher import dispatcher
+from app.services.host_guard import host_guard
+from app.services.run_writer import run_writer
+from app.services.site_cache import site_cache
 from app.core.config import get_settings
 
 router = APIRouter()
@@ -27,89 +35,276 @@ async def get_system_status(
         select(func.count(Site.id)).where(Site.paused == True)
     )
     
-    # 调度器状态
-    jobs = scheduler.scheduler.get_jobs()
+    # 近 7 日（含今天）运行统计：已汇总的日期取 site_daily_stats，尚未汇总的日期（至少包括今天）
+    # 与保留任务的汇总口径一致，直接统计已结束的 runs
+    since = date.today() - timedelta(days=6)
+    last_rolled = (await db.execute(select(func.max(SiteDailyStats.day)))).scalar()
+    live_since = max(since, last_rolled + timedelta(days=1)) if last_rolled else since
+
+    daily = await db.execute(
+        select(func.sum(SiteDailyStats.total), func.sum(SiteDailyStats.success))
+        .where(SiteDailyStats.day >= since, SiteDailyStats.day < live_since)
+    )
+    rolled_total, rolled_success = daily.one()
+    live = await db.execute(
+        select(func.count(Run.id), func.sum(case((Run.status == 'SUCCESS', 1), else_=0)))
+        .where(Run.started_at >= datetime.combine(live_since, time.min), Run.status != 'RUNNING')
+    )
+    live_total, live_success = live.one()
+    run_total = (rolled_total or 0) + (live_total or 0)
+    run_success = (rolled_success or 0) + (live_success or 0)
     
     return {
         "scheduler": {
-            "running": scheduler.scheduler.running,
-            "jobCount": len(jobs)
+            "running": scheduler.running,
+            "jobCount": scheduler.job_count(),
+            "leader": scheduler.is_leader,
+            "replica": replica_id()
         },
         "sites": {
             "total": total_sites.scalar() or 0,
             "enabled": enabled_sites.scalar() or 0,
             "paused": paused_sites.scalar() or 0
         },
+        "runs": {
+            "days": 7,
+            "total": run_total,
+            "success": run_success,
+            "successRate": round(run_success / run_total, 4) if run_total else None
+        },
         "config": {
             "webhookConfigured": bool(settings.webhook_url)
         },
         "version": "1.0.0"
     }
 
+@router.get("/system/stats/daily")
+async def get_daily_stats(
+    days: int = 30,
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_admin_token)
+):
+    """按日汇总的运行统计（全部站点）"""
+    result = await db.execute(
+        select(
+            SiteDailyStats.day,
+            func.sum(SiteDailyStats.total),
+            func.sum(SiteDailyStats.success),
+            func.sum(SiteDailyStats.failed),
+            func.sum(SiteDailyStats.skipped),
+            func.sum(SiteDailyStats.auth_failed),
+            func.max(SiteDailyStats.p95_ms),
+        )
+        .where(SiteDailyStats.day >= date.today() - timedelta(days=days))
+        .group_by(SiteDailyStats.day)
+        .order_by(SiteDailyStats.day)
+    )
+
+    stats = []
+    for day, total, success, failed, skipped, auth_failed, p95_ms in result.all():
+        stats.append({
+            "day": day.isoformat(),
+            "total": total,
+            "success": success,
+            "failed": failed,
+            "skipped": skipped,
+            "authFailed": auth_failed,
+            "successRate": round(success / total, 4) if total else None,
+            "maxP95Ms": p95_ms
+        })
+
+    return {"days": stats}
+
+@router.post("/system/retention/run")
+async def trigger_retention(
+    _: bool = Depends(verify_admin_token)
+):
+    """立即执行一次运行记录保留 / 汇总任务"""
+    from app.services.retention import run_retention
+
+    return await run_retention()
+
 @router.get("/system/jobs")
 async def get_scheduled_jobs(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    q: Optional[str] = None,
+    due_before: Optional[datetime] = None,
     db: AsyncSession = Depends(get_db),
     _: bool = Depends(verify_admin_token)
 ):
-    """获取当前调度任务列表"""
-    from uuid import UUID as PyUUID
-    
-    jobs = scheduler.scheduler.get_jobs()
-    
-    job_list = []
-    for job in jobs:
-        # 从 job_id 提取 site_id
-        site_id_str = job.id.replace("site_", "")
-        
-        try:
-            site_uuid = PyUUID(site_id_str)
-            # 查询站点名称
-            result = await db.execute(select(Site.name).where(Site.id == site_uuid))
-            site_name = result.scalar()
-        except:
-            site_name = "Unknown"
-        
-        job_list.append({
-            "id": job.id,
-            "siteId": site_id_str,
-            "siteName": site_name or "Unknown",
-            "nextRunTime": job.next_run_time.isoformat() if job.next_run_time else None
-        })
-    
-    # 按下次执行时间排序
-    job_list.sort(key=lambda x: x["nextRunTime"] or "")
-    
-    return {"jobs": job_list}
+    """获取当前调度任务列表（分页，可按站点名称 / 执行时间过滤）"""
+    jobs = scheduler.list_site_jobs()
+
+    if due_before is not None:
+        if due_before.tzinfo is None:
+            due_before = due_before.astimezone()
+        jobs = [job for job in jobs if job[2] is not None and job[2] <= due_before]
+
+    # 按下次执行时间排序（无执行时间的排在最前，与原有行为一致）
+    jobs.sort(key=lambda job: (job[2] is not None, job[2].timestamp() if job[2] else 0))
+
+    if q:
+        # 按名称过滤需要全部站点名称，批量查询并缓存
+        names = await site_cache.get_names(db, [job[0] for job in jobs])
+        keyword = q.lower()
+        jobs = [job for job in jobs if keyword in (names.get(job[0]) or "").lower()]
+        page = jobs[offset:offset + limit]
+    else:
+        page = jobs[offset:offset + limit]
+        names = await site_cache.get_names(db, [job[0] for job in page])
+
+    job_list = [
+        {
+            "id": job_id,
+            "siteId": str(site_id),
+            "siteName": names.get(site_id) or "Unknown",
+            "nextRunTime": next_run_time.isoformat() if next_run_time else None
+        }
+        for site_id, job_id, next_run_time in page
+    ]
+
+    return {"jobs": job_list, "total": len(jobs), "offset": offset, "limit": limit}
+
+@router.get("/system/schedule/histogram")
+async def get_schedule_histogram(
+    bucket_minutes: int = Query(5, ge=1, le=1440),
+    hours: int = Query(24, ge=1, le=168),
+    host: Optional[str] = None,
+    _: bool = Depends(verify_admin_token)
+):
+    """按时间桶统计已计划的任务数（可按目标主机过滤），用于观察负载曲线"""
+    now = datetime.now().astimezone()
+    start = now.replace(second=0, microsecond=0)
+    start -= timedelta(minutes=start.minute % bucket_minutes)
+    bucket_seconds = bucket_minutes * 60
+    bucket_count = -(-hours * 60 // bucket_minutes)
+    counts = [0] * bucket_count
+
+    for site_id, _job_id, next_run_time in scheduler.list_site_jobs():
+        if next_run_time is None:
+            continue
+        if host is not None and scheduler.placer.host_of(site_id) != host.lower():
+            continue
+        idx = int((next_run_time - start).total_seconds() // bucket_seconds)
+        if 0 <= idx < bucket_count:
+            counts[idx] += 1
+
+    buckets = [
+        {"start": (start + timedelta(seconds=i * bucket_seconds)).isoformat(), "count": count}
+        for i, count in enumerate(counts)
+    ]
+
+    return {
+        "bucketMinutes": bucket_minutes,
+        "buckets": buckets,
+        "total": sum(counts),
+        "peak": max(counts) if counts else 0,
+    }
+
+@router.get("/system/hosts")
+async def get_host_states(
+    _: bool = Depends(verify_admin_token)
+):
+    """各目标主机的熔断状态"""
+    return {"hosts": host_guard.stats()}
+
+@router.get("/system/credentials/expiring")
+async def get_expiring_credentials(
+    within_hours: Optional[int] = Query(None, ge=0, le=24 * 365),
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_admin_token)
+):
+    """列出 JWT 凭证已过期或将在 within_hours 小时内过期的站点（只解码 exp，不校验签名）"""
+    import time
+
+    hours = get_settings().credential_expiry_warning_hours if within_hours is None else within_hours
+    now = time.time()
+    horizon = now + hours * 3600
+    manager = get_credential_manager()
+
+    result = await db.execute(select(Site.id, Site.name, Site.enabled, Site.paused, Site.auth))
+    credentials = []
+    for site_id, name, enabled, paused, auth in result.all():
+        expires_at = manager.token_expires_at(auth)
+        if expires_at is None or expires_at > horizon:
+            continue
+        credentials.append((expires_at, {
+            "siteId": str(site_id),
+            "siteName": name,
+            "enabled": enabled,
+            "paused": paused,
+            "expiresAt": datetime.fromtimestamp(expires_at).astimezone().isoformat(),
+            "expired": expires_at <= now,
+            "remainingSeconds": max(int(expires_at - now), 0)
+        }))
+
+    # 最早过期的排在前面
+    credentials.sort(key=lambda item: item[0])
+    return {"withinHours": hours, "credentials": [item for _, item in credentials]}
+
+@router.get("/system/dispatcher")
+async def get_dispatcher_stats(
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(verify_admin_token)
+):
+    """获取分发器队列深度、等待时间和拒绝数"""
+    from app.db.models import RunQueueItem
+
+    stats = dispatcher.stats()
+
+    # 多进程模式下的持久化队列状态
+    result = await db.execute(
+        select(RunQueueItem.status, func.count(RunQueueItem.id))
+        .group_by(RunQueueItem.status)
+    )
+    stats['runQueue'] = {status: count for status, count in result.all()}
+    stats['runWriter'] = run_writer.stats()
+    stats['executionMode'] = get_settings().execution_mode
+
+    return stats
 
 @router.get("/system/runs/recent")
 async def get_recent_runs(
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     _: bool = Depends(verify_admin_token)
 ):
-    """获取最近执行记录"""
-    result = await db.execute(
-        select(Run, Site.name.label("site_name"))
+    """获取最近执行记录（只查询摘要列，按 started_at, id 倒序游标分页）"""
+    query = (
+        select(
+            Run.id, Run.site_id, Site.name, Run.status,
+            Run.started_at, Run.finished_at, Run.summary,
+        )
         .join(Site, Run.site_id == Site.id)
-        .order_by(Run.started_at.desc())
-        .limit(limit)
+        .order_by(Run.started_at.desc(), Run.id.desc())
+        .limit(limit + 1)
     )
-    
+    if cursor:
+        query = query.where(
+            keyset_after(Run.started_at, Run.id, decode_cursor(cursor, datetime_key=True), descending=True)
+        )
+
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].started_at, rows[-1].id)
+
     runs = []
-    for row in result.all():
-        run = row[0]
-        site_name = row[1]
+    for run_id, site_id, site_name, status, started_at, finished_at, summary in rows:
         runs.append({
-            "id": str(run.id),
-            "siteId": str(run.site_id),
+            "id": str(run_id),
+            "siteId": str(site_id),
             "siteName": site_name,
-            "status": run.status,
-            "startedAt": run.started_at.isoformat() if run.started_at else None,
-            "finishedAt": run.finished_at.isoformat() if run.finished_at else None,
-            "summary": run.summary
+            "status": status,
+            "startedAt": started_at.isoformat() if started_at else None,
+            "finishedAt": finished_at.isoformat() if finished_at else None,
+            "summary": summary
         })
-    
-    return {"runs": runs}
+
+    return {"runs": runs, "nextCursor": next_cursor}
 
 @router.post("/system/webhook/test")
 async def test_webhook(
@@ -8,6 +8,125 @@ class Settings(BaseSettings):
     database_url: str = "sqlite+aiosqlite:///./data/checkinhub.db"
     cors_origins: str = "*"  # 生产环境应设置为具体域名，逗号分隔
 
+    # SQLite 生产参数（WAL + synchronous=NORMAL 等，连接建立时应用）
+    sqlite_tuned: bool = True
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64000  # 负数表示 KiB，约 64 MB
+
+    # Write-behind：把并发运行的结果合并成批量事务写入
+    run_writer_enabled: bool = False
+    run_writer_batch_size: int = 200
+    run_writer_flush_interval_ms: int = 50
+
+    # 出站 HTTP 连接池
+    http_proxy: str = ""  # 为空时遵循 HTTP(S)_PROXY 环境变量
+    http_pool_http2: bool = False  # 需要安装 h2
+    http_pool_max_connections_per_host: int = 20
+    http_pool_max_keepalive_per_host: int = 10
+    http_pool_keepalive_expiry: float = 60.0
+    http_pool_idle_seconds: float = 600.0  # host 空闲超过该时间后关闭其 transport
+    http_pool_sweep_interval: float = 60.0
+
+    # 运行分发器
+    dispatcher_concurrency: int = 20  # 同时执行的运行数上限
+    dispatcher_queue_size: int = 5000  # 定时任务排队上限，超出则拒绝
+
+    # 执行模式：inline 在 API 进程内执行；queue 只写入 run_queue，由 worker 进程执行
+    execution_mode: str = "inline"
+    run_queue_lease_seconds: int = 120
+    run_queue_poll_interval: float = 1.0
+    run_queue_max_attempts: int = 3
+
+    # 单主机令牌桶限流（进程内所有站点共享）：每秒请求数、突发容量、最多排队等待秒数；rate 为 0 时不限流
+    host_rate_per_second: float = 10
+    host_burst: int = 20
+    host_max_wait_seconds: float = 10
+    # 单主机熔断：连续失败 / 超时达到该次数后打开，open_seconds 后放行一个探测请求
+    host_breaker_failures: int = 5
+    host_breaker_open_seconds: float = 60
+    # 单主机重试预算：每个请求存入 ratio 个重试令牌、每次重试取出一个，最多累积 burst 个
+    host_retry_ratio: float = 0.2
+    host_retry_burst: int = 10
+    # 因熔断 / 长退避结束的定时运行由调度器稍后重跑的最多次数
+    circuit_retry_max: int = 3
+
+    # 预编译 FlowPlan 缓存（按站点数设置）
+    flow_plan_cache_size: int = 4096
+
+    # 单步响应体读取上限（可被步骤的 maxBodyBytes 覆盖）
+    flow_max_body_bytes: int = 1024 * 1024
+
+    # 步骤未配置 timeoutMs 时的超时（毫秒）；单次运行的总时长上限（秒，0 为不限制），后续步骤共享剩余时间
+    flow_step_timeout_ms: int = 30000
+    flow_run_deadline_seconds: float = 300
+
+    # 步骤未配置 retry 时的重试策略：最多尝试次数、指数退避的基数和上限（毫秒，全抖动）
+    flow_retry_max_attempts: int = 3
+    flow_retry_backoff_ms: int = 500
+    flow_retry_max_backoff_ms: int = 30000
+    # 退避不超过该秒数时在运行内等待；更长的退避结束本次运行，由调度器稍后重跑，不占执行槽位
+    flow_retry_inline_max_seconds: float = 2
+
+    # 声明了 dependsOn 的 flow 中单次运行最多同时执行的步骤数
+    flow_max_parallel_steps: int = 4
+    # forEach 步骤默认的元素并发数和单次最多处理的元素数
+    flow_foreach_concurrency: int = 5
+    flow_foreach_max_items: int = 500
+
+    # HAR 解析时单个 entry 的大小上限
+    har_max_entry_bytes: int = 64 * 1024 * 1024
+    # 解析结果中附带的 JSON 响应体上限（用于生成 Flow 时自动关联变量，0 为不附带）
+    har_max_response_bytes: int = 64 * 1024
+
+    # 解密凭证缓存（ttl 为 0 时不缓存）
+    credential_cache_ttl_seconds: int = 6 * 3600
+    credential_cache_size: int = 10000
+    credential_prewarm_interval_minutes: int = 10  # 每隔多久预解密即将执行的站点
+    # JWT 过期预检：exp 早于 当前时间 + skew 秒的 token 不发请求直接判定认证失败；
+    # /system/credentials/expiring 默认列出该小时数内过期的 token
+    credential_expiry_skew_seconds: int = 30
+    credential_expiry_warning_hours: int = 72
+
+    # 站点会话（cookie 和登录步骤提取的变量）加密保存，下次运行复用；会话最长复用秒数
+    session_store_enabled: bool = True
+    session_max_age_seconds: int = 7 * 86400
+
+    # 运行记录保留策略：detail_days 内保留步骤详情，summary_days 内保留 Run 摘要，
+    # 更早的只保留 site_daily_stats 日汇总
+    retention_enabled: bool = True
+    retention_detail_days: int = 14
+    retention_summary_days: int = 90
+    retention_batch_size: int = 500
+    retention_vacuum_pages: int = 2000
+    retention_hour: int = 3
+    retention_minute: int = 30
+
+    # 站点调度后端：apscheduler（每站点一个任务）、heap（紧凑的最小堆，适合大量站点）
+    # 或 db（轮询 sites.next_run_at 索引的到期队列，多个进程可共享）
+    scheduler_backend: str = "apscheduler"
+    # heap / db 模式启动时分页加载站点的页大小
+    scheduler_load_page_size: int = 2000
+    # 启动时 next_run_at 已过期但在该秒数内的站点立即补跑，更早的视为错过并重新计算
+    scheduler_misfire_grace_seconds: int = 3600
+    # db 模式轮询到期站点的间隔（秒）和每次最多取出的站点数
+    scheduler_poll_interval_seconds: float = 5
+    scheduler_poll_batch_size: int = 500
+
+    # 多副本协调：none（单进程）、lease（数据库租约行选主）或 file（单机文件锁选主）。
+    # 只有 leader 调度站点并运行保留任务；db 调度后端本身可多副本共享，不受影响
+    scheduler_coordination: str = "none"
+    scheduler_lease_seconds: int = 30
+    scheduler_lock_file: str = "./data/scheduler.lock"
+    replica_id: str = ""  # 为空时使用 主机名:进程号
+
+    # dailyAfter 负载均衡放置：槽位长度、未配置 randomDelaySeconds 时的默认放置窗口、
+    # 全局和单主机每分钟最多开始的任务数
+    schedule_slot_seconds: int = 10
+    schedule_default_window_seconds: int = 600
+    schedule_global_rate_per_minute: int = 60
+    schedule_host_rate_per_minute: int = 6
+
     class Config:
         env_file = ".env"
 
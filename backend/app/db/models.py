@@ -1,6 +1,7 @@
-from sqlmodel import SQLModel, Field, Column, JSON
+from sqlmodel import SQLModel, Field, Column, JSON, LargeBinary
+from sqlalchemy import Index
 from typing import Optional, Any
-from datetime import datetime
+from datetime import datetime, date
 from uuid import UUID, uuid4
 
 class Site(SQLModel, table=True):
@@ -33,6 +34,22 @@ class Run(SQLModel, table=True):
     steps: Optional[Any] = Field(default=None, sa_column=Column(JSON))
     auth_failed: bool = Field(default=False)
 
+# 站点执行记录列表按 (site_id, started_at DESC, id DESC) 游标分页，无需额外排序
+Index("ix_runs_site_id_started_at", Run.site_id, Run.started_at.desc(), Run.id.desc())
+
+class RunStep(SQLModel, table=True):
+    __tablename__ = "run_steps"
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    run_id: UUID = Field(foreign_key="runs.id", index=True)
+    idx: int
+    name: Optional[str] = None
+    status: str
+    status_code: Optional[int] = None
+    elapsed_ms: Optional[float] = None
+    # 其余字段（headers / response / error 等）压缩后的 JSON
+    payload: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))
+
 class Secret(SQLModel, table=True):
     __tablename__ = "secrets"
 
@@ -42,3 +59,45 @@ class Secret(SQLModel, table=True):
     ciphertext: str
     nonce: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RunQueueItem(SQLModel, table=True):
+    __tablename__ = "run_queue"
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    site_id: UUID = Field(foreign_key="sites.id", index=True)
+    trigger: str = Field(default='scheduled')
+    priority: int = Field(default=10)
+    status: str = Field(default='PENDING', index=True)  # PENDING / LEASED / DONE / FAILED
+    enqueued_at: datetime = Field(default_factory=datetime.utcnow)
+    available_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = Field(default=None, index=True)
+    attempts: int = Field(default=0)
+    run_id: Optional[UUID] = None
+    error: Optional[str] = None
+    finished_at: Optional[datetime] = None
+
+class SchedulerLease(SQLModel, table=True):
+    __tablename__ = "scheduler_leases"
+
+    # 租约名（如 scheduler-leader），同一时刻只有一个持有者
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: datetime
+    acquired_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SiteDailyStats(SQLModel, table=True):
+    __tablename__ = "site_daily_stats"
+
+    site_id: UUID = Field(primary_key=True)
+    day: date = Field(primary_key=True, index=True)
+    total: int = Field(default=0)
+    success: int = Field(default=0)
+    failed: int = Field(default=0)
+    skipped: int = Field(default=0)
+    auth_failed: int = Field(default=0)
+    # 运行耗时（毫秒）
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,5 +1,6 @@
 from sqlmodel import create_engine, Session, SQLModel
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
 import os
@@ -9,20 +10,63 @@ settings = get_settings()
 # Ensure data directory exists
 os.makedirs("./data", exist_ok=True)
 
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """每个新连接上应用生产环境 SQLite 参数"""
+    settings = get_settings()
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def build_engine(database_url: str) -> AsyncEngine:
+    """创建异步 engine（SQLite 时按配置启用 WAL 等参数）"""
+    settings = get_settings()
+    async_engine = create_async_engine(
+        database_url,
+        echo=False,
+        connect_args={"check_same_thread": False}
+    )
+    if async_engine.dialect.name == 'sqlite' and settings.sqlite_tuned:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return async_engine
+
 # Async engine for aiosqlite
-engine = create_async_engine(
-    settings.database_url,
-    echo=False,
-    connect_args={"check_same_thread": False}
-)
+engine = build_engine(settings.database_url)
 
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+def _create_missing_indexes(sync_conn):
+    """create_all 不会给已存在的表补建索引，这里逐个补齐"""
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+async def _enable_incremental_vacuum(conn):
+    """
+    新建的数据库文件启用 auto_vacuum=INCREMENTAL，使保留任务可以做增量 VACUUM
+
+    连接钩子已切换到 WAL，设置后需要 VACUUM 才会生效；只在还没有表时执行，已有数据的库保持不变
+    """
+    mode = (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar()
+    tables = (await conn.exec_driver_sql("SELECT count(*) FROM sqlite_master WHERE type = 'table'")).scalar()
+    if mode == 0 and not tables:
+        await conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        await conn.exec_driver_sql("VACUUM")
+
 async def init_db():
+    if engine.dialect.name == 'sqlite':
+        # VACUUM 不能在事务中执行，使用自动提交连接
+        async with engine.connect() as conn:
+            await _enable_incremental_vacuum(await conn.execution_options(isolation_level="AUTOCOMMIT"))
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
 
 async def get_session() -> AsyncSession:
     async with async_session() as session:
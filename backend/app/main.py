@@ -4,14 +4,23 @@ from contextlib import asynccontextmanager
 
 from app.db.session import init_db
 from app.services.scheduler import scheduler
+from app.services.http_pool import http_pool
+from app.services.dispatcher import dispatcher
+from app.services.run_writer import run_writer
 from app.core.config import get_settings
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    if get_settings().run_writer_enabled:
+        await run_writer.start()
+    await dispatcher.start()
     await scheduler.start()
     yield
     await scheduler.stop()
+    await dispatcher.stop()
+    await run_writer.stop()
+    await http_pool.aclose()
 
 app = FastAPI(title="CheckinHub", lifespan=lifespan)
 
@@ -25,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 from app.api.routers import health, sites, runs, har, system
@@ -0,0 +1,214 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import get_settings
+from app.db.models import SchedulerLease
+
+LEADER_LEASE = 'scheduler-leader'
+
+
+def replica_id() -> str:
+    """当前副本的标识"""
+    return get_settings().replica_id or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class DbLease:
+    """
+    数据库租约行
+
+    持有者在过期前续租；过期后任何副本都可以用带条件的 UPDATE 抢占，
+    同时抢占时只有一个 rowcount == 1。适合多主机共享同一个数据库。
+    """
+
+    def __init__(self, name: str, holder: str, ttl_seconds: int):
+        self.name = name
+        self.holder = holder
+        self.ttl_seconds = ttl_seconds
+
+    async def acquire(self) -> bool:
+        """获取或续租，返回当前是否持有租约"""
+        from app.db.session import async_session
+
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+
+        async with async_session() as session:
+            result = await session.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now),
+                )
+                .values(holder=self.holder, expires_at=expires_at)
+            )
+            await session.commit()
+            if result.rowcount == 1:
+                return True
+
+            # 租约行不存在时插入；主键冲突说明被其他副本持有
+            session.add(SchedulerLease(name=self.name, holder=self.holder, expires_at=expires_at))
+            try:
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                return False
+            return True
+
+    async def release(self):
+        """主动让出租约（置为已过期），其他副本下一次尝试即可接管"""
+        from app.db.session import async_session
+
+        async with async_session() as session:
+            await session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder)
+                .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+            )
+            await session.commit()
+
+
+class FileLease:
+    """
+    单机文件锁（fcntl.flock）
+
+    同一主机上的多个进程共享一个锁文件，进程退出时锁由内核自动释放
+    """
+
+    def __init__(self, path: str, holder: str):
+        self.path = path
+        self.holder = holder
+        self._fd: Optional[int] = None
+
+    async def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+
+        import fcntl
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        # 记录持有者，便于排查
+        os.ftruncate(fd, 0)
+        os.write(fd, self.holder.encode('utf-8'))
+        self._fd = fd
+        return True
+
+    async def release(self):
+        if self._fd is None:
+            return
+
+        import fcntl
+
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+class LeaderElector:
+    """
+    基于租约的选主循环
+
+    每隔 ttl/3 尝试获取或续租；成为 leader 时调用 on_elected，
+    续租失败（包括数据库异常）立即调用 on_demoted，保证租约过期前已经停止调度
+    """
+
+    def __init__(
+        self,
+        lease,
+        on_elected: Callable[[], Awaitable[None]],
+        on_demoted: Callable[[], Awaitable[None]],
+        on_tick: Optional[Callable[[], Awaitable[None]]] = None,
+        interval: float = 10,
+    ):
+        self.lease = lease
+        self.is_leader = False
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._on_tick = on_tick
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        # 启动时先尝试一次，单副本部署不用等待一个周期
+        await self.step()
+        self._task = asyncio.create_task(self._loop(), name="leader-elector")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self.is_leader:
+            self.is_leader = False
+            await self._on_demoted()
+            try:
+                await self.lease.release()
+            except Exception as e:
+                print(f"[Leader] 释放租约失败: {e}", flush=True)
+
+    async def step(self):
+        """执行一轮获取 / 续租"""
+        try:
+            held = await self.lease.acquire()
+        except Exception as e:
+            print(f"[Leader] 续租失败: {e}", flush=True)
+            held = False
+
+        if held and not self.is_leader:
+            self.is_leader = True
+            print(f"[Leader] 👑 {self.lease.holder} 成为 leader", flush=True)
+            await self._on_elected()
+        elif not held and self.is_leader:
+            self.is_leader = False
+            print(f"[Leader] ⚠️ {self.lease.holder} 失去 leader 身份", flush=True)
+            await self._on_demoted()
+        elif held and self._on_tick is not None:
+            await self._on_tick()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.step()
+            except Exception as e:
+                print(f"[Leader] 选主循环异常: {e}", flush=True)
+
+
+def build_elector(
+    on_elected: Callable[[], Awaitable[None]],
+    on_demoted: Callable[[], Awaitable[None]],
+    on_tick: Optional[Callable[[], Awaitable[None]]] = None,
+) -> Optional[LeaderElector]:
+    """按 scheduler_coordination 创建选主器，none 时返回 None"""
+    settings = get_settings()
+    holder = replica_id()
+
+    if settings.scheduler_coordination == 'lease':
+        lease = DbLease(LEADER_LEASE, holder, settings.scheduler_lease_seconds)
+    elif settings.scheduler_coordination == 'file':
+        lease = FileLease(settings.scheduler_lock_file, holder)
+    else:
+        return None
+
+    return LeaderElector(
+        lease, on_elected, on_demoted, on_tick,
+        interval=max(settings.scheduler_lease_seconds / 3, 1),
+    )
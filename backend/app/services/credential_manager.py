@@ -1,12 +1,24 @@
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
 import base64
+import hashlib
 import os
+import time
+
+from app.utils.tokens import jwt_expires_at
 
 class CredentialManager:
     """凭证加密管理器"""
 
-    def __init__(self, encryption_key: str):
+    def __init__(self, encryption_key: str, cache_ttl: float = 0, cache_size: int = 0):
+        # 解密结果缓存：密文哈希 -> (明文, 过期时间)
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
         # 确保密钥是 32 字节
         key_bytes = encryption_key.encode('utf-8')
         if len(key_bytes) < 32:
@@ -34,6 +46,50 @@ class CredentialManager:
         plaintext_bytes = self.aesgcm.decrypt(nonce_bytes, ciphertext_bytes, None)
         return plaintext_bytes.decode('utf-8')
 
+    @staticmethod
+    def _cache_key(ciphertext: str, nonce: str) -> str:
+        return hashlib.sha256(f"{ciphertext}:{nonce}".encode('utf-8')).hexdigest()
+
+    def decrypt_cached(self, ciphertext: str, nonce: str) -> str:
+        """解密密文（带 TTL 和容量上限的缓存）"""
+        if not self.cache_ttl or not self.cache_size:
+            return self.decrypt(ciphertext, nonce)
+
+        key = self._cache_key(ciphertext, nonce)
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None and cached[1] > now:
+            self._cache.move_to_end(key)
+            return cached[0]
+
+        plaintext = self.decrypt(ciphertext, nonce)
+        self._cache[key] = (plaintext, now + self.cache_ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return plaintext
+
+    def invalidate(self, auth_config: Optional[dict]):
+        """站点 auth 变更时移除旧密文的缓存"""
+        encrypted = (auth_config or {}).get('encrypted')
+        if encrypted:
+            self._cache.pop(self._cache_key(encrypted['ciphertext'], encrypted['nonce']), None)
+
+    def prewarm(self, auth_configs: Iterable[Optional[dict]]) -> int:
+        """批量预解密（高峰前调用），返回成功解密的数量"""
+        count = 0
+        for auth_config in auth_configs:
+            encrypted = (auth_config or {}).get('encrypted')
+            if not encrypted:
+                continue
+            try:
+                self.decrypt_cached(encrypted['ciphertext'], encrypted['nonce'])
+                count += 1
+            except Exception:
+                # 解密失败留给运行时报错
+                pass
+        return count
+
     def resolve_secret(self, auth_config: dict) -> dict:
         """解析认证配置中的凭证"""
         auth_type = auth_config.get('type', 'none')
@@ -45,7 +101,7 @@ class CredentialManager:
                 # 从加密存储中解密
                 encrypted = auth_config.get('encrypted')
                 if encrypted:
-                    token = self.decrypt(encrypted['ciphertext'], encrypted['nonce'])
+                    token = self.decrypt_cached(encrypted['ciphertext'], encrypted['nonce'])
                 else:
                     token = auth_config.get('token', '')
 
@@ -58,3 +114,25 @@ class CredentialManager:
                 return {'token': token}
 
         return {}
+
+    def token_expires_at(self, auth_config: Optional[dict]) -> Optional[float]:
+        """bearer token 为 JWT 时返回其 exp（Unix 秒），否则或无法解密时返回 None"""
+        if not auth_config:
+            return None
+        try:
+            secret = self.resolve_secret(auth_config)
+        except Exception:
+            return None
+        return jwt_expires_at(secret.get('token'))
+
+@lru_cache()
+def get_credential_manager() -> CredentialManager:
+    """进程级凭证管理器（复用 AESGCM 实例和解密缓存）"""
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    return CredentialManager(
+        settings.encryption_key,
+        cache_ttl=settings.credential_cache_ttl_seconds,
+        cache_size=settings.credential_cache_size,
+    )
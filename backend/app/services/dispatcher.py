@@ -0,0 +1,177 @@
+import asyncio
+import itertools
+import time
+from typing import List, Optional
+from uuid import UUID
+
+from app.core.config import get_settings
+from app.services.worker import Worker
+
+# 优先级：数值越小越先执行
+PRIORITY_MANUAL = 0
+PRIORITY_SCHEDULED = 10
+
+
+class DispatcherMetrics:
+    """调度背压指标"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.dequeued = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.last_wait_seconds = 0.0
+
+    def record_wait(self, wait_seconds: float):
+        self.dequeued += 1
+        self.total_wait_seconds += wait_seconds
+        self.last_wait_seconds = wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+
+class RunDispatcher:
+    """
+    有界并发的运行分发器
+
+    所有运行（定时 / 手动）都通过 submit() 进入优先级队列，
+    由固定数量的 worker 协程消费，避免同一时刻的任务一起涌入事件循环和数据库。
+    """
+
+    def __init__(self, worker: Optional[Worker] = None):
+        self.worker = worker or Worker()
+        self.metrics = DispatcherMetrics()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """启动 worker 协程"""
+        settings = get_settings()
+        if self.running or settings.execution_mode == 'queue':
+            return
+
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [
+            asyncio.create_task(self._consume(), name=f"dispatcher-{i}")
+            for i in range(settings.dispatcher_concurrency)
+        ]
+        print(f"[Dispatcher] 启动完成，并发上限={settings.dispatcher_concurrency}, 队列上限={settings.dispatcher_queue_size}", flush=True)
+
+    async def stop(self):
+        """停止 worker 协程，未执行的任务返回 rejected"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, _, _, _, _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_result({'status': 'rejected', 'message': 'Dispatcher stopped'})
+            self._queue = None
+
+    def submit(self, site_id: UUID, trigger: str = 'scheduled', priority: Optional[int] = None) -> asyncio.Future:
+        """
+        提交一次运行，返回在运行结束时完成的 Future
+
+        队列已满时定时任务直接被拒绝（Future 结果为 status=rejected），
+        手动运行不受队列上限限制，保证管理员操作始终可以排队。
+        execution_mode=queue 时只写入 run_queue 表，Future 结果为 status=queued。
+        """
+        if priority is None:
+            priority = PRIORITY_MANUAL if trigger == 'manual' else PRIORITY_SCHEDULED
+
+        settings = get_settings()
+        if settings.execution_mode == 'queue':
+            # 多进程模式：API 进程只入队，由 worker 进程领取执行
+            return asyncio.ensure_future(self._enqueue(site_id, trigger, priority))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        if not self.running:
+            # 未启动时（如测试环境）退化为直接执行
+            task = asyncio.ensure_future(self.worker.run_site(site_id, trigger=trigger))
+            task.add_done_callback(lambda t: self._resolve(future, t))
+            return future
+
+        if priority != PRIORITY_MANUAL and self._queue.qsize() >= settings.dispatcher_queue_size:
+            self.metrics.rejected += 1
+            future.set_result({'status': 'rejected', 'message': 'Dispatcher queue is full'})
+            return future
+
+        self.metrics.submitted += 1
+        self._queue.put_nowait((priority, next(self._sequence), time.monotonic(), site_id, trigger, future))
+        return future
+
+    async def _enqueue(self, site_id: UUID, trigger: str, priority: int) -> dict:
+        from app.services.run_queue import enqueue
+
+        queue_id = await enqueue(site_id, trigger=trigger, priority=priority)
+        self.metrics.submitted += 1
+        return {'status': 'queued', 'queue_id': str(queue_id)}
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, task: asyncio.Task):
+        if future.done():
+            return
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    async def _consume(self):
+        while True:
+            _, _, enqueued_at, site_id, trigger, future = await self._queue.get()
+            self.metrics.record_wait(time.monotonic() - enqueued_at)
+            self._in_flight += 1
+            try:
+                result = await self.worker.run_site(site_id, trigger=trigger)
+                self.metrics.completed += 1
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                self.metrics.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._in_flight -= 1
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        """当前队列与背压指标"""
+        settings = get_settings()
+        metrics = self.metrics
+        return {
+            'running': self.running,
+            'concurrency': settings.dispatcher_concurrency,
+            'queueSize': settings.dispatcher_queue_size,
+            'queueDepth': self._queue.qsize() if self._queue is not None else 0,
+            'inFlight': self._in_flight,
+            'submitted': metrics.submitted,
+            'completed': metrics.completed,
+            'failed': metrics.failed,
+            'rejected': metrics.rejected,
+            'avgWaitSeconds': round(metrics.total_wait_seconds / metrics.dequeued, 3) if metrics.dequeued else 0.0,
+            'maxWaitSeconds': round(metrics.max_wait_seconds, 3),
+            'lastWaitSeconds': round(metrics.last_wait_seconds, 3),
+        }
+
+
+# 全局分发器实例
+dispatcher = RunDispatcher()
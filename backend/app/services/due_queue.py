@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, func, select, update
+
+from app.db.models import Site
+
+# 到期查询返回的列：id, schedule, base_url, 第一个步骤的 URL（用于负载均衡）, next_run_at
+DueRow = Tuple[UUID, Optional[dict], Optional[str], Optional[str], datetime]
+
+
+def to_local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """next_run_at 与 Run.started_at 一样按本地时间、不带时区存储"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+async def save_next_runs(updates: Dict[UUID, Optional[datetime]]):
+    """批量写入 Site.next_run_at（一条 executemany UPDATE，已删除的站点直接忽略）"""
+    if not updates:
+        return
+    from app.db.session import async_session
+
+    table = Site.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam('site_id'))
+        .values(next_run_at=bindparam('next_run'))
+    )
+    async with async_session() as session:
+        await session.execute(
+            statement,
+            [{'site_id': site_id, 'next_run': next_run} for site_id, next_run in updates.items()],
+        )
+        await session.commit()
+
+
+async def fetch_due(now: datetime, limit: int) -> List[DueRow]:
+    """走 next_run_at 索引查询已到期的启用站点"""
+    from app.db.session import async_session
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(
+                Site.id, Site.schedule, Site.base_url,
+                func.json_extract(Site.flow, '$[0].url'), Site.next_run_at,
+            )
+            .where(Site.next_run_at <= now, Site.enabled == True, Site.paused == False)
+            .order_by(Site.next_run_at)
+            .limit(limit)
+        )
+        return result.all()
+
+
+async def advance_next_run(site_id: UUID, expected: datetime, next_run: Optional[datetime]) -> bool:
+    """
+    比较并设置 next_run_at：只有仍为 expected 时才更新
+
+    多个进程共享到期队列时，只有更新成功的进程执行这次运行
+    """
+    from app.db.session import async_session
+
+    async with async_session() as session:
+        result = await session.execute(
+            update(Site)
+            .where(Site.id == site_id, Site.next_run_at == expected)
+            .values(next_run_at=next_run)
+        )
+        await session.commit()
+        return result.rowcount == 1
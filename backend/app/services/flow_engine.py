@@ -1,40 +1,64 @@
+import asyncio
 import httpx
-from typing import Dict, Any, Optional
+import json
+import time
+from collections import Counter
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 from uuid import UUID
 
-from app.utils.conditions import evaluate_condition
 from app.utils.extraction import extract_variables, extract_json_path
-from app.utils.templating import render_template, render_dict
-from app.utils.redaction import redact_headers, redact_response
+from app.utils.templating import render_compiled_dict
+from app.utils.redaction import redact_headers, redact_response_bytes
+from app.utils.tokens import jwt_expires_at
+from app.core.config import get_settings
+from app.services.http_pool import http_pool
+from app.services.host_guard import HostUnavailableError, host_guard
+from app.services.credential_manager import get_credential_manager
+from app.services.flow_plan import FlowPlan, CompiledStep, compile_flow
+from app.services.session_store import SiteSession
+
+class RunDeadlineExceeded(Exception):
+    """运行总时长超出 flow_run_deadline_seconds"""
+
+
+class RetryDeferred(Exception):
+    """退避时间过长，结束本次运行，retry_after 秒后由调度器重跑"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f'{retry_after:.1f}s 后重试')
+        self.retry_after = retry_after
+
+
+def _failure_kind(error: Exception) -> Optional[str]:
+    """把请求异常归类为重试策略中的失败类型"""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return 'connect'
+    if isinstance(error, (httpx.TimeoutException, TimeoutError)):
+        return 'timeout'
+    if isinstance(error, (httpx.NetworkError, httpx.RemoteProtocolError)):
+        return 'network'
+    return None
+
 
 class FlowContext:
     """Flow 执行上下文"""
     def __init__(self, auth: Dict[str, Any]):
         self.variables: Dict[str, Any] = {}
         self.auth = auth
+        # 运行截止时间（事件循环时间），所有步骤共享
+        self.deadline: Optional[float] = None
+        # 可能已被服务端处理的非幂等请求数（发送前计入，确定未被处理时扣除），
+        # 大于 0 时不能通过整体重跑本次运行来重试
+        self.side_effects = 0
+        # 本次运行复用了上次保存的会话，以及因此跳过的步骤数
+        self.session_reused = False
+        self.session_skipped = 0
 
-        # 从 auth 中提取 token
-        if auth.get('type') == 'bearer':
-            token_source = auth.get('tokenSource', 'manual')
-            if token_source == 'manual':
-                # 检查是否有加密凭证
-                encrypted = auth.get('encrypted')
-                if encrypted:
-                    from app.services.credential_manager import CredentialManager
-                    from app.core.config import get_settings
-                    settings = get_settings()
-                    cm = CredentialManager(settings.encryption_key)
-                    self.variables['token'] = cm.decrypt(
-                        encrypted['ciphertext'],
-                        encrypted['nonce']
-                    )
-                else:
-                    self.variables['token'] = auth.get('token', '')
-            elif token_source == 'env':
-                import os
-                env_key = auth.get('envKey', '')
-                self.variables['token'] = os.getenv(env_key, '')
+        # 从 auth 中提取 token（走进程级凭证缓存，不在每次运行时重复解密）
+        self.variables.update(get_credential_manager().resolve_secret(auth))
+        # token 为 JWT 时的过期时间（只解码 exp，不校验签名）
+        self.token_expires_at = jwt_expires_at(self.variables.get('token'))
 
 class FlowResult:
     """Flow 执行结果"""
@@ -43,33 +67,89 @@ class FlowResult:
         self.steps = []
         self.auth_failed = False
         self.summary = ''
+        # 因目标主机熔断 / 限流失败或退避过长而结束时，建议的重试等待秒数
+        self.retry_after: Optional[float] = None
+        # 耗尽运行截止时间的步骤
+        self.deadline_step: Optional[str] = None
+        # 运行结束时的会话（cookie + 登录变量），由 worker 保存供下次复用
+        self.session: Optional[SiteSession] = None
+        self.session_reused = False
 
 class FlowEngine:
     """Flow Engine 核心"""
 
-    async def execute_flow(self, site_id: UUID, flow: list, auth: Dict[str, Any]) -> FlowResult:
-        """执行完整的 Flow"""
+    async def execute_flow(
+        self,
+        site_id: UUID,
+        flow: list,
+        auth: Dict[str, Any],
+        plan: Optional[FlowPlan] = None,
+        session: Optional[SiteSession] = None,
+    ) -> FlowResult:
+        """
+        执行完整的 Flow（plan 为预编译结果，未提供时临时编译）
+
+        session 为上次运行保存的会话：cookie 写入本次运行的 client，登录变量写入上下文，
+        标记了 skipIfSessionValid 的步骤直接跳过。复用的会话导致认证失败时丢弃它；
+        只有确实跳过了登录步骤、且还没有发出过非幂等请求时，才在剩余的运行时间内重新完整执行一次
+        """
+        plan = plan or compile_flow(flow)
+        deadline = None
+        deadline_seconds = get_settings().flow_run_deadline_seconds
+        if deadline_seconds > 0:
+            deadline = asyncio.get_running_loop().time() + deadline_seconds
+
         context = FlowContext(auth)
+        result = await self._run(plan, context, session, deadline)
+
+        if result.session_reused and result.auth_failed:
+            # 失效的会话不再保存
+            result.session = None
+            if context.session_skipped and not context.side_effects:
+                print(f"[FlowEngine] 保存的会话已失效，重新登录: site_id={site_id}", flush=True)
+                result = await self._run(plan, FlowContext(auth), None, deadline)
+
+        return result
+
+    async def _run(
+        self,
+        plan: FlowPlan,
+        context: FlowContext,
+        session: Optional[SiteSession],
+        deadline: Optional[float],
+    ) -> FlowResult:
         result = FlowResult()
+        # 重新执行时沿用第一次执行的截止时间
+        context.deadline = deadline
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            for idx, step in enumerate(flow):
-                step_result = await self._execute_step(client, step, context)
-                result.steps.append(step_result)
+        # token 已过期：不发送任何请求，直接按认证失败处理
+        expires_at = context.token_expires_at
+        if expires_at is not None and expires_at <= time.time() + get_settings().credential_expiry_skew_seconds:
+            result.status = 'FAILED'
+            result.auth_failed = True
+            expired = datetime.fromtimestamp(expires_at).isoformat(sep=' ', timespec='seconds')
+            result.summary = f'认证失败: Token 已于 {expired} 过期，未发送请求'
+            return result
 
-                # 检查步骤状态
-                if step_result['status'] == 'SKIPPED':
-                    result.status = 'SKIPPED'
-                    result.summary = f"步骤 {step['name']} 被跳过: {step_result.get('reason', '')}"
-                    break
-                elif step_result['status'] == 'FAILED':
-                    result.status = 'FAILED'
-                    result.summary = f"步骤 {step['name']} 失败: {step_result.get('error', '')}"
+        # 每次运行使用独立的 client（cookie 隔离），底层连接由全局连接池复用
+        async with http_pool.client(timeout=30.0) as client:
+            if session is not None:
+                session.apply(client.cookies.jar)
+                context.variables.update(session.variables)
+                context.session_reused = result.session_reused = True
 
-                    # 检查是否是 auth 失败
-                    if step_result.get('auth_failed', False):
-                        result.auth_failed = True
-                    break
+            if plan.parallel:
+                await self._execute_graph(client, plan, context, result)
+            else:
+                for step in plan.steps:
+                    step_result = await self._execute_step(client, step, context)
+                    result.steps.append(step_result)
+                    if self._apply_step_status(result, step, step_result):
+                        break
+
+            result.session = SiteSession.from_jar(client.cookies.jar, {
+                var: context.variables[var] for var in plan.session_variables if var in context.variables
+            })
 
         if result.status == 'RUNNING':
             result.status = 'SUCCESS'
@@ -77,95 +157,413 @@ class FlowEngine:
 
         return result
 
-    async def _execute_step(self, client: httpx.AsyncClient, step: Dict[str, Any], context: FlowContext) -> Dict[str, Any]:
+    def _apply_step_status(self, result: FlowResult, step: CompiledStep, step_result: Dict[str, Any]) -> bool:
+        """根据步骤状态更新运行结果，返回是否需要停止后续步骤"""
+        if step_result['status'] == 'SKIPPED':
+            result.status = 'SKIPPED'
+            result.summary = f"步骤 {step.name} 被跳过: {step_result.get('reason', '')}"
+            return True
+        elif step_result['status'] == 'FAILED':
+            result.status = 'FAILED'
+            result.summary = f"步骤 {step.name} 失败: {step_result.get('error', '')}"
+
+            # 检查是否是 auth 失败
+            if step_result.get('auth_failed', False):
+                result.auth_failed = True
+            if step_result.get('deadline_exceeded', False):
+                result.deadline_step = step.name
+            return True
+        elif step_result['status'] in ('CIRCUIT_OPEN', 'RETRYING'):
+            result.status = step_result['status']
+            reason = '目标主机不可用' if result.status == 'CIRCUIT_OPEN' else '稍后重试'
+            result.summary = f"步骤 {step.name} {reason}: {step_result.get('error', '')}"
+            result.retry_after = step_result.get('retry_after')
+            return True
+        return False
+
+    async def _execute_graph(self, client: httpx.AsyncClient, plan: FlowPlan, context: FlowContext, result: FlowResult):
+        """
+        按依赖图执行：依赖都已完成的步骤并发执行（不超过 flow_max_parallel_steps）
+
+        某一步 SKIPPED / FAILED 后不再启动新的步骤，已在执行的步骤照常完成；
+        运行结果以最先结束的 SKIPPED / FAILED 步骤为准，步骤记录按 flow 中的顺序排列
+        """
+        limit = max(get_settings().flow_max_parallel_steps, 1)
+        pending = {idx: set(deps) for idx, deps in enumerate(plan.dependencies)}
+        done = set()
+        running: Dict[asyncio.Task, int] = {}
+        step_results: Dict[int, Dict[str, Any]] = {}
+        stopped = False
+
+        try:
+            while True:
+                if not stopped:
+                    ready = [idx for idx, deps in pending.items() if deps <= done]
+                    for idx in ready[:limit - len(running)]:
+                        del pending[idx]
+                        task = asyncio.create_task(self._execute_step(client, plan.steps[idx], context))
+                        running[task] = idx
+                if not running:
+                    break
+
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(finished, key=running.get):
+                    idx = running.pop(task)
+                    step_results[idx] = task.result()
+                    done.add(idx)
+                    if not stopped and self._apply_step_status(result, plan.steps[idx], step_results[idx]):
+                        stopped = True
+        finally:
+            # 外部取消时一并取消仍在执行的步骤
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        result.steps.extend(step_results[idx] for idx in sorted(step_results))
+
+    async def _execute_step(self, client: httpx.AsyncClient, step: CompiledStep, context: FlowContext) -> Dict[str, Any]:
         """执行单个步骤"""
         step_result = {
-            'name': step.get('name', ''),
+            'name': step.name,
             'status': 'RUNNING',
             'started_at': datetime.utcnow().isoformat(),
         }
 
+        if step.skip_if_session and context.session_reused:
+            step_result['status'] = 'SUCCESS'
+            step_result['session_reused'] = True
+            context.session_skipped += 1
+            return step_result
+
+        if step.for_each:
+            await self._execute_for_each(client, step, context, step_result)
+        else:
+            await self._execute_request(client, step, context, context.variables, step_result)
+        return step_result
+
+    async def _execute_for_each(self, client: httpx.AsyncClient, step: CompiledStep, context: FlowContext, step_result: Dict[str, Any]):
+        """
+        forEach 步骤：对数组变量的每个元素执行一次请求
+
+        元素绑定为 ${item}（名称由 forEach.as 指定），字典元素的字段绑定为 ${item_<字段>}，
+        下标为 ${item_index}；condition 按元素评估，不满足的元素记为 SKIPPED，不影响整个步骤。
+        元素内 extract 的变量只在该元素内可见。最多 concurrency 个元素同时执行，
+        ratePerSecond > 0 时元素按该速率依次开始。任一元素失败则步骤失败。
+        """
+        if step.compile_error:
+            step_result['status'] = 'FAILED'
+            step_result['error'] = str(step.compile_error)
+            return
+
+        items = context.variables.get(step.for_each_items)
+        if items is None:
+            items = []
+        if not isinstance(items, list):
+            step_result['status'] = 'FAILED'
+            step_result['error'] = f'forEach 变量 {step.for_each_items} 不是数组'
+            return
+
+        max_items = get_settings().flow_foreach_max_items
+        if len(items) > max_items:
+            step_result['status'] = 'FAILED'
+            step_result['error'] = f'forEach 元素数 {len(items)} 超过上限 {max_items}'
+            return
+
+        slots = asyncio.Semaphore(step.for_each_concurrency)
+        pacing = asyncio.Lock()
+        interval = 1 / step.for_each_rate if step.for_each_rate > 0 else 0
+        loop = asyncio.get_running_loop()
+        next_start = loop.time()
+
+        async def run_item(index: int, item: Any) -> Dict[str, Any]:
+            nonlocal next_start
+            name = step.for_each_as
+            variables = {**context.variables, name: item, f'{name}_index': index}
+            if isinstance(item, dict):
+                variables.update((f'{name}_{key}', value) for key, value in item.items())
+
+            async with slots:
+                if interval:
+                    async with pacing:
+                        delay = next_start - loop.time()
+                        next_start = max(next_start, loop.time()) + interval
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                item_result = {'index': index, 'status': 'RUNNING'}
+                await self._execute_request(client, step, context, variables, item_result)
+                # 每个元素只保留状态，响应体不进入步骤记录
+                item_result.pop('headers', None)
+                item_result.pop('response', None)
+                return item_result
+
+        item_results = await asyncio.gather(*(run_item(index, item) for index, item in enumerate(items)))
+
+        # 常见状态总是出现在计数中，其余状态出现时才计入
+        counts = Counter(dict.fromkeys(('SUCCESS', 'FAILED', 'SKIPPED', 'CIRCUIT_OPEN'), 0))
+        counts.update(item_result['status'] for item_result in item_results)
+        step_result['items'] = item_results
+        step_result['item_counts'] = dict(counts)
+
+        failed = [item_result for item_result in item_results if item_result['status'] == 'FAILED']
+        unavailable = [item_result for item_result in item_results if item_result['status'] == 'CIRCUIT_OPEN']
+        if failed:
+            step_result['status'] = 'FAILED'
+            step_result['error'] = f"{len(failed)}/{len(items)} 个元素失败，首个错误: {failed[0].get('error', '')}"
+            step_result['auth_failed'] = any(item_result.get('auth_failed') for item_result in failed)
+        elif unavailable:
+            step_result['status'] = 'CIRCUIT_OPEN'
+            step_result['error'] = unavailable[0]['error']
+            step_result['retry_after'] = max(item_result['retry_after'] for item_result in unavailable)
+        else:
+            step_result['status'] = 'SUCCESS'
+
+    async def _execute_request(
+        self,
+        client: httpx.AsyncClient,
+        step: CompiledStep,
+        context: FlowContext,
+        variables: Dict[str, Any],
+        step_result: Dict[str, Any],
+    ):
+        """
+        评估条件、渲染并发送请求，结果写入 step_result，提取的变量写入 variables
+
+        请求（含读取响应体）最多持续 timeoutMs.total 与运行剩余时间中较小的一个，
+        超时后请求被取消、连接立即释放。失败时按步骤的重试策略重试，
+        重试过的步骤在 step_result['attempts'] 中记录每次尝试
+        """
         try:
             # 1. 评估条件
-            condition = step.get('condition')
-            if condition:
-                if not evaluate_condition(condition, context.variables):
+            if step.condition:
+                if not step.condition.evaluate(variables):
                     step_result['status'] = 'SKIPPED'
-                    step_result['reason'] = f"条件不满足: {condition}"
-                    return step_result
+                    step_result['reason'] = f"条件不满足: {step.condition.expression}"
+                    return
+
+            if step.compile_error:
+                raise step.compile_error
 
             # 2. 渲染模板
-            url = render_template(step['url'], context.variables)
-            headers = render_dict(step.get('headers', {}), context.variables)
-            body = step.get('body')
-            if body and isinstance(body, dict):
-                body = render_dict(body, context.variables)
-
-            # 3. 执行 HTTP 请求
-            method = step['method'].upper()
-            start_time = datetime.utcnow()
-
-            response = await client.request(
-                method=method,
-                url=url,
-                headers=headers,
-                json=body if body else None
-            )
+            url = step.url.render(variables)
+            headers = render_compiled_dict(step.headers, variables)
+            body = step.body
+            if step.body_template is not None:
+                body = render_compiled_dict(step.body_template, variables)
 
-            elapsed_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+            # 3. 执行 HTTP 请求（经过单主机限流和熔断，按重试策略重试）
+            method = step.method
+            host = httpx.URL(url).host
+            attempts = []
+            while True:
+                side_effect = not step.retry.idempotent
+                if side_effect:
+                    context.side_effects += 1
+                start_time = datetime.utcnow()
+                failure = None
+                try:
+                    response, raw_body, truncated = await self._send_guarded(
+                        client, step, host, method, url, headers, body, context.deadline
+                    )
+                    attempt = {'status_code': response.status_code}
+                    retryable = step.retry.retryable(status_code=response.status_code)
+                    # 被拒绝认证的请求没有被服务端处理
+                    processed = response.status_code not in (401, 403)
+                except HostUnavailableError:
+                    # 熔断 / 限流在发送前拒绝
+                    if side_effect:
+                        context.side_effects -= 1
+                    raise
+                except RunDeadlineExceeded:
+                    raise
+                except Exception as e:
+                    failure = e
+                    attempt = {'error': str(e)}
+                    retryable = step.retry.retryable(failure=_failure_kind(e))
+                    processed = _failure_kind(e) != 'connect'
+                if side_effect and not processed:
+                    context.side_effects -= 1
+                elapsed_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+                attempt['elapsed_ms'] = elapsed_ms
+                attempts.append(attempt)
 
-            # 4. 记录响应（脱敏）
+                delay = self._retry_delay(step, host, len(attempts), context) if retryable else None
+                if delay is None:
+                    break
+                attempt['backoff_ms'] = round(delay * 1000)
+                step_result['attempts'] = attempts
+                await self._wait_retry(step, context, delay)
+
+            if failure is not None:
+                raise failure
+
+            # 4. 记录响应（脱敏，只解码原始字节的前缀）
             step_result['status_code'] = response.status_code
             step_result['elapsed_ms'] = elapsed_ms
             step_result['headers'] = redact_headers(dict(response.headers))
+            step_result['response'] = redact_response_bytes(raw_body, response.encoding or 'utf-8', truncated=truncated)
+            if truncated:
+                step_result['truncated'] = True
 
-            # 5. 解析响应
-            response_data = None
-            try:
-                response_data = response.json()
-                step_result['response'] = redact_response(str(response_data))
-            except:
-                step_result['response'] = redact_response(response.text)
-
-            # 5.5 默认状态码检查（即使没有 expect 配置也检查）
+            # 5. 默认状态码检查（即使没有 expect 配置也检查）
             if response.status_code in [401, 403]:
                 step_result['status'] = 'FAILED'
                 step_result['error'] = f'认证失败: HTTP {response.status_code}'
                 step_result['auth_failed'] = True
-                return step_result
+                return
             elif response.status_code >= 400:
                 # 允许用户通过 expect.allowErrorStatus 跳过此检查
-                expect = step.get('expect', {})
-                if not expect.get('allowErrorStatus', False):
+                if not step.allow_error_status:
                     step_result['status'] = 'FAILED'
                     step_result['error'] = f'HTTP 请求失败: {response.status_code}'
-                    return step_result
+                    return
+
+            # 6. 仅在 expect / extract 需要时解析 JSON
+            response_data = None
+            if step.needs_json:
+                if truncated:
+                    raise ValueError(f'响应体超过 maxBodyBytes={step.max_body_bytes}，无法解析 JSON')
+                try:
+                    response_data = json.loads(raw_body)
+                except ValueError:
+                    response_data = None
 
-            # 6. 验证 expect
-            expect = step.get('expect')
-            if expect:
-                expect_result = self._validate_expect(response, response_data, expect)
+            # 7. 验证 expect
+            if step.expect:
+                expect_result = self._validate_expect(response, response_data, step)
                 if not expect_result['passed']:
                     step_result['status'] = 'FAILED'
                     step_result['error'] = expect_result['error']
                     step_result['auth_failed'] = expect_result.get('auth_failed', False)
-                    return step_result
+                    return
 
-            # 7. 提取变量
-            extract_rules = step.get('extract', [])
-            if extract_rules and response_data:
-                extract_variables(response_data, extract_rules, context.variables)
+            # 8. 提取变量
+            if step.extract:
+                extract_variables(response_data, step.extract, variables, response.headers)
 
             step_result['status'] = 'SUCCESS'
 
+        except RetryDeferred as e:
+            step_result['status'] = 'RETRYING'
+            step_result['error'] = str(e)
+            step_result['retry_after'] = e.retry_after
+        except RunDeadlineExceeded as e:
+            step_result['status'] = 'FAILED'
+            step_result['error'] = str(e)
+            step_result['deadline_exceeded'] = True
+        except HostUnavailableError as e:
+            step_result['status'] = 'CIRCUIT_OPEN'
+            step_result['error'] = str(e)
+            step_result['retry_after'] = e.retry_after
         except Exception as e:
             step_result['status'] = 'FAILED'
             step_result['error'] = str(e)
 
-        return step_result
+    async def _send_guarded(
+        self,
+        client: httpx.AsyncClient,
+        step: CompiledStep,
+        host: str,
+        method: str,
+        url: str,
+        headers: Dict[str, Any],
+        body: Any,
+        deadline: Optional[float],
+    ) -> Tuple[httpx.Response, bytes, bool]:
+        """经过单主机限流和熔断发送一次请求，并把结果计入熔断器"""
+        timeout, bounded_by_deadline = self._request_budget(step, deadline)
+        await host_guard.acquire(host)
+
+        try:
+            response, raw_body, truncated = await asyncio.wait_for(
+                self._send(client, step, method, url, headers, body), timeout
+            )
+        except asyncio.CancelledError:
+            host_guard.release(host)
+            raise
+        except asyncio.TimeoutError:
+            if bounded_by_deadline:
+                # 运行预算耗尽不代表主机异常
+                host_guard.release(host)
+                raise RunDeadlineExceeded(f'超出运行截止时间 {get_settings().flow_run_deadline_seconds:g}s')
+            host_guard.record(host, False)
+            raise TimeoutError(f'请求超过 timeoutMs={step.total_timeout * 1000:.0f}')
+        except Exception:
+            host_guard.record(host, False)
+            raise
+
+        host_guard.record(host, response.status_code < 500 and response.status_code != 429)
+        return response, raw_body, truncated
+
+    def _retry_delay(self, step: CompiledStep, host: str, attempt: int, context: FlowContext) -> Optional[float]:
+        """第 attempt 次尝试失败后的退避秒数；次数用尽、重试预算耗尽或来不及在截止时间前重试时返回 None"""
+        if attempt >= step.retry.max_attempts:
+            return None
+        delay = step.retry.backoff_delay(attempt)
+        if context.deadline is not None and asyncio.get_running_loop().time() + delay >= context.deadline:
+            return None
+        if not host_guard.allow_retry(host):
+            print(f"[FlowEngine] 主机 {host} 的重试预算已耗尽，步骤 {step.name} 不再重试", flush=True)
+            return None
+        return delay
+
+    async def _wait_retry(self, step: CompiledStep, context: FlowContext, delay: float):
+        """
+        等待退避时间
+
+        较长的退避不在运行内等待（会一直占着执行槽位），而是结束本次运行交给调度器重跑；
+        已发出过非幂等请求的运行或 forEach 元素不能整体重跑，只能在运行内等待
+        """
+        if delay > get_settings().flow_retry_inline_max_seconds and not step.for_each and not context.side_effects:
+            raise RetryDeferred(delay)
+        await asyncio.sleep(delay)
+
+    def _request_budget(self, step: CompiledStep, deadline: Optional[float]) -> Tuple[float, bool]:
+        """本次请求可用的秒数，以及是否受运行截止时间约束"""
+        if deadline is None:
+            return step.total_timeout, False
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            raise RunDeadlineExceeded(f'超出运行截止时间 {get_settings().flow_run_deadline_seconds:g}s')
+        if remaining < step.total_timeout:
+            return remaining, True
+        return step.total_timeout, False
+
+    async def _send(
+        self,
+        client: httpx.AsyncClient,
+        step: CompiledStep,
+        method: str,
+        url: str,
+        headers: Dict[str, Any],
+        body: Any,
+    ) -> Tuple[httpx.Response, bytes, bool]:
+        """发送请求并流式读取响应体，最多保留 max_body_bytes 字节"""
+        async with client.stream(
+            method=method,
+            url=url,
+            headers=headers,
+            json=body if body else None,
+            timeout=step.timeout,
+        ) as response:
+            raw_body, truncated = await self._read_body(response, step.max_body_bytes)
+        return response, raw_body, truncated
+
+    async def _read_body(self, response: httpx.Response, max_bytes: int) -> Tuple[bytes, bool]:
+        """读取响应体，超过 max_bytes 时停止读取并返回 truncated=True"""
+        buffer = bytearray()
+        async for chunk in response.aiter_bytes():
+            remaining = max_bytes - len(buffer)
+            if len(chunk) > remaining:
+                buffer.extend(chunk[:remaining])
+                return bytes(buffer), True
+            buffer.extend(chunk)
+        return bytes(buffer), False
 
-    def _validate_expect(self, response: httpx.Response, response_data: Any, expect: Dict[str, Any]) -> Dict[str, Any]:
+    def _validate_expect(self, response: httpx.Response, response_data: Any, step: CompiledStep) -> Dict[str, Any]:
         """验证 expect 规则"""
+        expect = step.expect
         expect_type = expect.get('type', 'json')
 
         # 检查 auth 失败
@@ -180,7 +578,7 @@ class FlowEngine:
             path = expect.get('path', '')
             expected_value = expect.get('equals')
 
-            actual_value = extract_json_path(response_data, path)
+            actual_value = extract_json_path(response_data, step.expect_path)
 
             if actual_value != expected_value:
                 return {
@@ -0,0 +1,247 @@
+import random
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import httpx
+
+from app.core.config import get_settings
+from app.utils.conditions import CompiledCondition
+from app.utils.extraction import compile_json_path
+from app.utils.templating import CompiledTemplate, compile_dict, compiled_variables
+
+
+# 默认重试的状态码和失败类型（connect：连接阶段，请求未发出；timeout：超时；network：读写中断）
+RETRY_STATUSES = (429, 502, 503, 504)
+RETRY_FAILURES = ('connect', 'timeout', 'network')
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+class RetryPolicy:
+    """
+    步骤的重试策略
+
+    step.retry 为 false 时不重试，或为
+    {"maxAttempts", "backoffMs", "maxBackoffMs", "statuses", "on", "idempotent"}，未配置的字段取全局默认值。
+    非幂等的步骤（未声明 idempotent 时按 method 判断，如 POST 的 spin）只在连接阶段失败时重试，
+    其他失败时服务端可能已经处理了请求
+    """
+
+    def __init__(self, retry: Any, method: str):
+        settings = get_settings()
+        options = retry if isinstance(retry, dict) else {}
+        max_attempts = options.get('maxAttempts')
+        if retry is False:
+            max_attempts = 1
+        elif max_attempts is None:
+            max_attempts = settings.flow_retry_max_attempts
+        self.max_attempts = max(int(max_attempts), 1)
+        self.backoff = (options.get('backoffMs') or settings.flow_retry_backoff_ms) / 1000
+        self.max_backoff = (options.get('maxBackoffMs') or settings.flow_retry_max_backoff_ms) / 1000
+        self.statuses = set(options.get('statuses') or RETRY_STATUSES)
+        self.failures = set(options.get('on') or RETRY_FAILURES)
+        idempotent = options.get('idempotent')
+        self.idempotent = method in IDEMPOTENT_METHODS if idempotent is None else bool(idempotent)
+
+    def retryable(self, status_code: Optional[int] = None, failure: Optional[str] = None) -> bool:
+        """按响应状态码或失败类型判断是否可以重试"""
+        if failure is not None:
+            return failure in self.failures and (self.idempotent or failure == 'connect')
+        return self.idempotent and status_code in self.statuses
+
+    def backoff_delay(self, attempt: int) -> float:
+        """第 attempt 次尝试失败后的等待秒数（指数退避 + 全抖动）"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+class CompiledStep:
+    """
+    预编译的步骤
+
+    模板、条件和 JSON 路径在编译时解析一次。编译错误（如缺少 url）
+    记录在 compile_error 中，由引擎在执行该步骤时抛出，保持原有的步骤失败语义。
+    """
+
+    def __init__(self, step: Dict[str, Any]):
+        self.step = step
+        self.name = step.get('name', '')
+        self.compile_error: Optional[Exception] = None
+
+        condition = step.get('condition')
+        self.condition = CompiledCondition(condition) if condition else None
+
+        expect = step.get('expect') or {}
+        self.expect = step.get('expect')
+        self.allow_error_status = expect.get('allowErrorStatus', False)
+        self.expect_path = compile_json_path(expect.get('path', ''))
+
+        # 复用了上次运行保存的有效会话时跳过该步骤（如登录）
+        self.skip_if_session = bool(step.get('skipIfSessionValid', False))
+
+        # 单步最多读取的响应字节数
+        self.max_body_bytes = step.get('maxBodyBytes') or get_settings().flow_max_body_bytes
+
+        # timeoutMs：数字表示整体超时，或 {"connect", "read", "total"}（毫秒）
+        timeout = step.get('timeoutMs')
+        limits = timeout if isinstance(timeout, dict) else {'total': timeout}
+        total_ms = limits.get('total') or get_settings().flow_step_timeout_ms
+        self.total_timeout = total_ms / 1000
+        self.timeout = httpx.Timeout(
+            self.total_timeout,
+            connect=(limits.get('connect') or total_ms) / 1000,
+            read=(limits.get('read') or total_ms) / 1000,
+        )
+
+        self.extract = [
+            {
+                'var': rule.get('var'),
+                'type': rule.get('type', 'json'),
+                'path': compile_json_path(rule.get('path', '')),
+                'name': rule.get('name'),
+            }
+            for rule in step.get('extract', []) or []
+        ]
+
+        # 只有 json 类型的 expect / extract 才需要解析响应体
+        self.needs_json = (
+            (bool(self.expect) and expect.get('type', 'json') == 'json')
+            or any(rule['type'] == 'json' for rule in self.extract)
+        )
+
+        # forEach：对数组变量的每个元素渲染并执行一次请求
+        for_each = step.get('forEach')
+        self.for_each = for_each is not None
+        if self.for_each:
+            for_each = for_each if isinstance(for_each, dict) else {}
+            settings = get_settings()
+            self.for_each_items = for_each.get('items')
+            self.for_each_as = for_each.get('as') or 'item'
+            self.for_each_concurrency = max(int(for_each.get('concurrency') or settings.flow_foreach_concurrency), 1)
+            self.for_each_rate = float(for_each.get('ratePerSecond') or 0)
+            if not isinstance(self.for_each_items, str) or not self.for_each_items:
+                self.compile_error = ValueError("forEach.items 必须是数组变量名")
+
+        try:
+            self.method = step['method'].upper()
+            self.url = CompiledTemplate(step['url'])
+            self.headers = compile_dict(step.get('headers', {}))
+            body = step.get('body')
+            self.body = body
+            self.body_template = compile_dict(body) if body and isinstance(body, dict) else None
+        except Exception as e:
+            self.compile_error = self.compile_error or e
+
+        self.retry = RetryPolicy(step.get('retry'), getattr(self, 'method', ''))
+
+        # 步骤引用的变量（url / headers / body 模板和条件），用于推断依赖
+        self.uses = set()
+        for template in (getattr(self, 'url', None), getattr(self, 'headers', None), getattr(self, 'body_template', None)):
+            self.uses |= compiled_variables(template)
+        if self.condition:
+            self.uses |= self.condition.variables()
+        if self.for_each and self.for_each_items:
+            self.uses.add(self.for_each_items)
+
+
+class FlowPlan:
+    """
+    站点 flow 的预编译结果
+
+    任一步骤声明了 dependsOn 时按依赖图并行执行（parallel=True）：
+    - 未声明 dependsOn 的步骤依赖上一步（与顺序执行一致，登录等 cookie 依赖不会被打乱）
+    - dependsOn 为步骤名列表时依赖这些步骤
+    - dependsOn 为 "auto" 时只依赖推断出的步骤
+    此外，步骤引用的变量由之前哪一步的 extract 产生，就自动依赖那一步。
+    dependsOn 只能引用之前的步骤，因此依赖图一定无环。
+    """
+
+    def __init__(self, flow: List[Dict[str, Any]]):
+        self.steps = [CompiledStep(step) for step in flow]
+        self.parallel = any(isinstance(step, dict) and 'dependsOn' in step for step in flow)
+        # 每个步骤依赖的步骤下标
+        self.dependencies: List[Tuple[int, ...]] = self._resolve_dependencies() if self.parallel else []
+        # 跳过的登录步骤提取的变量随会话一起保存
+        self.session_variables = {
+            rule['var'] for step in self.steps if step.skip_if_session for rule in step.extract if rule['var']
+        }
+
+    def _resolve_dependencies(self) -> List[Tuple[int, ...]]:
+        dependencies = []
+        names: Dict[str, int] = {}
+        producers: Dict[str, int] = {}
+
+        for idx, step in enumerate(self.steps):
+            declared = step.step.get('dependsOn')
+            required = set()
+            if declared is None:
+                if idx > 0:
+                    required.add(idx - 1)
+            elif declared != 'auto':
+                for name in [declared] if isinstance(declared, str) else declared:
+                    if name in names:
+                        required.add(names[name])
+                    elif step.compile_error is None:
+                        step.compile_error = ValueError(f"dependsOn 引用了不存在或在其之后的步骤: {name}")
+
+            # 变量取最近一次 extract 的值，与顺序执行时一致
+            required.update(producers[var] for var in step.uses if var in producers)
+            dependencies.append(tuple(sorted(required)))
+
+            names[step.name] = idx
+            for rule in step.extract:
+                if rule['var']:
+                    producers[rule['var']] = idx
+
+        return dependencies
+
+
+def compile_flow(flow: List[Dict[str, Any]]) -> FlowPlan:
+    """把 flow JSON 编译为 FlowPlan"""
+    return FlowPlan(flow or [])
+
+
+class FlowPlanCache:
+    """按 (site_id, updated_at) 缓存的 FlowPlan LRU"""
+
+    def __init__(self, max_size: Optional[int] = None):
+        self._max_size = max_size
+        self._plans: "OrderedDict[Tuple[UUID, Optional[datetime]], FlowPlan]" = OrderedDict()
+        # 每个站点只保留一个版本：site_id -> 缓存 key
+        self._keys: Dict[UUID, Tuple[UUID, Optional[datetime]]] = {}
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size or get_settings().flow_plan_cache_size
+
+    def get(self, site_id: UUID, updated_at: Optional[datetime], flow: List[Dict[str, Any]]) -> FlowPlan:
+        """获取站点的 FlowPlan，未命中时编译并写入缓存"""
+        key = (site_id, updated_at)
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+            return plan
+
+        # 同一站点的旧版本不会再被命中，顺手清理
+        self.invalidate(site_id)
+
+        plan = compile_flow(flow)
+        self._plans[key] = plan
+        self._keys[site_id] = key
+        while len(self._plans) > self.max_size:
+            evicted, _ = self._plans.popitem(last=False)
+            self._keys.pop(evicted[0], None)
+        return plan
+
+    def invalidate(self, site_id: UUID):
+        """站点更新 / 删除时移除其缓存"""
+        key = self._keys.pop(site_id, None)
+        if key is not None:
+            self._plans.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+
+# 全局 FlowPlan 缓存
+flow_plan_cache = FlowPlanCache()
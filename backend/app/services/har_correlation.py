@@ -0,0 +1,167 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# 请求 / 响应中可能携带动态值的片段（token、id、签名等）
+TOKEN_PATTERN = re.compile(r'[^\s/?&=#;,"\'<>()\[\]{}]+')
+
+# 参与关联的值至少的长度，并且需要包含数字或足够长，避免把普通单词当成变量
+MIN_VALUE_LENGTH = 6
+MIN_WORD_LENGTH = 16
+
+# 这些响应头的值不作为变量来源
+IGNORED_RESPONSE_HEADERS = frozenset({
+    'date', 'expires', 'last-modified', 'age', 'server', 'connection', 'keep-alive',
+    'content-type', 'content-length', 'content-encoding', 'transfer-encoding',
+    'cache-control', 'pragma', 'vary', 'set-cookie', 'alt-svc', 'strict-transport-security',
+})
+
+# Cookie 由运行时的 cookie jar 维护，不做关联
+IGNORED_REQUEST_HEADERS = frozenset({
+    'host', 'content-length', 'connection', 'cookie', 'accept-encoding', 'accept-language',
+    'user-agent', 'origin', 'referer',
+})
+
+# 含数字但不是会话相关动态值的常见格式：日期 / 时间、版本号，在多个请求中共享会造成误关联
+DATE_LIKE = re.compile(
+    r'(\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{4})'
+    r'([T ]?\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?'
+    r'|\d{1,2}:\d{2}:\d{2}(\.\d+)?'
+)
+VERSION_LIKE = re.compile(r'[vV]?\d+(\.\d+){1,3}([-+._]?[A-Za-z][A-Za-z0-9.]*)?')
+# 10 / 13 位纯数字且落在 2000~2100 年之间时视为秒 / 毫秒时间戳
+TIMESTAMP_RANGE = (946684800, 4102444800)
+
+_VAR_INVALID = re.compile(r'\W+')
+
+
+def _is_timestamp(value: str) -> bool:
+    if not value.isdigit() or len(value) not in (10, 13):
+        return False
+    seconds = int(value[:10])
+    return TIMESTAMP_RANGE[0] <= seconds < TIMESTAMP_RANGE[1]
+
+
+def is_candidate(value: str) -> bool:
+    """看起来像动态值（token / id）的字符串，排除日期、版本号和时间戳"""
+    if len(value) < MIN_VALUE_LENGTH:
+        return False
+    if DATE_LIKE.fullmatch(value) or VERSION_LIKE.fullmatch(value) or _is_timestamp(value):
+        return False
+    return len(value) >= MIN_WORD_LENGTH or any(char.isdigit() for char in value)
+
+
+class CorrelationIndex:
+    """
+    响应值 → 来源的哈希索引
+
+    按请求顺序调用：先用 substitute 扫描当前请求（只会命中之前的响应），
+    再用 add_response 把当前响应的 JSON 叶子值和响应头加入索引。
+    每个值只做一次哈希查找，整体与 HAR 大小线性相关。
+    """
+
+    def __init__(self):
+        # 值 → (步骤下标, 类型, JSON 路径或响应头名)；同一个值以最近的响应为准
+        self._sources: Dict[str, Tuple[int, str, str]] = {}
+        # 来源 → 变量名
+        self._vars: Dict[Tuple[int, str, str], str] = {}
+        self._used_names: Dict[str, int] = {}
+        # 步骤下标 → 该步骤需要生成的 extract 规则
+        self._rules: Dict[int, List[Dict[str, Any]]] = {}
+        self.correlations: List[Dict[str, Any]] = []
+
+    def add_response(self, step_idx: int, headers: Optional[Dict[str, str]], body: Any):
+        """索引一次响应：响应头和 JSON 响应体的所有叶子值"""
+        for name, value in (headers or {}).items():
+            if name.lower() in IGNORED_RESPONSE_HEADERS or not isinstance(value, str):
+                continue
+            if is_candidate(value):
+                self._sources[value] = (step_idx, 'header', name)
+
+        if isinstance(body, str):
+            try:
+                body = json.loads(body)
+            except ValueError:
+                return
+        if not isinstance(body, (dict, list)):
+            return
+
+        stack: List[Tuple[Any, str]] = [(body, '')]
+        while stack:
+            node, path = stack.pop()
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    # extract_json_path 以点号分隔，含点号的 key 无法表示
+                    if '.' not in key:
+                        stack.append((value, f'{path}.{key}' if path else key))
+            elif isinstance(node, list):
+                for idx, value in enumerate(node):
+                    stack.append((value, f'{path}.{idx}' if path else str(idx)))
+            elif isinstance(node, (str, int, float)) and not isinstance(node, bool):
+                value = str(node)
+                if is_candidate(value):
+                    self._sources[value] = (step_idx, 'json', path)
+
+    def lookup(self, value: str, step_idx: int) -> Optional[str]:
+        """值来自之前某一步的响应时返回对应的变量名"""
+        source = self._sources.get(value)
+        if source is None or source[0] >= step_idx:
+            return None
+
+        var = self._vars.get(source)
+        if var is None:
+            var = self._name_for(source)
+            self._vars[source] = var
+            if source[1] == 'json':
+                rule = {'var': var, 'type': 'json', 'path': source[2]}
+            else:
+                rule = {'var': var, 'type': 'header', 'name': source[2]}
+            self._rules.setdefault(source[0], []).append(rule)
+            self.correlations.append({**rule, 'fromStep': source[0], 'toStep': step_idx})
+        return var
+
+    def substitute(self, text: str, step_idx: int) -> str:
+        """把字符串中来自之前响应的片段替换为 ${var}"""
+        if not text:
+            return text
+
+        var = self.lookup(text, step_idx)
+        if var is not None:
+            return f'${{{var}}}'
+
+        def replace(match):
+            token = match.group(0)
+            var = self.lookup(token, step_idx) if is_candidate(token) else None
+            return f'${{{var}}}' if var is not None else token
+
+        return TOKEN_PATTERN.sub(replace, text)
+
+    def substitute_value(self, value: Any, step_idx: int) -> Any:
+        """递归替换 JSON 请求体中的字符串（数字等非字符串值保持原类型）"""
+        if isinstance(value, str):
+            return self.substitute(value, step_idx)
+        if isinstance(value, dict):
+            return {key: self.substitute_value(item, step_idx) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.substitute_value(item, step_idx) for item in value]
+        return value
+
+    def extract_rules(self, step_idx: int) -> List[Dict[str, Any]]:
+        """某一步需要生成的 extract 规则"""
+        return self._rules.get(step_idx, [])
+
+    def _name_for(self, source: Tuple[int, str, str]) -> str:
+        """按 JSON 路径最后一段或响应头名生成变量名，重名时追加序号"""
+        location = source[2]
+        if source[1] == 'json':
+            keys = [key for key in location.split('.') if not key.isdigit()]
+            base = keys[-1] if keys else 'value'
+        else:
+            base = location
+        base = _VAR_INVALID.sub('_', base).strip('_').lower() or 'value'
+        if base[0].isdigit():
+            base = f'v_{base}'
+
+        count = self._used_names.get(base, 0) + 1
+        self._used_names[base] = count
+        return base if count == 1 else f'{base}_{count}'
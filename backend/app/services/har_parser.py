@@ -0,0 +1,214 @@
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterator, List
+
+# 每次从上传内容读取的字节数
+CHUNK_SIZE = 256 * 1024
+
+# 过滤静态资源和埋点
+STATIC_EXTENSIONS = frozenset({
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp',
+    '.css', '.js', '.map', '.woff', '.woff2', '.ttf',
+})
+ANALYTICS_PATTERN = re.compile(r'google-analytics|googletagmanager|doubleclick|sentry|datadog')
+
+_WHITESPACE = ' \t\r\n'
+_NEED_DATA = object()
+_decoder = json.JSONDecoder()
+
+
+class HarParseError(ValueError):
+    """HAR 文件格式错误"""
+
+
+def is_noise(url: str) -> bool:
+    """静态资源或埋点请求"""
+    path = url.split('#', 1)[0].split('?', 1)[0]
+    dot = path.rfind('.')
+    if dot != -1 and path[dot:] in STATIC_EXTENSIONS:
+        return True
+    return ANALYTICS_PATTERN.search(url) is not None
+
+
+def summarize_entry(entry: Dict[str, Any], max_response_bytes: int = 0) -> Dict[str, Any]:
+    """
+    HAR entry → 前端使用的请求摘要
+
+    max_response_bytes > 0 时附带不超过该长度的 JSON 响应体和响应头，供生成 Flow 时做变量关联
+    """
+    request = entry['request']
+    response = entry['response']
+    summary = {
+        'url': request['url'],
+        'method': request['method'],
+        'status': response['status'],
+        'headers': {h['name']: h['value'] for h in request.get('headers', [])},
+        'postData': (request.get('postData') or {}).get('text'),
+        'time': entry.get('time'),
+    }
+
+    if max_response_bytes > 0:
+        content = response.get('content') or {}
+        text = content.get('text')
+        if (
+            text and content.get('encoding') != 'base64'
+            and 'json' in (content.get('mimeType') or '')
+            and len(text) <= max_response_bytes
+        ):
+            summary['responseBody'] = text
+        summary['responseHeaders'] = {h['name']: h['value'] for h in response.get('headers', [])}
+
+    return summary
+
+
+class HarEntryParser:
+    """
+    增量 HAR 解析器
+
+    调用方分块 feed 上传内容，每次返回已完整读到的 log.entries 条目。
+    缓冲区只保留尚未解析完的部分，内存占用与单个 entry 的大小相关，与文件大小无关。
+    """
+
+    def __init__(self, max_entry_bytes: int):
+        self._text = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._max_value = max_entry_bytes
+        self._walker = self._walk()
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        """追加一块数据，返回新解析出的原始 entry"""
+        self._buf = self._buf[self._pos:] + self._text.decode(data)
+        self._pos = 0
+        return self._drive()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """输入结束，返回剩余 entry；内容不完整时抛出 HarParseError"""
+        self._buf = self._buf[self._pos:] + self._text.decode(b'', final=True)
+        self._pos = 0
+        self._eof = True
+        return self._drive()
+
+    def _drive(self) -> List[Dict[str, Any]]:
+        entries = []
+        if self._walker is None:
+            return entries
+        while True:
+            try:
+                item = next(self._walker)
+            except StopIteration:
+                self._walker = None
+                return entries
+            if item is _NEED_DATA:
+                return entries
+            entries.append(item)
+
+    # 以下方法都是生成器：数据不足时 yield _NEED_DATA，等待下一次 feed
+
+    def _peek(self):
+        """跳过空白，返回下一个字符（输入结束时返回空串）"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if self._eof:
+                return ''
+            yield _NEED_DATA
+
+    def _expect(self, char: str):
+        actual = yield from self._peek()
+        if actual != char:
+            raise HarParseError(f"期望 '{char}'，实际为 '{actual or 'EOF'}'")
+        self._pos += 1
+
+    def _skip_comma(self):
+        if (yield from self._peek()) == ',':
+            self._pos += 1
+
+    def _value(self):
+        """读取一个完整的 JSON 值"""
+        yield from self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+                # 数字等值可能恰好被截断在缓冲区末尾，需要更多数据确认
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise HarParseError(f"JSON 格式错误: {e.msg}") from e
+            pending = len(self._buf) - self._pos
+            if pending > self._max_value:
+                raise HarParseError("单个 HAR 条目过大")
+            # 缓冲区至少翻倍后再重试，避免对大值反复从头解析
+            target = max(pending * 2, CHUNK_SIZE)
+            while len(self._buf) - self._pos < target and not self._eof:
+                yield _NEED_DATA
+
+    def _walk(self):
+        """顶层对象中只展开 log，log 中只展开 entries，其余值读取后立即丢弃"""
+        yield from self._expect('{')
+        while (yield from self._peek()) != '}':
+            key = yield from self._value()
+            yield from self._expect(':')
+            if key == 'log':
+                yield from self._walk_log()
+            else:
+                yield from self._value()
+            yield from self._skip_comma()
+        yield from self._expect('}')
+
+    def _walk_log(self):
+        yield from self._expect('{')
+        while (yield from self._peek()) != '}':
+            key = yield from self._value()
+            yield from self._expect(':')
+            if key == 'entries':
+                yield from self._expect('[')
+                while (yield from self._peek()) != ']':
+                    entry = yield from self._value()
+                    if isinstance(entry, dict):
+                        yield entry
+                    yield from self._skip_comma()
+                yield from self._expect(']')
+            else:
+                yield from self._value()
+            yield from self._skip_comma()
+        yield from self._expect('}')
+
+
+class HarRequestFilter:
+    """把增量解析出的 entry 过滤为请求摘要（在线程池中调用 feed / close）"""
+
+    def __init__(self, max_entry_bytes: int, max_response_bytes: int = 0):
+        self._parser = HarEntryParser(max_entry_bytes)
+        self._max_response = max_response_bytes
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        return self._filter(self._parser.feed(data))
+
+    def close(self) -> List[Dict[str, Any]]:
+        return self._filter(self._parser.close())
+
+    def _filter(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results = []
+        for entry in entries:
+            try:
+                url = entry['request']['url']
+                if not is_noise(url):
+                    results.append(summarize_entry(entry, self._max_response))
+            except (KeyError, TypeError):
+                continue
+        return results
+
+
+def iter_har_entries(chunks: Iterator[bytes], max_entry_bytes: int) -> Iterator[Dict[str, Any]]:
+    """同步版本：逐条产出原始 entry"""
+    parser = HarEntryParser(max_entry_bytes)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -0,0 +1,200 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import get_settings
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class HostUnavailableError(Exception):
+    """目标主机熔断中或限流排队过长，retry_after 秒后再试"""
+
+    def __init__(self, host: str, reason: str, retry_after: float):
+        super().__init__(f"{host} {reason}，{retry_after:.0f}s 后重试")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    令牌桶（预约式）
+
+    reserve() 立即扣减一个令牌并返回需要等待的秒数，令牌可以为负，
+    排在后面的请求自然得到更长的等待时间，不需要锁
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def cancel(self):
+        """归还 reserve() 扣减的令牌"""
+        self.tokens += 1
+
+
+class RetryBudget:
+    """
+    重试预算
+
+    每个完成的请求存入 ratio 个令牌，每次重试取出一个，最多累积 burst 个。
+    主机整体故障时重试量被限制在请求量的 ratio 倍以内，避免重试放大故障
+    """
+
+    def __init__(self, ratio: float, burst: int):
+        self.ratio = ratio
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+
+    def deposit(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后打开，期间请求直接失败；open_seconds 后进入半开状态，
+    只放行一个探测请求：成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, failure_threshold: int, open_seconds: float):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self) -> Optional[float]:
+        """允许请求时返回 None，否则返回建议的重试等待秒数"""
+        if self.state == OPEN:
+            remaining = self.opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                return remaining
+            self.state = HALF_OPEN
+            self.probing = False
+
+        if self.state == HALF_OPEN:
+            if self.probing:
+                return self.open_seconds
+            self.probing = True
+        return None
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self):
+        """请求未完成（被取消 / 被限流拒绝），不计入结果"""
+        self.probing = False
+
+
+class HostGuard:
+    """进程级的单主机限流和熔断，所有站点共享"""
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._retry_budgets: Dict[str, RetryBudget] = {}
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            settings = get_settings()
+            breaker = CircuitBreaker(settings.host_breaker_failures, settings.host_breaker_open_seconds)
+            self._breakers[host] = breaker
+        return breaker
+
+    async def acquire(self, host: str):
+        """请求前调用：熔断中或需要排队过久时抛出 HostUnavailableError，否则按令牌桶等待"""
+        settings = get_settings()
+        breaker = self._breaker(host)
+        retry_after = breaker.allow()
+        if retry_after is not None:
+            raise HostUnavailableError(host, '熔断中', retry_after)
+
+        if settings.host_rate_per_second <= 0:
+            return
+
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(settings.host_rate_per_second, settings.host_burst)
+            self._buckets[host] = bucket
+
+        delay = bucket.reserve()
+        if delay > settings.host_max_wait_seconds:
+            # 不占着 worker 排长队，把容量留给健康的主机
+            bucket.cancel()
+            breaker.release()
+            raise HostUnavailableError(host, '限流排队过长', delay)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+
+    def _retry_budget(self, host: str) -> RetryBudget:
+        budget = self._retry_budgets.get(host)
+        if budget is None:
+            settings = get_settings()
+            budget = RetryBudget(settings.host_retry_ratio, settings.host_retry_burst)
+            self._retry_budgets[host] = budget
+        return budget
+
+    def allow_retry(self, host: str) -> bool:
+        """重试前调用：主机的重试预算耗尽时返回 False"""
+        return self._retry_budget(host).withdraw()
+
+    def record(self, host: str, ok: bool):
+        """请求结束后调用：连接错误、超时、5xx、429 计为失败"""
+        self._retry_budget(host).deposit()
+        breaker = self._breaker(host)
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    def release(self, host: str):
+        self._breaker(host).release()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各主机的熔断状态"""
+        return {
+            host: {
+                'state': breaker.state,
+                'failures': breaker.failures,
+                'retry_tokens': round(self._retry_budget(host).tokens, 2),
+            }
+            for host, breaker in self._breakers.items()
+        }
+
+
+# 全局实例
+host_guard = HostGuard()
@@ -0,0 +1,170 @@
+import asyncio
+import time
+import urllib.request
+from typing import Callable, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import get_settings
+
+# (scheme, host, port, verify, proxy, http2)
+PoolKey = Tuple[str, str, int, bool, Optional[str], bool]
+
+
+class _PoolEntry:
+    """单个 host 的长连接 transport"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+        self.last_used = time.monotonic()
+        self.active = 0
+
+
+class HttpClientPool:
+    """
+    进程级 HTTP 连接池注册表
+
+    按 (host, TLS, 代理) 维度复用 transport，保持 keep-alive 连接；
+    每次运行通过 client() 获得独立的 AsyncClient（独立 cookie jar 和 headers），
+    只共享底层连接，站点之间的 cookie / 认证信息互不影响。
+    """
+
+    def __init__(self, transport_factory: Optional[Callable[[PoolKey], httpx.AsyncBaseTransport]] = None):
+        self._entries: Dict[PoolKey, _PoolEntry] = {}
+        self._lock = asyncio.Lock()
+        self._last_sweep = time.monotonic()
+        self._transport_factory = transport_factory or self._create_transport
+
+    def _build_key(self, url: httpx.URL, verify: bool = True) -> PoolKey:
+        settings = get_settings()
+        scheme = url.scheme
+        host = url.host
+        port = url.port or (443 if scheme == 'https' else 80)
+
+        proxy = settings.http_proxy or None
+        if proxy is None:
+            # 与 httpx 默认行为一致：遵循 HTTP(S)_PROXY / NO_PROXY 环境变量
+            env_proxies = urllib.request.getproxies()
+            if env_proxies.get(scheme) and not urllib.request.proxy_bypass(host):
+                proxy = env_proxies[scheme]
+
+        return (scheme, host, port, verify, proxy, settings.http_pool_http2)
+
+    def _create_transport(self, key: PoolKey) -> httpx.AsyncBaseTransport:
+        settings = get_settings()
+        _, _, _, verify, proxy, http2 = key
+
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("[HttpPool] 未安装 h2，HTTP/2 已降级为 HTTP/1.1", flush=True)
+                http2 = False
+
+        limits = httpx.Limits(
+            max_connections=settings.http_pool_max_connections_per_host,
+            max_keepalive_connections=settings.http_pool_max_keepalive_per_host,
+            keepalive_expiry=settings.http_pool_keepalive_expiry,
+        )
+        return httpx.AsyncHTTPTransport(verify=verify, http2=http2, limits=limits, proxy=proxy)
+
+    def _acquire(self, url: httpx.URL, verify: bool = True) -> _PoolEntry:
+        key = self._build_key(url, verify)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _PoolEntry(self._transport_factory(key))
+            self._entries[key] = entry
+        entry.active += 1
+        entry.last_used = time.monotonic()
+        return entry
+
+    def _release(self, entry: _PoolEntry):
+        entry.active -= 1
+        entry.last_used = time.monotonic()
+
+    async def evict_idle(self, force: bool = False):
+        """关闭长时间空闲的 host transport"""
+        settings = get_settings()
+        now = time.monotonic()
+        if not force and now - self._last_sweep < settings.http_pool_sweep_interval:
+            return
+        self._last_sweep = now
+
+        async with self._lock:
+            idle_keys = [
+                key for key, entry in self._entries.items()
+                if entry.active == 0 and now - entry.last_used > settings.http_pool_idle_seconds
+            ]
+            for key in idle_keys:
+                entry = self._entries.pop(key)
+                await entry.transport.aclose()
+
+    def client(self, verify: bool = True, **kwargs) -> httpx.AsyncClient:
+        """创建一个共享连接池的 AsyncClient（关闭它不会关闭底层连接）"""
+        # 代理已在 _build_key 中按 host 解析并交给共享 transport；
+        # 关闭 trust_env，避免 httpx 按环境变量另挂代理 transport 绕过连接池
+        kwargs.setdefault('trust_env', False)
+        return httpx.AsyncClient(transport=_PooledTransport(self, verify), **kwargs)
+
+    def stats(self) -> dict:
+        """连接池统计"""
+        return {
+            'hosts': len(self._entries),
+            'active': sum(entry.active for entry in self._entries.values()),
+        }
+
+    async def aclose(self):
+        """关闭所有 transport（应用退出时调用）"""
+        async with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            for entry in entries:
+                await entry.transport.aclose()
+
+
+class _PooledTransport(httpx.AsyncBaseTransport):
+    """按请求 host 路由到共享 transport 的轻量代理"""
+
+    def __init__(self, pool: HttpClientPool, verify: bool = True):
+        self._pool = pool
+        self._verify = verify
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._pool.evict_idle()
+        entry = self._pool._acquire(request.url, self._verify)
+        try:
+            response = await entry.transport.handle_async_request(request)
+        except BaseException:
+            self._pool._release(entry)
+            raise
+
+        # 响应体读取完毕（或关闭）后再释放，避免空闲回收关闭正在使用的连接
+        response.stream = _ReleasingStream(response.stream, lambda: self._pool._release(entry))
+        return response
+
+    async def aclose(self):
+        # 底层连接由连接池统一管理
+        pass
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._on_close()
+
+
+# 全局连接池实例
+http_pool = HttpClientPool()
@@ -0,0 +1,180 @@
+import hashlib
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from uuid import UUID
+
+from app.core.config import get_settings
+
+
+def site_host(site: Any) -> str:
+    """站点请求的目标主机：优先 base_url，其次第一个步骤的 URL"""
+    first_url = None
+    flow = getattr(site, 'flow', None)
+    if isinstance(flow, list) and flow and isinstance(flow[0], dict):
+        first_url = flow[0].get('url')
+    return host_from_urls(getattr(site, 'base_url', None), first_url)
+
+
+def host_from_urls(*urls: Optional[str]) -> str:
+    """返回第一个能确定主机名的 URL 的主机"""
+    for url in urls:
+        if not url:
+            continue
+        host = urlparse(url if '://' in url else f'//{url}').hostname
+        # 主机名中含模板变量时无法确定
+        if host and '$' not in host and '{' not in host:
+            return host
+    return ''
+
+
+def _stable_hash(*parts: Any) -> int:
+    """与进程无关的稳定哈希（内置 hash 对字符串有随机化）"""
+    digest = hashlib.sha256(':'.join(str(part) for part in parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def _find(next_free: Dict[int, int], slot: int) -> int:
+    """返回 slot 之后（含）第一个未被标记为已满的槽位，并压缩路径"""
+    root = slot
+    while root in next_free:
+        root = next_free[root]
+    while slot != root:
+        next_free[slot], slot = root, next_free[slot]
+    return root
+
+
+class LoadPlacer:
+    """
+    dailyAfter 任务的负载均衡放置
+
+    把一天划分为固定长度的槽位，每个站点在允许的窗口 [hour:minute, +window] 内选择槽位：
+    从按 (站点, 日期) 哈希得到的首选槽位开始顺序探测（到窗口末尾后回绕），选第一个同时满足
+    全局速率和单主机速率上限的槽位；窗口内全部已满时使用首选槽位（哈希本身是均匀的）。
+    探测通过每个 (日期, 主机) 的"下一个可用槽位"并查集跳过已满槽位，摊还接近 O(1)。
+    同一站点同一天的结果会被记住，重复调度得到相同的时间。
+    """
+
+    def __init__(self):
+        # (日期, 槽位) → 已放置数量
+        self._slot_load: Dict[Tuple[date, int], int] = defaultdict(int)
+        # (日期, 槽位, 主机) → 已放置数量
+        self._host_load: Dict[Tuple[date, int, str], int] = defaultdict(int)
+        # 站点 → (日期, 槽位, 主机, 窗口, 执行时间)
+        self._assignments: Dict[UUID, Tuple[date, int, str, Tuple[int, int], datetime]] = {}
+        # (日期, 主机) → 槽位 → 下一个候选槽位（并查集，未出现的槽位指向自己）
+        self._next_free: Dict[Tuple[date, str], Dict[int, int]] = {}
+        self._pruned_day: Optional[date] = None
+
+    def _caps(self) -> Tuple[int, int, int]:
+        settings = get_settings()
+        slot_seconds = max(int(settings.schedule_slot_seconds), 1)
+        global_cap = max(settings.schedule_global_rate_per_minute * slot_seconds // 60, 1)
+        host_cap = max(settings.schedule_host_rate_per_minute * slot_seconds // 60, 1)
+        return slot_seconds, global_cap, host_cap
+
+    def place(self, site_id: UUID, host: str, window_start: datetime, window_seconds: int) -> datetime:
+        """在 [window_start, window_start + window_seconds] 内为站点选择执行时间"""
+        slot_seconds, global_cap, host_cap = self._caps()
+        day = window_start.date()
+        midnight = datetime.combine(day, datetime.min.time())
+        first_slot = int((window_start - midnight).total_seconds()) // slot_seconds
+        slot_count = max(window_seconds // slot_seconds, 0) + 1
+        window = (first_slot, slot_count)
+
+        existing = self._assignments.get(site_id)
+        if existing and existing[0] == day and existing[2] == host and existing[3] == window:
+            return existing[4]
+        if existing and existing[4] <= datetime.now():
+            # 已经执行过的放置保留在计数中，避免同一槽位被再次排满
+            del self._assignments[site_id]
+        else:
+            self.release(site_id)
+        self._prune(datetime.now().date())
+
+        preferred = first_slot + _stable_hash(site_id, day) % slot_count
+        next_free = self._next_free.setdefault((day, host), {})
+        chosen = self._probe(next_free, day, host, preferred, first_slot + slot_count, global_cap, host_cap)
+        if chosen is None:
+            chosen = self._probe(next_free, day, host, first_slot, preferred, global_cap, host_cap)
+        if chosen is None:
+            # 窗口内都已满：留在首选槽位，超出部分仍按哈希均匀分布
+            chosen = preferred
+
+        # 槽位内再按哈希错开到秒，但不超出窗口
+        offset = _stable_hash(site_id, day, 'offset') % slot_seconds
+        run_at = max(midnight + timedelta(seconds=chosen * slot_seconds + offset), window_start)
+        run_at = min(run_at, window_start + timedelta(seconds=window_seconds))
+
+        self._slot_load[(day, chosen)] += 1
+        self._host_load[(day, chosen, host)] += 1
+        self._assignments[site_id] = (day, chosen, host, window, run_at)
+        return run_at
+
+    def _probe(
+        self,
+        next_free: Dict[int, int],
+        day: date,
+        host: str,
+        start: int,
+        end: int,
+        global_cap: int,
+        host_cap: int,
+    ) -> Optional[int]:
+        """在 [start, end) 中找第一个全局和主机都未满的槽位，沿途把已满槽位并到下一个"""
+        slot = _find(next_free, start)
+        while slot < end:
+            if self._slot_load.get((day, slot), 0) < global_cap and self._host_load.get((day, slot, host), 0) < host_cap:
+                return slot
+            next_free[slot] = slot + 1
+            slot = _find(next_free, slot)
+        return None
+
+    def reserve(self, site_id: UUID, host: str, run_at: datetime):
+        """按已确定的执行时间占用槽位（启动时恢复持久化的 next_run_at）"""
+        slot_seconds = self._caps()[0]
+        day = run_at.date()
+        midnight = datetime.combine(day, datetime.min.time())
+        slot = int((run_at - midnight).total_seconds()) // slot_seconds
+
+        self.release(site_id)
+        self._prune(datetime.now().date())
+        self._slot_load[(day, slot)] += 1
+        self._host_load[(day, slot, host)] += 1
+        # 窗口未知，下次 place 时会重新放置
+        self._assignments[site_id] = (day, slot, host, None, run_at)
+
+    def release(self, site_id: UUID):
+        """释放站点占用的槽位（重新调度 / 取消调度时调用）"""
+        existing = self._assignments.pop(site_id, None)
+        if existing is None:
+            return
+        day, slot, host = existing[:3]
+        if self._slot_load.get((day, slot), 0) >= self._caps()[1]:
+            # 全局已满的槽位重新可用：所有主机的跳表都可能把它标记为已满，丢弃当天全部跳表
+            for key in [key for key in self._next_free if key[0] == day]:
+                del self._next_free[key]
+        else:
+            # 只可能是该主机的上限变为未满，丢弃该主机的跳表（按需重建）
+            self._next_free.pop((day, host), None)
+        for counter, key in ((self._slot_load, (day, slot)), (self._host_load, (day, slot, host))):
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+
+    def _prune(self, today: date):
+        """丢弃今天之前的槽位计数"""
+        if self._pruned_day == today:
+            return
+        self._pruned_day = today
+        for key in [key for key in self._slot_load if key[0] < today]:
+            del self._slot_load[key]
+        for key in [key for key in self._host_load if key[0] < today]:
+            del self._host_load[key]
+        for key in [key for key in self._next_free if key[0] < today]:
+            del self._next_free[key]
+
+    def host_of(self, site_id: UUID) -> Optional[str]:
+        existing = self._assignments.get(site_id)
+        return existing[2] if existing else None
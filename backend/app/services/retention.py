@@ -0,0 +1,182 @@
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, delete, update, func, null, cast, String
+
+from app.core.config import get_settings
+from app.db.models import Run, RunStep, RunQueueItem, SiteDailyStats
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """最近秩百分位数"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+async def rollup_day(session, day: date) -> int:
+    """把某一天的运行汇总到 site_daily_stats（可重复执行），返回写入的站点数"""
+    start = datetime.combine(day, time.min)
+    result = await session.execute(
+        select(Run.site_id, Run.status, Run.auth_failed, Run.started_at, Run.finished_at)
+        .where(Run.started_at >= start, Run.started_at < start + timedelta(days=1))
+    )
+
+    counters: Dict[UUID, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    durations: Dict[UUID, List[float]] = defaultdict(list)
+    for site_id, status, auth_failed, started_at, finished_at in result.all():
+        counter = counters[site_id]
+        counter['total'] += 1
+        if status == 'SUCCESS':
+            counter['success'] += 1
+        elif status == 'SKIPPED':
+            counter['skipped'] += 1
+        elif status != 'RUNNING':
+            counter['failed'] += 1
+        if auth_failed:
+            counter['auth_failed'] += 1
+        if started_at and finished_at:
+            durations[site_id].append((finished_at - started_at).total_seconds() * 1000)
+
+    await session.execute(delete(SiteDailyStats).where(SiteDailyStats.day == day))
+    for site_id, counter in counters.items():
+        values = sorted(durations[site_id])
+        session.add(SiteDailyStats(
+            site_id=site_id,
+            day=day,
+            total=counter['total'],
+            success=counter['success'],
+            failed=counter['failed'],
+            skipped=counter['skipped'],
+            auth_failed=counter['auth_failed'],
+            p50_ms=_percentile(values, 50),
+            p95_ms=_percentile(values, 95),
+            max_ms=values[-1] if values else None,
+        ))
+    await session.commit()
+    return len(counters)
+
+
+async def rollup_completed_days(session) -> int:
+    """汇总上次汇总之后所有已结束的日期（不含今天），返回处理的天数"""
+    today = datetime.now().date()
+
+    last_day = (await session.execute(select(func.max(SiteDailyStats.day)))).scalar()
+    if last_day is not None:
+        day = last_day + timedelta(days=1)
+    else:
+        first_run = (await session.execute(select(func.min(Run.started_at)))).scalar()
+        if first_run is None:
+            return 0
+        day = first_run.date()
+
+    days = 0
+    while day < today:
+        await rollup_day(session, day)
+        day += timedelta(days=1)
+        days += 1
+        await asyncio.sleep(0)
+    return days
+
+
+async def _delete_in_batches(session, id_query, delete_stmt_factory, batch_size: int) -> int:
+    """按批次删除 / 更新：每批单独提交，避免长时间持有写锁"""
+    total = 0
+    while True:
+        ids = (await session.execute(id_query.limit(batch_size))).scalars().all()
+        if not ids:
+            return total
+        await session.execute(delete_stmt_factory(ids))
+        await session.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+        await asyncio.sleep(0)
+
+
+async def compact_run_details(session, cutoff: datetime, batch_size: int) -> Tuple[int, int]:
+    """删除 cutoff 之前运行的步骤详情，只保留 Run 摘要行"""
+    steps = await _delete_in_batches(
+        session,
+        select(RunStep.id).join(Run, RunStep.run_id == Run.id).where(Run.started_at < cutoff),
+        lambda ids: delete(RunStep).where(RunStep.id.in_(ids)),
+        batch_size,
+    )
+    # 旧版存储在 Run.steps 中的详情
+    legacy = await _delete_in_batches(
+        session,
+        # JSON 列中的 None 存储为 'null' 文本，需要一并排除
+        select(Run.id).where(Run.started_at < cutoff, Run.steps.isnot(None), cast(Run.steps, String) != 'null'),
+        lambda ids: update(Run).where(Run.id.in_(ids)).values(steps=null()),
+        batch_size,
+    )
+    return steps, legacy
+
+
+async def purge_runs(session, cutoff: datetime, batch_size: int) -> int:
+    """删除 cutoff 之前的运行及其步骤（此前已汇总到 site_daily_stats）"""
+    total = 0
+    while True:
+        ids = (await session.execute(
+            select(Run.id).where(Run.started_at < cutoff).limit(batch_size)
+        )).scalars().all()
+        if not ids:
+            return total
+        await session.execute(delete(RunStep).where(RunStep.run_id.in_(ids)))
+        await session.execute(delete(Run).where(Run.id.in_(ids)))
+        await session.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+        await asyncio.sleep(0)
+
+
+async def run_retention() -> dict:
+    """执行一次完整的保留策略：汇总 → 删除旧运行 → 压缩详情 → 增量 VACUUM"""
+    from app.db.session import async_session, engine
+
+    settings = get_settings()
+    now = datetime.now()
+    batch_size = settings.retention_batch_size
+
+    async with async_session() as session:
+        rolled_up = await rollup_completed_days(session)
+
+        purged = await purge_runs(
+            session, now - timedelta(days=settings.retention_summary_days), batch_size
+        )
+        steps, legacy = await compact_run_details(
+            session, now - timedelta(days=settings.retention_detail_days), batch_size
+        )
+        queue_items = await _delete_in_batches(
+            session,
+            select(RunQueueItem.id).where(
+                RunQueueItem.status.in_(['DONE', 'FAILED']),
+                RunQueueItem.finished_at < datetime.utcnow() - timedelta(days=settings.retention_detail_days),
+            ),
+            lambda ids: delete(RunQueueItem).where(RunQueueItem.id.in_(ids)),
+            batch_size,
+        )
+
+    if engine.dialect.name == 'sqlite' and settings.retention_vacuum_pages > 0:
+        # 仅在 auto_vacuum=INCREMENTAL 的数据库上生效，否则为空操作
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(settings.retention_vacuum_pages)})")
+            # 需要取完结果，SQLite 才会执行完所有页的回收
+            if result.returns_rows:
+                result.fetchall()
+            await conn.commit()
+
+    stats = {
+        'rolledUpDays': rolled_up,
+        'compactedSteps': steps,
+        'compactedLegacyRuns': legacy,
+        'purgedRuns': purged,
+        'purgedQueueItems': queue_items,
+    }
+    print(f"[Retention] 完成: {stats}", flush=True)
+    return stats
@@ -0,0 +1,259 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, update
+
+from app.core.config import get_settings
+from app.db.models import RunQueueItem
+
+# 队列项状态
+QUEUE_PENDING = 'PENDING'
+QUEUE_LEASED = 'LEASED'
+QUEUE_DONE = 'DONE'
+QUEUE_FAILED = 'FAILED'
+
+
+async def enqueue(site_id: UUID, trigger: str = 'scheduled', priority: int = 10) -> UUID:
+    """写入一条待执行运行（API 进程在 queue 模式下只做这一步）"""
+    from app.db.session import async_session
+
+    item = RunQueueItem(site_id=site_id, trigger=trigger, priority=priority)
+    async with async_session() as session:
+        session.add(item)
+        await session.commit()
+    return item.id
+
+
+async def claim(owner: str, lease_seconds: int) -> Optional[Tuple[UUID, UUID, str]]:
+    """
+    领取一条到期的队列项，返回 (item_id, site_id, trigger)
+
+    先选出候选行，再用带状态条件的 UPDATE 抢占；多个进程同时抢同一行时只有一个 rowcount == 1。
+    """
+    from app.db.session import async_session
+
+    for _ in range(3):
+        async with async_session() as session:
+            now = datetime.utcnow()
+            result = await session.execute(
+                select(RunQueueItem.id, RunQueueItem.site_id, RunQueueItem.trigger)
+                .where(RunQueueItem.status == QUEUE_PENDING, RunQueueItem.available_at <= now)
+                .order_by(RunQueueItem.priority, RunQueueItem.enqueued_at)
+                .limit(1)
+            )
+            candidate = result.first()
+            if candidate is None:
+                return None
+
+            claimed = await session.execute(
+                update(RunQueueItem)
+                .where(RunQueueItem.id == candidate.id, RunQueueItem.status == QUEUE_PENDING)
+                .values(
+                    status=QUEUE_LEASED,
+                    lease_owner=owner,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    attempts=RunQueueItem.attempts + 1,
+                )
+            )
+            await session.commit()
+
+            if claimed.rowcount == 1:
+                return candidate.id, candidate.site_id, candidate.trigger
+
+    return None
+
+
+async def heartbeat(item_id: UUID, owner: str, lease_seconds: int) -> bool:
+    """续租，返回 False 表示租约已丢失"""
+    from app.db.session import async_session
+
+    async with async_session() as session:
+        result = await session.execute(
+            update(RunQueueItem)
+            .where(
+                RunQueueItem.id == item_id,
+                RunQueueItem.status == QUEUE_LEASED,
+                RunQueueItem.lease_owner == owner,
+            )
+            .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+
+async def complete(item_id: UUID, owner: str, result: dict):
+    """标记队列项完成"""
+    from app.db.session import async_session
+
+    run_id = result.get('run_id')
+    failed = result.get('status') == 'error'
+
+    async with async_session() as session:
+        await session.execute(
+            update(RunQueueItem)
+            .where(RunQueueItem.id == item_id, RunQueueItem.lease_owner == owner)
+            .values(
+                status=QUEUE_FAILED if failed else QUEUE_DONE,
+                run_id=UUID(run_id) if run_id else None,
+                error=result.get('message') if failed else None,
+                finished_at=datetime.utcnow(),
+                lease_expires_at=None,
+            )
+        )
+        await session.commit()
+
+
+async def defer(item_id: UUID, owner: str, result: dict, retry_after: float, max_retries: int) -> bool:
+    """
+    运行因目标主机熔断 / 步骤长退避结束：把队列项放回 PENDING，retry_after 秒后再被领取
+
+    重跑次数按队列项的 attempts 计，超过 max_retries 时不再放回并返回 False
+    """
+    from app.db.session import async_session
+
+    run_id = result.get('run_id')
+    async with async_session() as session:
+        deferred = await session.execute(
+            update(RunQueueItem)
+            .where(
+                RunQueueItem.id == item_id,
+                RunQueueItem.lease_owner == owner,
+                RunQueueItem.attempts <= max_retries,
+            )
+            .values(
+                status=QUEUE_PENDING,
+                run_id=UUID(run_id) if run_id else None,
+                # 稍晚于熔断恢复时间，让探测请求先完成
+                available_at=datetime.utcnow() + timedelta(seconds=retry_after + 1),
+                lease_owner=None,
+                lease_expires_at=None,
+            )
+        )
+        await session.commit()
+    return deferred.rowcount == 1
+
+
+async def requeue_expired(max_attempts: int) -> int:
+    """把租约过期的队列项放回 PENDING（超过最大尝试次数则标记 FAILED）"""
+    from app.db.session import async_session
+
+    async with async_session() as session:
+        now = datetime.utcnow()
+        expired = (RunQueueItem.status == QUEUE_LEASED) & (RunQueueItem.lease_expires_at < now)
+
+        failed = await session.execute(
+            update(RunQueueItem)
+            .where(expired, RunQueueItem.attempts >= max_attempts)
+            .values(status=QUEUE_FAILED, error='租约过期次数过多', finished_at=now, lease_owner=None)
+        )
+        requeued = await session.execute(
+            update(RunQueueItem)
+            .where(expired)
+            .values(status=QUEUE_PENDING, lease_owner=None, lease_expires_at=None, available_at=now)
+        )
+        await session.commit()
+
+    if failed.rowcount:
+        print(f"[RunQueue] ❌ {failed.rowcount} 个队列项租约多次过期，已标记失败", flush=True)
+    if requeued.rowcount:
+        print(f"[RunQueue] ♻️ 已重新入队 {requeued.rowcount} 个租约过期的队列项", flush=True)
+    return requeued.rowcount
+
+
+class QueueConsumer:
+    """
+    队列消费者（运行在独立的 worker 进程中）
+
+    最多同时执行 concurrency 个运行，执行期间定期续租；
+    同时负责回收其他进程遗留的过期租约。
+    """
+
+    def __init__(self, concurrency: int = 4, owner: Optional[str] = None):
+        from app.services.worker import Worker
+
+        self.concurrency = concurrency
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.worker = Worker()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run_forever(self):
+        settings = get_settings()
+        print(f"[RunQueue] 消费者 {self.owner} 启动，并发={self.concurrency}", flush=True)
+        reaper = asyncio.create_task(self._reap_loop())
+        tasks = set()
+
+        try:
+            while not self._stopping.is_set():
+                await self._slots.acquire()
+                try:
+                    claimed = await claim(self.owner, settings.run_queue_lease_seconds)
+                except Exception as e:
+                    print(f"[RunQueue] ❌ 领取失败: {e}", flush=True)
+                    claimed = None
+
+                if claimed is None:
+                    self._slots.release()
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), timeout=settings.run_queue_poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                task = asyncio.create_task(self._execute(*claimed))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            reaper.cancel()
+            await asyncio.gather(reaper, *tasks, return_exceptions=True)
+
+    async def _execute(self, item_id: UUID, site_id: UUID, trigger: str):
+        beat = asyncio.create_task(self._heartbeat_loop(item_id))
+        try:
+            try:
+                result = await self.worker.run_site(site_id, trigger=trigger)
+            except Exception as e:
+                result = {'status': 'error', 'message': str(e)}
+
+            # 与进程内调度器一致：定时运行因熔断 / 长退避结束时稍后重跑
+            retry_after = result.get('retry_after')
+            if (
+                trigger == 'scheduled'
+                and result.get('run_status') in ('CIRCUIT_OPEN', 'RETRYING')
+                and retry_after is not None
+                and await defer(item_id, self.owner, result, retry_after, get_settings().circuit_retry_max)
+            ):
+                print(f"[RunQueue] 🔁 队列项 {item_id} 将在 {retry_after:.0f}s 后重跑: site_id={site_id}", flush=True)
+            else:
+                await complete(item_id, self.owner, result)
+        finally:
+            beat.cancel()
+            self._slots.release()
+
+    async def _heartbeat_loop(self, item_id: UUID):
+        settings = get_settings()
+        interval = max(settings.run_queue_lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await heartbeat(item_id, self.owner, settings.run_queue_lease_seconds):
+                    print(f"[RunQueue] ⚠️ 队列项 {item_id} 租约已丢失", flush=True)
+                    return
+            except Exception as e:
+                print(f"[RunQueue] ❌ 续租失败: {item_id}, {e}", flush=True)
+
+    async def _reap_loop(self):
+        settings = get_settings()
+        while True:
+            try:
+                await requeue_expired(settings.run_queue_max_attempts)
+            except Exception as e:
+                print(f"[RunQueue] ❌ 回收过期租约失败: {e}", flush=True)
+            await asyncio.sleep(max(settings.run_queue_lease_seconds / 2, 1))
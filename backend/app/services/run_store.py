@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Run, RunStep, Site
+from app.utils.compression import compress_json, decompress_json
+
+# 单独成列的步骤字段，其余字段进入压缩 payload
+STEP_COLUMNS = ('name', 'status', 'status_code', 'elapsed_ms')
+
+
+class RunOutcome:
+    """一次运行的最终结果，对应 Run / RunStep / Site.last_run_* 的一次写入"""
+
+    def __init__(
+        self,
+        run_id: UUID,
+        site_id: UUID,
+        status: str,
+        finished_at: datetime,
+        summary: str,
+        auth_failed: bool = False,
+        steps: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.run_id = run_id
+        self.site_id = site_id
+        self.status = status
+        self.finished_at = finished_at
+        self.summary = summary
+        self.auth_failed = auth_failed
+        self.steps = steps or []
+
+
+def build_step_rows(run_id: UUID, steps: List[Dict[str, Any]]) -> List[RunStep]:
+    """把 FlowResult.steps 转为 run_steps 行"""
+    rows = []
+    for idx, step in enumerate(steps):
+        payload = {key: value for key, value in step.items() if key not in STEP_COLUMNS}
+        rows.append(RunStep(
+            run_id=run_id,
+            idx=idx,
+            name=step.get('name'),
+            status=step.get('status', ''),
+            status_code=step.get('status_code'),
+            elapsed_ms=step.get('elapsed_ms'),
+            payload=compress_json(payload) if payload else None,
+        ))
+    return rows
+
+
+def step_row_to_dict(row: RunStep) -> Dict[str, Any]:
+    """还原为与旧版 Run.steps 相同结构的字典"""
+    step = {'name': row.name, 'status': row.status}
+    if row.status_code is not None:
+        step['status_code'] = row.status_code
+    if row.elapsed_ms is not None:
+        step['elapsed_ms'] = row.elapsed_ms
+    step.update(decompress_json(row.payload) or {})
+    return step
+
+
+async def load_run_steps(session: AsyncSession, run_id: UUID) -> List[Dict[str, Any]]:
+    """按顺序加载单次运行的步骤详情"""
+    result = await session.execute(
+        select(RunStep).where(RunStep.run_id == run_id).order_by(RunStep.idx)
+    )
+    return [step_row_to_dict(row) for row in result.scalars().all()]
+
+
+async def apply_outcome(session: AsyncSession, outcome: RunOutcome):
+    """在当前事务中写入运行结果（不提交）"""
+    await session.execute(
+        update(Run)
+        .where(Run.id == outcome.run_id)
+        .values(
+            status=outcome.status,
+            finished_at=outcome.finished_at,
+            summary=outcome.summary,
+            auth_failed=outcome.auth_failed,
+        )
+    )
+
+    site_values = {
+        'last_run_at': outcome.finished_at,
+        'last_run_status': outcome.status,
+    }
+    # auth 失败时暂停站点
+    if outcome.auth_failed:
+        site_values['paused'] = True
+    await session.execute(update(Site).where(Site.id == outcome.site_id).values(**site_values))
+
+    # 步骤详情写入 run_steps（payload 压缩存储）
+    session.add_all(build_step_rows(outcome.run_id, outcome.steps))
+
+
+async def persist_outcome(outcome: RunOutcome):
+    """持久化运行结果：启用 write-behind 时合并到批量事务，否则单独一次短事务"""
+    from app.services.run_writer import run_writer
+
+    if run_writer.running:
+        await run_writer.submit(outcome)
+        return
+
+    from app.db.session import async_session
+
+    async with async_session() as session:
+        await apply_outcome(session, outcome)
+        await session.commit()
@@ -0,0 +1,119 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.services.run_store import RunOutcome, apply_outcome
+
+
+class RunWriter:
+    """
+    Write-behind 运行结果写入器
+
+    并发 worker 提交的 RunOutcome 先进入内存队列，由单个写协程按批合并到一个事务中提交，
+    把突发期间的大量小事务变成少量大事务，减少 SQLite 写锁争用。
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.written = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """启动写协程"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="run-writer")
+
+    async def stop(self):
+        """写完队列中剩余的结果后停止"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def submit(self, outcome: RunOutcome) -> asyncio.Future:
+        """提交一条运行结果，返回在其所在批次提交后完成的 Future"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((outcome, future))
+        return future
+
+    async def _run(self):
+        settings = get_settings()
+        flush_interval = settings.run_writer_flush_interval_ms / 1000
+
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+
+            batch: List[Tuple[RunOutcome, asyncio.Future]] = [item]
+            stopping = False
+            deadline = asyncio.get_running_loop().time() + flush_interval
+
+            # 在 flush 间隔内尽量攒满一批
+            while len(batch) < settings.run_writer_batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def _write(self, batch: List[Tuple[RunOutcome, asyncio.Future]]):
+        from app.db.session import async_session
+
+        try:
+            async with async_session() as session:
+                for outcome, _ in batch:
+                    await apply_outcome(session, outcome)
+                await session.commit()
+        except Exception as e:
+            # 批量失败时逐条重试，避免一条坏数据拖累整批
+            print(f"[RunWriter] ⚠️ 批量写入失败（{len(batch)} 条），改为逐条写入: {e}", flush=True)
+            for outcome, future in batch:
+                try:
+                    async with async_session() as session:
+                        await apply_outcome(session, outcome)
+                        await session.commit()
+                    self.written += 1
+                    if not future.done():
+                        future.set_result(None)
+                except Exception as single_error:
+                    if not future.done():
+                        future.set_exception(single_error)
+            return
+
+        self.batches += 1
+        self.written += len(batch)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    def stats(self) -> dict:
+        """写入统计"""
+        return {
+            'running': self.running,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+            'batches': self.batches,
+            'written': self.written,
+        }
+
+
+# 全局写入器实例
+run_writer = RunWriter()
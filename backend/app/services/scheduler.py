@@ -1,26 +1,186 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime, timedelta
-import random
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
+import asyncio
 
 from app.db.models import Site
-from app.services.worker import Worker
+from app.core.config import get_settings
+from app.services.dispatcher import dispatcher
+from app.services.credential_manager import get_credential_manager
+from app.services.site_cache import IN_CHUNK_SIZE, site_cache
+from app.services.placement import LoadPlacer, host_from_urls, site_host
+from app.services.timer_heap import TimerHeap
+from app.services.due_queue import advance_next_run, fetch_due, save_next_runs, to_local_naive
+from app.services.coordination import LeaderElector, build_elector
 
 class Scheduler:
-    """APScheduler 调度器"""
+    """
+    站点调度器
+
+    scheduler_backend=apscheduler 时每个站点是一个 APScheduler 任务；
+    scheduler_backend=heap 时站点任务放在 TimerHeap 中，APScheduler 只运行少量维护任务；
+    scheduler_backend=db 时以 sites.next_run_at 为准，定期用索引查询到期站点并以比较并设置的方式领取。
+    三种模式都会把下次执行时间写回 sites.next_run_at，重启时据此恢复并补跑宽限期内错过的任务。
+
+    多副本部署时（scheduler_coordination=lease / file）只有 leader 调度站点并运行保留任务，
+    其他副本只处理 API 请求（execution_mode=queue 时也参与执行）；leader 定期按 updated_at
+    同步其他副本上修改过的站点。db 后端的到期队列本身可共享，所有副本都参与轮询。
+    """
 
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
-        self.worker = Worker()
+        self.placer = LoadPlacer()
+        self.timer = TimerHeap(self._fire_site)
+        self._cron_triggers: Dict[str, CronTrigger] = {}
+        # 待写回数据库的 next_run_at，合并后批量写入
+        self._pending_next_runs: Dict[UUID, Optional[datetime]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        # db 模式下到期队列的内存镜像，仅用于任务列表等展示
+        self._next_runs: Dict[UUID, datetime] = {}
+        self._poll_task: Optional[asyncio.Task] = None
+        self._tasks: set = set()
+        self.elector: Optional[LeaderElector] = None
+        # 站点因目标主机熔断已连续重试的次数
+        self._circuit_retries: Dict[UUID, int] = {}
+        # 上次同步已修改站点的时间（UTC，与 Site.updated_at 一致）
+        self._synced_at: Optional[datetime] = None
+
+    @property
+    def use_heap(self) -> bool:
+        return get_settings().scheduler_backend == 'heap'
+
+    @property
+    def use_db(self) -> bool:
+        return get_settings().scheduler_backend == 'db'
+
+    @property
+    def running(self) -> bool:
+        return self.scheduler.running
+
+    @property
+    def is_leader(self) -> bool:
+        return self.elector is None or self.elector.is_leader
+
+    @property
+    def owns_sites(self) -> bool:
+        """本进程是否负责站点调度"""
+        return self.use_db or self.is_leader
+
+    def job_count(self) -> int:
+        """调度中的任务数（站点任务 + 维护任务）"""
+        return len(self.timer) + len(self._next_runs) + len(self.scheduler.get_jobs())
 
     async def start(self):
         """启动调度器并加载所有站点任务"""
         self.scheduler.start()
-        
-        # 从数据库加载所有启用的站点并调度
-        await self._load_all_sites()
+
+        # 定期预解密即将执行站点的凭证，让解密不出现在运行热路径上（每个副本各自的缓存）
+        settings = get_settings()
+        if settings.credential_prewarm_interval_minutes > 0:
+            self.scheduler.add_job(
+                self.prewarm_due_credentials,
+                'interval',
+                minutes=settings.credential_prewarm_interval_minutes,
+                id='credential_prewarm',
+                replace_existing=True
+            )
+
+        # db 后端的到期队列由所有副本共享
+        if self.use_db:
+            await self._start_site_scheduling()
+
+        self.elector = build_elector(self._on_elected, self._on_demoted, self._sync_changed_sites)
+        if self.elector is None:
+            await self._on_elected()
+        else:
+            await self.elector.start()
+
+    async def _on_elected(self):
+        """成为 leader（或单进程部署）：加载站点任务并添加保留任务"""
+        if not self.use_db:
+            await self._start_site_scheduling()
+
+        # 每日运行记录保留 / 汇总任务
+        settings = get_settings()
+        if settings.retention_enabled:
+            from app.services.retention import run_retention
+            self.scheduler.add_job(
+                run_retention,
+                CronTrigger(hour=settings.retention_hour, minute=settings.retention_minute),
+                id='retention',
+                replace_existing=True
+            )
+
+    async def _on_demoted(self):
+        """失去 leader 身份：停止站点调度和保留任务，交给新的 leader"""
+        if self.scheduler.get_job('retention'):
+            self.scheduler.remove_job('retention')
+        if not self.use_db:
+            await self._stop_site_scheduling()
+
+    async def _start_site_scheduling(self):
+        """从数据库加载所有启用的站点并调度"""
+        self._synced_at = datetime.utcnow()
+        if self.use_db:
+            await self._load_due_queue()
+            self._poll_task = asyncio.create_task(self._poll_loop(), name="due-queue")
+        elif self.use_heap:
+            await self._load_site_schedules()
+            await self.timer.start()
+        else:
+            await self._load_all_sites()
+
+    async def _stop_site_scheduling(self):
+        """清空本进程的站点任务"""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+
+        await self.timer.stop()
+        self.timer = TimerHeap(self._fire_site)
+        for job in self.scheduler.get_jobs():
+            if job.id.startswith(('site_', 'retry_')):
+                self.scheduler.remove_job(job.id)
+        self.placer = LoadPlacer()
+        self._next_runs.clear()
+        self._synced_at = None
+        await self._flush_next_runs()
+        print("[Scheduler] 已停止本进程的站点调度", flush=True)
+
+    async def _sync_changed_sites(self):
+        """leader 定期重新调度最近修改过的站点（可能由其他副本的 API 修改）"""
+        from app.db.session import async_session
+        from sqlalchemy import select, func
+
+        if self.use_db or self._synced_at is None:
+            return
+
+        # 与上次同步时间重叠一段，避免副本间时钟或事务提交延迟漏掉修改
+        since = self._synced_at - timedelta(seconds=get_settings().scheduler_lease_seconds)
+        self._synced_at = datetime.utcnow()
+
+        async with async_session() as session:
+            result = await session.execute(
+                select(
+                    Site.id, Site.schedule, Site.base_url,
+                    func.json_extract(Site.flow, '$[0].url'), Site.enabled, Site.paused,
+                ).where(Site.updated_at >= since)
+            )
+            rows = result.all()
+
+        for site_id, schedule, base_url, first_url, enabled, paused in rows:
+            if enabled and not paused:
+                next_run = self._schedule(site_id, schedule or {}, host_from_urls(base_url, first_url))
+                self._record_next_run(site_id, next_run)
+            else:
+                self.unschedule_site(site_id)
 
     async def _load_all_sites(self):
         """从数据库加载所有启用站点并调度"""
@@ -31,102 +191,432 @@ class Scheduler:
             result = await session.execute(
                 select(Site).where(Site.enabled == True, Site.paused == False)
             )
-            sites = result.scalars().all()
-            
+            # 按 id 顺序放置，同样的站点集合每次启动得到相同的执行时间
+            sites = sorted(result.scalars().all(), key=lambda site: str(site.id))
+
             for site in sites:
-                self.schedule_site(site)
-                print(f"[Scheduler] 已调度站点: {site.name} ({site.id})", flush=True)
+                next_run = self._restore_schedule(site.id, site.schedule or {}, site_host(site), site.next_run_at)
+                if to_local_naive(next_run) != site.next_run_at:
+                    self._record_next_run(site.id, next_run)
+                site_cache.put(site.id, site.name)
+                print(f"[Scheduler] 已调度站点: {site.name} ({site.id}), 下次执行={next_run}", flush=True)
+
+            prewarmed = get_credential_manager().prewarm(site.auth for site in sites)
+            if prewarmed:
+                print(f"[Scheduler] 已预解密 {prewarmed} 个站点凭证", flush=True)
             
             print(f"[Scheduler] 启动完成，共加载 {len(sites)} 个站点任务", flush=True)
 
+    async def _iter_schedule_pages(self):
+        """分页读取启用站点的 (id, schedule, base_url, 第一个步骤 URL, next_run_at)，不加载整行"""
+        from app.db.session import async_session
+        from sqlalchemy import select, func
+
+        page_size = get_settings().scheduler_load_page_size
+        last_id = None
+
+        while True:
+            query = (
+                select(
+                    Site.id, Site.schedule, Site.base_url,
+                    func.json_extract(Site.flow, '$[0].url'), Site.next_run_at,
+                )
+                .where(Site.enabled == True, Site.paused == False)
+                .order_by(Site.id)
+                .limit(page_size)
+            )
+            if last_id is not None:
+                query = query.where(Site.id > last_id)
+
+            async with async_session() as session:
+                rows = (await session.execute(query)).all()
+
+            yield rows
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1][0]
+            await asyncio.sleep(0)
+
+    async def _load_site_schedules(self):
+        """heap 模式：分页加载站点调度信息并登记到 TimerHeap"""
+        total = 0
+        async for rows in self._iter_schedule_pages():
+            for site_id, schedule, base_url, first_url, stored in rows:
+                next_run = self._restore_schedule(site_id, schedule or {}, host_from_urls(base_url, first_url), stored)
+                if to_local_naive(next_run) != stored:
+                    self._record_next_run(site_id, next_run)
+            total += len(rows)
+
+        print(f"[Scheduler] 启动完成，共加载 {total} 个站点任务（heap）", flush=True)
+
+    async def _load_due_queue(self):
+        """db 模式：补齐缺失的 next_run_at，错过宽限期的重新计算，其余保持原值交给轮询执行"""
+        now = datetime.now()
+        grace = timedelta(seconds=get_settings().scheduler_misfire_grace_seconds)
+        total = 0
+
+        async for rows in self._iter_schedule_pages():
+            for site_id, schedule, base_url, first_url, stored in rows:
+                schedule = schedule or {}
+                host = host_from_urls(base_url, first_url)
+                if stored is None or now - stored > grace:
+                    if stored is not None:
+                        print(f"[Scheduler] ⏭️ 已错过执行时间 {stored}，重新计算: site_id={site_id}", flush=True)
+                    self._record_next_run(site_id, self._next_run_time(site_id, schedule, host))
+                    continue
+                if stored > now and schedule.get('type', 'dailyAfter') == 'dailyAfter':
+                    self.placer.reserve(site_id, host, stored)
+                self._next_runs[site_id] = stored
+            total += len(rows)
+
+        await self._flush_next_runs()
+        print(f"[Scheduler] 启动完成，共 {total} 个站点进入到期队列（db）", flush=True)
+
+    def _restore_schedule(self, site_id: UUID, schedule: dict, host: str, stored: Optional[datetime]) -> Optional[datetime]:
+        """
+        按持久化的 next_run_at 恢复调度
+
+        已过期但在宽限期内：立即补跑（执行完成后按正常流程重新调度）；
+        dailyAfter 的未来时间：沿用原时间（重新计算会跳过今天窗口内尚未执行的任务）；
+        其余情况重新计算
+        """
+        schedule_type = schedule.get('type', 'dailyAfter')
+        now = datetime.now()
+
+        if stored is not None and stored <= now:
+            if now - stored <= timedelta(seconds=get_settings().scheduler_misfire_grace_seconds):
+                print(f"[Scheduler] ⏰ 补跑错过的任务: site_id={site_id}, 原定={stored}", flush=True)
+                if schedule_type == 'cron' and not self.use_heap:
+                    # Cron 任务仍由 APScheduler 负责后续执行
+                    self._schedule(site_id, schedule, host)
+                self._spawn(self._run_site_job(site_id))
+                return stored
+            print(f"[Scheduler] ⏭️ 已错过执行时间 {stored}，超出补跑宽限期: site_id={site_id}", flush=True)
+        elif stored is not None and schedule_type == 'dailyAfter':
+            self.placer.reserve(site_id, host, stored)
+            self._set_job(site_id, stored)
+            return stored
+
+        return self._schedule(site_id, schedule, host)
+
+    async def prewarm_due_credentials(self):
+        """预解密下一个预热周期内将要执行的站点凭证"""
+        from app.db.session import async_session
+        from sqlalchemy import select
+
+        settings = get_settings()
+        horizon = datetime.now().astimezone() + timedelta(minutes=settings.credential_prewarm_interval_minutes * 2)
+
+        due_ids = [
+            site_id for site_id, _, next_run_time in self.list_site_jobs()
+            if next_run_time and next_run_time <= horizon
+        ]
+
+        if not due_ids:
+            return
+
+        prewarmed = 0
+        async with async_session() as session:
+            # 分批 IN 查询，避免超过 SQLite 的变量上限
+            for i in range(0, len(due_ids), IN_CHUNK_SIZE):
+                chunk = due_ids[i:i + IN_CHUNK_SIZE]
+                result = await session.execute(select(Site.auth).where(Site.id.in_(chunk)))
+                prewarmed += get_credential_manager().prewarm(result.scalars().all())
+
+        if prewarmed:
+            print(f"[Scheduler] 已预解密 {prewarmed} 个即将执行站点的凭证", flush=True)
+
     async def stop(self):
         """停止调度器"""
+        if self.elector is not None:
+            # 让出租约，其他副本下一轮即可接管
+            await self.elector.stop()
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+        await self.timer.stop()
+        await self._flush_next_runs()
         self.scheduler.shutdown()
 
     def schedule_site(self, site: Site):
         """为站点创建调度任务"""
+        if not self.owns_sites:
+            # 非 leader 副本不持有站点任务，由 leader 按 updated_at 同步
+            return
         if not site.enabled or site.paused:
+            # 被禁用 / 暂停的站点清除旧任务和下次执行时间
+            self.unschedule_site(site.id)
+            site.next_run_at = None
             return
 
-        schedule = site.schedule or {}
+        next_run = self._schedule(site.id, site.schedule or {}, site_host(site))
+        # 同步到对象上，接口返回的站点直接带有下次执行时间
+        site.next_run_at = self._record_next_run(site.id, next_run)
+        schedule_type = (site.schedule or {}).get('type', 'dailyAfter')
+        print(f"[Scheduler] 📅 调度站点 [{site.name}]: 类型={schedule_type}, 下次执行={next_run}", flush=True)
+
+    def _schedule(self, site_id: UUID, schedule: dict, host: str) -> Optional[datetime]:
+        """按 schedule 计算下次执行时间并登记任务，返回下次执行时间"""
         schedule_type = schedule.get('type', 'dailyAfter')
 
-        job_id = f"site_{site.id}"
+        if self.use_db:
+            # 只计算时间，由调用方写入 next_run_at
+            return self._next_run_time(site_id, schedule, host)
+
+        if self.use_heap:
+            next_run = self._next_run_time(site_id, schedule, host)
+            if next_run is None:
+                self.timer.unschedule(site_id)
+            else:
+                self._set_job(site_id, next_run)
+            return next_run
+
+        job_id = f"site_{site_id}"
 
         # 移除旧任务
         if self.scheduler.get_job(job_id):
             self.scheduler.remove_job(job_id)
 
         if schedule_type == 'dailyAfter':
-            # 每日固定时间执行
-            hour = schedule.get('hour', 8)
-            minute = schedule.get('minute', 5)
-            random_delay_seconds = schedule.get('randomDelaySeconds', 0)
-
-            # 计算下次执行时间
-            next_run = self._compute_next_daily_run(hour, minute, random_delay_seconds)
-
-            self.scheduler.add_job(
-                self._run_site_job,
-                'date',
-                run_date=next_run,
-                args=[site.id],
-                id=job_id
-            )
-            print(f"[Scheduler] 📅 调度站点 [{site.name}]: 类型=dailyAfter, 下次执行={next_run.strftime('%Y-%m-%d %H:%M:%S')}", flush=True)
+            # 每日固定时间执行（在允许的窗口内做负载均衡放置）
+            next_run = self._next_run_time(site_id, schedule, host)
+            self._set_job(site_id, next_run)
+            return next_run
 
         elif schedule_type == 'cron':
+            self.placer.release(site_id)
             # Cron 表达式
-            cron_expr = schedule.get('cron', '0 8 * * *')
-            trigger = CronTrigger.from_crontab(cron_expr)
-
             self.scheduler.add_job(
                 self._run_site_job,
-                trigger,
-                args=[site.id],
+                self._cron_trigger(schedule.get('cron', '0 8 * * *')),
+                args=[site_id],
                 id=job_id
             )
             job = self.scheduler.get_job(job_id)
-            print(f"[Scheduler] 📅 调度站点 [{site.name}]: 类型=cron, 表达式={cron_expr}, 下次执行={job.next_run_time if job else 'N/A'}", flush=True)
+            return job.next_run_time if job else None
+
+        return None
+
+    def _set_job(self, site_id: UUID, run_at: datetime):
+        """在确定的时间执行一次站点任务（heap 条目或 APScheduler date 任务）"""
+        if self.use_heap:
+            self.timer.schedule(site_id, run_at.timestamp())
+            return
+
+        job_id = f"site_{site_id}"
+        if self.scheduler.get_job(job_id):
+            self.scheduler.remove_job(job_id)
+        self.scheduler.add_job(
+            self._run_site_job,
+            'date',
+            run_date=run_at,
+            args=[site_id],
+            id=job_id
+        )
+
+    def _next_run_time(self, site_id: UUID, schedule: dict, host: str) -> Optional[datetime]:
+        """计算站点的下次执行时间（cron 使用共享的 CronTrigger）"""
+        schedule_type = schedule.get('type', 'dailyAfter')
+
+        if schedule_type == 'dailyAfter':
+            return self._compute_next_daily_run(
+                site_id, host,
+                schedule.get('hour', 8),
+                schedule.get('minute', 5),
+                schedule.get('randomDelaySeconds', 0),
+            )
+        if schedule_type == 'cron':
+            self.placer.release(site_id)
+            trigger = self._cron_trigger(schedule.get('cron', '0 8 * * *'))
+            return trigger.get_next_fire_time(None, datetime.now(trigger.timezone))
+        return None
+
+    def _cron_trigger(self, cron_expr: str) -> CronTrigger:
+        """相同的 cron 表达式共用一个 trigger 对象"""
+        trigger = self._cron_triggers.get(cron_expr)
+        if trigger is None:
+            trigger = CronTrigger.from_crontab(cron_expr)
+            self._cron_triggers[cron_expr] = trigger
+        return trigger
 
     def unschedule_site(self, site_id: UUID):
         """取消站点调度"""
+        if not self.owns_sites:
+            return
         job_id = f"site_{site_id}"
-        if self.scheduler.get_job(job_id):
+        if self.use_heap:
+            self.timer.unschedule(site_id)
+        elif self.scheduler.get_job(job_id):
             self.scheduler.remove_job(job_id)
+        self.placer.release(site_id)
+        self._record_next_run(site_id, None)
 
-    def _compute_next_daily_run(self, hour: int, minute: int, random_delay_seconds: int) -> datetime:
-        """计算下次执行时间（带随机延迟）"""
+    def _record_next_run(self, site_id: UUID, next_run: Optional[datetime]) -> Optional[datetime]:
+        """登记站点的下次执行时间，合并后异步批量写回 sites.next_run_at，返回写入的值"""
+        value = to_local_naive(next_run)
+        self._pending_next_runs[site_id] = value
+        if self.use_db:
+            if value is None:
+                self._next_runs.pop(site_id, None)
+            else:
+                self._next_runs[site_id] = value
+
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # 没有事件循环（如同步测试）时留待下次写入
+                return value
+            self._flush_task = loop.create_task(self._flush_next_runs())
+        return value
+
+    async def _flush_next_runs(self):
+        """把登记的 next_run_at 批量写入数据库（加锁保证批次按登记顺序落库）"""
+        async with self._flush_lock:
+            # 让出一次，合并同一轮中连续登记的更新
+            await asyncio.sleep(0)
+            while self._pending_next_runs:
+                batch, self._pending_next_runs = self._pending_next_runs, {}
+                try:
+                    await save_next_runs(batch)
+                except Exception as e:
+                    # 放回未被更新覆盖的值，下次写入时重试
+                    for site_id, value in batch.items():
+                        self._pending_next_runs.setdefault(site_id, value)
+                    print(f"[Scheduler] 写入 next_run_at 失败: {e}", flush=True)
+                    return
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def list_site_jobs(self) -> List[Tuple[UUID, str, Optional[datetime]]]:
+        """列出所有站点任务：(site_id, job_id, next_run_time)"""
+        if self.use_db:
+            return [
+                (site_id, f"site_{site_id}", next_run.astimezone())
+                for site_id, next_run in self._next_runs.items()
+            ]
+
+        if self.use_heap:
+            return [
+                (site_id, f"site_{site_id}", datetime.fromtimestamp(ts).astimezone())
+                for site_id, ts in self.timer.items()
+            ]
+
+        jobs = []
+        for job in self.scheduler.get_jobs():
+            if not job.id.startswith("site_"):
+                continue
+            try:
+                site_id = UUID(job.id[len("site_"):])
+            except ValueError:
+                continue
+            jobs.append((site_id, job.id, job.next_run_time))
+        return jobs
+
+    def _compute_next_daily_run(self, site_id: UUID, host: str, hour: int, minute: int, random_delay_seconds: int) -> datetime:
+        """
+        计算下次执行时间
+
+        窗口为 [hour:minute, +randomDelaySeconds]（未配置时使用默认窗口），
+        由 LoadPlacer 在窗口内按全局 / 单主机速率上限选择确定的槽位
+        """
         now = datetime.now()
-        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        window_start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
 
         # 如果今天的时间已过，推到明天
-        if next_run <= now:
-            next_run += timedelta(days=1)
+        if window_start <= now:
+            window_start += timedelta(days=1)
+
+        window_seconds = random_delay_seconds or get_settings().schedule_default_window_seconds
+        if window_seconds <= 0:
+            self.placer.release(site_id)
+            return window_start
+
+        return self.placer.place(site_id, host, window_start, window_seconds)
+
+    async def _fire_site(self, site_id: UUID):
+        """TimerHeap 到期回调"""
+        await self._run_site_job(site_id)
 
-        # 添加随机延迟
-        if random_delay_seconds > 0:
-            delay = random.randint(0, random_delay_seconds)
-            next_run += timedelta(seconds=delay)
+    async def _poll_loop(self):
+        """db 模式：定期领取到期站点，一批取满时立即继续"""
+        while True:
+            settings = get_settings()
+            try:
+                fetched = await self.poll_due()
+            except Exception as e:
+                print(f"[Scheduler] 轮询到期站点失败: {e}", flush=True)
+                fetched = 0
+            if fetched >= settings.scheduler_poll_batch_size:
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(settings.scheduler_poll_interval_seconds)
+
+    async def poll_due(self) -> int:
+        """
+        领取并执行一批到期站点，返回本次查询到的站点数
+
+        先计算下一次执行时间，再以 next_run_at 仍为原值为条件更新；
+        只有更新成功的进程执行本次运行，多个进程共享到期队列时不会重复执行
+        """
+        await self._flush_next_runs()
+        settings = get_settings()
+        now = datetime.now()
+        grace = timedelta(seconds=settings.scheduler_misfire_grace_seconds)
 
-        return next_run
+        rows = await fetch_due(now, settings.scheduler_poll_batch_size)
+        for site_id, schedule, base_url, first_url, due_at in rows:
+            next_run = to_local_naive(self._next_run_time(site_id, schedule or {}, host_from_urls(base_url, first_url)))
+            if not await advance_next_run(site_id, due_at, next_run):
+                # 已被其他进程领取，或刚被重新调度
+                continue
 
-    async def _run_site_job(self, site_id: UUID):
-        """执行站点任务"""
+            if next_run is None:
+                self._next_runs.pop(site_id, None)
+            else:
+                self._next_runs[site_id] = next_run
+
+            if now - due_at > grace:
+                print(f"[Scheduler] ⏭️ 已错过执行时间 {due_at}，超出补跑宽限期: site_id={site_id}", flush=True)
+                continue
+            self._spawn(self._run_site_job(site_id, reschedule=False))
+
+        return len(rows)
+
+    async def _run_site_job(self, site_id: UUID, reschedule: bool = True):
+        """执行站点任务（db 模式下领取时已写入下一次时间，无需重新调度）"""
         from datetime import datetime as dt
         
         start_time = dt.now()
         print(f"[Scheduler] {start_time.strftime('%Y-%m-%d %H:%M:%S')} 开始执行任务: site_id={site_id}", flush=True)
-        
+
+        result = None
         try:
-            result = await self.worker.run_site(site_id, trigger='scheduled')
+            # 通过分发器排队执行，避免同一时刻的任务同时涌入
+            result = await dispatcher.submit(site_id, trigger='scheduled')
             end_time = dt.now()
             duration = (end_time - start_time).total_seconds()
             
-            if result.get('status') == 'success':
+            if result.get('run_status') == 'CIRCUIT_OPEN':
+                print(f"[Scheduler] 🔌 目标主机不可用: site_id={site_id}, retry_after={result.get('retry_after')}", flush=True)
+            elif result.get('run_status') == 'RETRYING':
+                print(f"[Scheduler] ⏳ 步骤退避中，稍后重跑: site_id={site_id}, retry_after={result.get('retry_after')}", flush=True)
+            elif result.get('status') == 'success':
                 print(f"[Scheduler] ✅ 任务成功: site_id={site_id}, run_status={result.get('run_status')}, 耗时={duration:.2f}s", flush=True)
             elif result.get('status') == 'skipped':
                 print(f"[Scheduler] ⏭️ 任务跳过: site_id={site_id}, reason={result.get('message')}", flush=True)
+            elif result.get('status') == 'queued':
+                print(f"[Scheduler] 📥 任务已入队: site_id={site_id}, queue_id={result.get('queue_id')}", flush=True)
+            elif result.get('status') == 'rejected':
+                print(f"[Scheduler] 🚫 任务被拒绝: site_id={site_id}, reason={result.get('message')}", flush=True)
             else:
                 print(f"[Scheduler] ❌ 任务失败: site_id={site_id}, error={result.get('message')}, 耗时={duration:.2f}s", flush=True)
                 
@@ -135,27 +625,74 @@ class Scheduler:
             duration = (end_time - start_time).total_seconds()
             print(f"[Scheduler] ❌ 任务异常: site_id={site_id}, exception={str(e)}, 耗时={duration:.2f}s", flush=True)
 
+        if result is not None and result.get('run_status') in ('CIRCUIT_OPEN', 'RETRYING'):
+            if self._schedule_circuit_retry(site_id, result.get('retry_after')):
+                return
+        else:
+            self._circuit_retries.pop(site_id, None)
+
         # 重新调度下一次执行
-        await self._reschedule_site(site_id)
+        if reschedule:
+            await self._reschedule_site(site_id)
+
+    def _schedule_circuit_retry(self, site_id: UUID, retry_after: Optional[float]) -> bool:
+        """目标主机熔断或步骤退避过长时在 retry_after 后重跑本次运行，超过重试次数返回 False"""
+        attempts = self._circuit_retries.get(site_id, 0) + 1
+        if not self.owns_sites or attempts > get_settings().circuit_retry_max:
+            self._circuit_retries.pop(site_id, None)
+            return False
+        self._circuit_retries[site_id] = attempts
+
+        # 稍晚于熔断恢复时间，让探测请求先完成
+        run_at = datetime.now() + timedelta(seconds=(retry_after or 0) + 1)
+        if self.use_db:
+            # 覆盖领取时写入的下一次时间，重试执行后按 schedule 重新计算
+            self._record_next_run(site_id, run_at)
+        elif self.use_heap or not self.scheduler.get_job(f"site_{site_id}"):
+            # heap 条目 / dailyAfter 的 date 任务已经消耗，重试执行后再正常重新调度
+            self._set_job(site_id, run_at)
+            self._record_next_run(site_id, run_at)
+        else:
+            # Cron 任务仍在，单独添加一次性的重试任务
+            self.scheduler.add_job(
+                self._run_site_job,
+                'date',
+                run_date=run_at,
+                args=[site_id],
+                kwargs={'reschedule': False},
+                id=f"retry_{site_id}",
+                replace_existing=True
+            )
+        print(f"[Scheduler] 🔁 第 {attempts} 次重跑安排在 {run_at.strftime('%H:%M:%S')}: site_id={site_id}", flush=True)
+        return True
 
     async def _reschedule_site(self, site_id: UUID):
         """从数据库加载站点并重新调度（仅 DailyAfter 模式）"""
         from app.db.session import async_session
         from sqlalchemy import select
 
+        if not self.owns_sites:
+            # 执行期间失去了 leader 身份
+            return
+
         async with async_session() as session:
             result = await session.execute(select(Site).where(Site.id == site_id))
             site = result.scalar_one_or_none()
 
-            if site and site.enabled and not site.paused:
+            if site is None:
+                # 站点已被删除（可能在其他副本上），清除残留的任务
+                self.unschedule_site(site_id)
+            elif site.enabled and not site.paused:
                 schedule = site.schedule or {}
-                # 仅 DailyAfter 模式需要重新调度（Cron 模式由 APScheduler 自动处理）
-                if schedule.get('type') == 'dailyAfter':
-                    self.schedule_site(site)
-                    # 获取下次运行时间
-                    job = self.scheduler.get_job(f"site_{site_id}")
-                    if job:
-                        print(f"[Scheduler] 📅 已重新调度: {site.name}, 下次执行={job.next_run_time}", flush=True)
+                # APScheduler 下仅 DailyAfter 模式需要重新调度（Cron 模式由 APScheduler 自动处理），
+                # heap 模式下每次执行后都需要重新登记
+                if schedule.get('type', 'dailyAfter') == 'dailyAfter' or self.use_heap:
+                    next_run = self._schedule(site.id, schedule, site_host(site))
+                    print(f"[Scheduler] 📅 已重新调度: {site.name}, 下次执行={next_run}", flush=True)
+                else:
+                    job = self.scheduler.get_job(f"site_{site.id}")
+                    next_run = job.next_run_time if job else None
+                self._record_next_run(site.id, next_run)
             elif site and site.paused:
                 print(f"[Scheduler] ⏸️ 站点已暂停，不再调度: {site.name}", flush=True)
 
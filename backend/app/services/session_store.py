@@ -0,0 +1,144 @@
+import json
+import time
+from datetime import datetime
+from http.cookiejar import Cookie, CookieJar
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.db.models import Secret
+from app.services.credential_manager import get_credential_manager
+
+# secrets 表中保存站点会话的 key_name
+SESSION_KEY = 'session'
+
+
+class SiteSession:
+    """
+    站点跨运行复用的会话：cookie 和登录步骤提取的变量
+
+    带 expires 的 cookie 过期后丢弃；整个会话从保存起最多复用 session_max_age_seconds，
+    没有 expires 的会话 cookie 也受此限制
+    """
+
+    def __init__(self, cookies: Optional[List[Dict[str, Any]]] = None, variables: Optional[Dict[str, Any]] = None, saved_at: Optional[float] = None):
+        self.cookies = cookies or []
+        self.variables = variables or {}
+        self.saved_at = saved_at if saved_at is not None else time.time()
+
+    @classmethod
+    def from_jar(cls, jar: CookieJar, variables: Optional[Dict[str, Any]] = None) -> "SiteSession":
+        """从运行结束时的 cookie jar 生成会话（跳过已过期的 cookie）"""
+        now = time.time()
+        cookies = [
+            {
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'domain_specified': cookie.domain_specified,
+                'path': cookie.path,
+                'secure': cookie.secure,
+                'expires': cookie.expires,
+            }
+            for cookie in jar
+            if cookie.expires is None or cookie.expires > now
+        ]
+        return cls(cookies, variables)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SiteSession":
+        return cls(data.get('cookies'), data.get('variables'), data.get('saved_at'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'cookies': self.cookies, 'variables': self.variables, 'saved_at': self.saved_at}
+
+    @property
+    def empty(self) -> bool:
+        return not self.cookies and not self.variables
+
+    def valid(self) -> bool:
+        """会话未超过最长复用时间，且丢弃过期 cookie 后仍有内容"""
+        now = time.time()
+        if now - self.saved_at > get_settings().session_max_age_seconds:
+            return False
+        self.cookies = [cookie for cookie in self.cookies if cookie['expires'] is None or cookie['expires'] > now]
+        return not self.empty
+
+    def same_as(self, other: Optional["SiteSession"]) -> bool:
+        """内容是否相同（不比较保存时间）"""
+        if other is None:
+            return self.empty
+        key = lambda cookie: (cookie['domain'], cookie['path'], cookie['name'])
+        return (
+            sorted(self.cookies, key=key) == sorted(other.cookies, key=key)
+            and self.variables == other.variables
+        )
+
+    def apply(self, jar: CookieJar):
+        """把 cookie 写入运行使用的 cookie jar"""
+        for cookie in self.cookies:
+            domain = cookie['domain']
+            jar.set_cookie(Cookie(
+                version=0, name=cookie['name'], value=cookie['value'],
+                port=None, port_specified=False,
+                domain=domain, domain_specified=cookie['domain_specified'], domain_initial_dot=domain.startswith('.'),
+                path=cookie['path'], path_specified=True,
+                secure=cookie['secure'], expires=cookie['expires'], discard=cookie['expires'] is None,
+                comment=None, comment_url=None, rest={},
+            ))
+
+
+async def load_session(db: AsyncSession, site_id: UUID) -> Optional[SiteSession]:
+    """加载站点保存的会话，不存在、无法解密或已过期时返回 None"""
+    result = await db.execute(
+        select(Secret.ciphertext, Secret.nonce)
+        .where(Secret.site_id == site_id, Secret.key_name == SESSION_KEY)
+    )
+    row = result.first()
+    if row is None:
+        return None
+
+    try:
+        session = SiteSession.from_dict(json.loads(get_credential_manager().decrypt(row.ciphertext, row.nonce)))
+    except Exception as e:
+        # 加密密钥更换等情况：当作没有会话，本次运行重新登录
+        print(f"[SessionStore] 会话解密失败，将重新登录: site_id={site_id}, error={e}", flush=True)
+        return None
+    return session if session.valid() else None
+
+
+async def save_session(site_id: UUID, session: Optional[SiteSession], previous: Optional[SiteSession] = None):
+    """
+    运行结束后保存会话，内容没有变化时不写入
+
+    session 为 None 或为空时删除已保存的会话
+    """
+    if session is None or session.empty:
+        if previous is None:
+            return
+        session = None
+    elif session.same_as(previous):
+        return
+
+    from app.db.session import async_session
+
+    async with async_session() as db:
+        await clear_session(db, site_id)
+        if session is not None:
+            encrypted = get_credential_manager().encrypt(json.dumps(session.to_dict()))
+            db.add(Secret(
+                site_id=site_id,
+                key_name=SESSION_KEY,
+                ciphertext=encrypted['ciphertext'],
+                nonce=encrypted['nonce'],
+                created_at=datetime.utcnow(),
+            ))
+        await db.commit()
+
+
+async def clear_session(db: AsyncSession, site_id: UUID):
+    """在当前事务中删除站点保存的会话（不提交）"""
+    await db.execute(delete(Secret).where(Secret.site_id == site_id, Secret.key_name == SESSION_KEY))
@@ -0,0 +1,54 @@
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Site
+
+# 单条 IN 查询的最大参数数（低于 SQLite 的变量上限）
+IN_CHUNK_SIZE = 500
+
+
+class SiteMetaCache:
+    """
+    进程内站点元数据缓存（目前只有名称）
+
+    供 /system/jobs 等需要为大量 site_id 补充名称的接口使用，
+    由 sites 路由在创建 / 更新 / 删除时维护。
+    """
+
+    def __init__(self):
+        self._names: Dict[UUID, str] = {}
+
+    def put(self, site_id: UUID, name: Optional[str]):
+        self._names[site_id] = name
+
+    def invalidate(self, site_id: UUID):
+        self._names.pop(site_id, None)
+
+    def clear(self):
+        self._names.clear()
+
+    async def get_names(self, session: AsyncSession, site_ids: Iterable[UUID]) -> Dict[UUID, Optional[str]]:
+        """批量获取站点名称，未命中的部分用 IN 查询一次性补齐"""
+        site_ids = list(site_ids)
+        missing = [site_id for site_id in site_ids if site_id not in self._names]
+
+        if len(missing) > IN_CHUNK_SIZE * 4:
+            # 冷启动时直接全表读取 id / name 两列
+            result = await session.execute(select(Site.id, Site.name))
+            for site_id, name in result.all():
+                self._names[site_id] = name
+        else:
+            for i in range(0, len(missing), IN_CHUNK_SIZE):
+                chunk = missing[i:i + IN_CHUNK_SIZE]
+                result = await session.execute(select(Site.id, Site.name).where(Site.id.in_(chunk)))
+                for site_id, name in result.all():
+                    self._names[site_id] = name
+
+        return {site_id: self._names.get(site_id) for site_id in site_ids}
+
+
+# 全局站点元数据缓存
+site_cache = SiteMetaCache()
@@ -0,0 +1,114 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+MAX_SLEEP_SECONDS = 60
+
+
+class TimerHeap:
+    """
+    基于最小堆的站点定时器
+
+    堆中只保存紧凑的 (next_run_ts, seq, site_id) 元组，每个站点最多一个有效条目：
+    重新调度时压入新条目并让旧条目失效（惰性删除），取消调度只删除索引，
+    两者都是 O(log n) / O(1)。失效条目超过有效条目数时整体重建堆。
+    """
+
+    def __init__(self, callback: Callable[[UUID], Awaitable[None]]):
+        self._callback = callback
+        self._heap: List[Tuple[float, int, UUID]] = []
+        # site_id → 当前有效条目的 (ts, seq)
+        self._entries: Dict[UUID, Tuple[float, int]] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running_jobs: set = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def schedule(self, site_id: UUID, run_at_ts: float):
+        """设置（或修改）站点的下次执行时间"""
+        seq = next(self._seq)
+        self._entries[site_id] = (run_at_ts, seq)
+        heapq.heappush(self._heap, (run_at_ts, seq, site_id))
+
+        if len(self._heap) > 2 * len(self._entries) + 1024:
+            self._compact()
+        # 新条目成为堆顶时唤醒调度循环重新计算等待时间
+        if self._wakeup is not None and self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def unschedule(self, site_id: UUID):
+        self._entries.pop(site_id, None)
+
+    def next_run(self, site_id: UUID) -> Optional[float]:
+        entry = self._entries.get(site_id)
+        return entry[0] if entry else None
+
+    def items(self):
+        """(site_id, next_run_ts) 迭代器"""
+        return ((site_id, entry[0]) for site_id, entry in self._entries.items())
+
+    def _compact(self):
+        self._heap = [(ts, seq, site_id) for site_id, (ts, seq) in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> List[UUID]:
+        """弹出所有已到期的有效条目"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            ts, seq, site_id = heapq.heappop(self._heap)
+            if self._entries.get(site_id) == (ts, seq):
+                del self._entries[site_id]
+                due.append(site_id)
+        return due
+
+    def _next_delay(self, now: float) -> Optional[float]:
+        # 顺便丢弃堆顶的失效条目
+        while self._heap:
+            ts, seq, site_id = self._heap[0]
+            if self._entries.get(site_id) == (ts, seq):
+                return max(ts - now, 0)
+            heapq.heappop(self._heap)
+        return None
+
+    async def start(self):
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name="timer-heap")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            now = time.time()
+            for site_id in self._pop_due(now):
+                task = asyncio.create_task(self._callback(site_id))
+                self._running_jobs.add(task)
+                task.add_done_callback(self._running_jobs.discard)
+
+            # 最多睡眠 MAX_SLEEP_SECONDS，系统时间被调整时也能及时纠正
+            delay = self._next_delay(time.time())
+            delay = MAX_SLEEP_SECONDS if delay is None else min(delay, MAX_SLEEP_SECONDS)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
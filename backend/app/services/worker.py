@@ -5,6 +5,9 @@ from sqlalchemy import select
 
 from app.db.models import Site, Run
 from app.services.flow_engine import FlowEngine
+from app.services.flow_plan import flow_plan_cache
+from app.services.run_store import RunOutcome, persist_outcome
+from app.services.session_store import load_session, save_session
 
 class Worker:
     """Worker 执行器"""
@@ -13,9 +16,20 @@ class Worker:
         self.flow_engine = FlowEngine()
 
     async def run_site(self, site_id: UUID, trigger: str = 'manual') -> dict:
-        """执行站点任务"""
+        """
+        执行站点任务
+
+        分三段执行，网络 I/O 期间不持有数据库连接：
+        1. 短事务：加载站点快照并插入 RUNNING 记录
+        2. 执行 Flow（无数据库句柄）
+        3. 短写入持久化结果（以及有变化的会话）
+        """
+        from app.core.config import get_settings
         from app.db.session import async_session
 
+        store_session = get_settings().session_store_enabled
+        site_session = None
+
         async with async_session() as session:
             # 加载站点
             result = await session.execute(select(Site).where(Site.id == site_id))
@@ -27,6 +41,11 @@ class Worker:
             if not site.enabled or site.paused:
                 return {'status': 'skipped', 'message': 'Site is disabled or paused'}
 
+            # 上次运行保存的会话（cookie / 登录变量），在插入 Run 之前加载，
+            # 加载失败时不会留下 RUNNING 记录
+            if store_session:
+                site_session = await load_session(session, site_id)
+
             # 创建 Run 记录
             run = Run(
                 site_id=site_id,
@@ -35,56 +54,68 @@ class Worker:
             )
             session.add(run)
             await session.commit()
-            await session.refresh(run)
-
-            try:
-                # 执行 Flow
-                flow_result = await self.flow_engine.execute_flow(
-                    site_id=site_id,
-                    flow=site.flow or [],
-                    auth=site.auth or {}
-                )
-
-                # 更新 Run 记录
-                run.status = flow_result.status
-                run.finished_at = datetime.now()
-                run.summary = flow_result.summary
-                run.steps = flow_result.steps
-                run.auth_failed = flow_result.auth_failed
-
-                # 更新站点状态
-                site.last_run_at = run.finished_at
-                site.last_run_status = run.status
-
-                # 如果 auth 失败，暂停站点
-                if flow_result.auth_failed:
-                    site.paused = True
-
-                await session.commit()
-
-                # 发送通知（如果失败）
-                if run.status in ['FAILED', 'AUTH_FAILED']:
-                    await self._send_notification(site, run)
-
-                return {
-                    'status': 'success',
-                    'run_id': str(run.id),
-                    'run_status': run.status
-                }
-
-            except Exception as e:
-                # 更新 Run 记录为失败
-                run.status = 'FAILED'
-                run.finished_at = datetime.now()
-                run.summary = f'执行异常: {str(e)}'
-                await session.commit()
-
-                return {
-                    'status': 'error',
-                    'message': str(e)
-                }
-
-    async def _send_notification(self, site: Site, run: Run):
+
+        # expire_on_commit=False，会话关闭后 site / run 的已加载字段仍可读取
+        try:
+            # 执行 Flow
+            flow_result = await self.flow_engine.execute_flow(
+                site_id=site_id,
+                flow=site.flow or [],
+                auth=site.auth or {},
+                plan=flow_plan_cache.get(site.id, site.updated_at, site.flow or []),
+                session=site_session
+            )
+            outcome = RunOutcome(
+                run_id=run.id,
+                site_id=site_id,
+                status=flow_result.status,
+                finished_at=datetime.now(),
+                summary=flow_result.summary,
+                auth_failed=flow_result.auth_failed,
+                steps=flow_result.steps
+            )
+
+            # 更新 Run / RunStep / 站点状态（auth 失败时暂停站点）
+            await persist_outcome(outcome)
+
+            # 保存会话供下次运行复用；认证失败时丢弃。
+            # 运行结果已经写入，会话保存失败只记录日志，不能把运行改写为失败
+            if store_session:
+                try:
+                    await save_session(site_id, None if flow_result.auth_failed else flow_result.session, previous=site_session)
+                except Exception as e:
+                    print(f"[Worker] 保存会话失败: site_id={site_id}, error={e}", flush=True)
+
+            # 发送通知（如果失败）
+            if outcome.status in ['FAILED', 'AUTH_FAILED']:
+                await self._send_notification(site, run, outcome)
+
+            response = {
+                'status': 'success',
+                'run_id': str(run.id),
+                'run_status': outcome.status
+            }
+            # 目标主机熔断：由调度器在恢复后自动重试
+            if flow_result.retry_after is not None:
+                response['retry_after'] = flow_result.retry_after
+            return response
+
+        except Exception as e:
+            # 更新 Run 记录为失败
+            await persist_outcome(RunOutcome(
+                run_id=run.id,
+                site_id=site_id,
+                status='FAILED',
+                finished_at=datetime.now(),
+                summary=f'执行异常: {str(e)}'
+            ))
+
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+
+    async def _send_notification(self, site: Site, run: Run, outcome: RunOutcome):
         """发送 Webhook 通知"""
         from app.core.config import get_settings
         import httpx
@@ -99,11 +130,11 @@ class Worker:
             'siteId': str(site.id),
             'siteName': site.name,
             'runId': str(run.id),
-            'status': run.status,
-            'authFailed': run.auth_failed,
-            'summary': run.summary,
+            'status': outcome.status,
+            'authFailed': outcome.auth_failed,
+            'summary': outcome.summary,
             'startedAt': run.started_at.isoformat(),
-            'finishedAt': run.finished_at.isoformat() if run.finished_at else None
+            'finishedAt': outcome.finished_at.isoformat() if outcome.finished_at else None
         }
 
         try:
@@ -112,3 +143,73 @@ class Worker:
         except Exception as e:
             # 忽略通知失败
             pass
+
+
+def _consumer_process(concurrency: int):
+    """单个 worker 进程入口"""
+    import asyncio
+    import signal
+    from app.core.config import get_settings
+    from app.services.run_queue import QueueConsumer
+    from app.services.http_pool import http_pool
+    from app.services.run_writer import run_writer
+
+    async def main():
+        consumer = QueueConsumer(concurrency=concurrency)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, consumer.stop)
+        if get_settings().run_writer_enabled:
+            await run_writer.start()
+        try:
+            await consumer.run_forever()
+        finally:
+            await run_writer.stop()
+            await http_pool.aclose()
+
+    asyncio.run(main())
+
+
+def main(argv=None):
+    """
+    独立 worker 模式：python -m app.services.worker --processes 8
+
+    每个进程从 run_queue 表领取运行并执行，API 进程只负责入队（EXECUTION_MODE=queue）。
+    """
+    import argparse
+    import asyncio
+    import multiprocessing
+    from app.db.session import init_db
+
+    parser = argparse.ArgumentParser(description="CheckinHub worker")
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--concurrency', type=int, default=10, help="每个进程同时执行的运行数")
+    args = parser.parse_args(argv)
+
+    asyncio.run(init_db())
+
+    if args.processes <= 1:
+        _consumer_process(args.concurrency)
+        return
+
+    ctx = multiprocessing.get_context('spawn')
+    processes = [
+        ctx.Process(target=_consumer_process, args=(args.concurrency,), name=f"worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    print(f"[Worker] 已启动 {len(processes)} 个 worker 进程", flush=True)
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
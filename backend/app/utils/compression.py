@@ -0,0 +1,17 @@
+import json
+import zlib
+from typing import Any
+
+def compress_json(data: Any, level: int = 6) -> bytes:
+    """
+    序列化为 JSON 并用 zlib 压缩
+    """
+    return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), level)
+
+def decompress_json(payload: bytes) -> Any:
+    """
+    解压 compress_json 的结果
+    """
+    if not payload:
+        return None
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
@@ -1,5 +1,6 @@
-from simpleeval import simple_eval
-from typing import Any, Dict
+import ast
+from simpleeval import simple_eval, SimpleEval
+from typing import Any, Dict, Set
 
 def evaluate_condition(expression: str, context: Dict[str, Any]) -> bool:
     """
@@ -14,3 +15,41 @@ def evaluate_condition(expression: str, context: Dict[str, Any]) -> bool:
         return bool(result)
     except Exception as e:
         raise ValueError(f"条件评估失败: {expression}, 错误: {str(e)}")
+
+class CompiledCondition:
+    """
+    预解析的条件表达式
+    AST 只解析一次；求值器每次评估时按本次的变量新建，编译结果（会被 FlowPlan 缓存）
+    不持有任何运行的变量（如解密后的 token）。解析错误延迟到评估时抛出，与 evaluate_condition 行为一致
+    """
+    __slots__ = ('expression', 'tree', 'error')
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tree = None
+        self.error = None
+
+        if not expression or not expression.strip():
+            return
+
+        try:
+            self.tree = SimpleEval.parse(expression)
+        except Exception as e:
+            self.error = e
+
+    def variables(self) -> Set[str]:
+        """表达式中引用的变量名"""
+        if self.tree is None:
+            return set()
+        return {node.id for node in ast.walk(self.tree) if isinstance(node, ast.Name)}
+
+    def evaluate(self, context: Dict[str, Any]) -> bool:
+        if self.tree is None and self.error is None:
+            return True
+
+        try:
+            if self.error is not None:
+                raise self.error
+            return bool(SimpleEval(names=context).eval(self.expression, previously_parsed=self.tree))
+        except Exception as e:
+            raise ValueError(f"条件评估失败: {self.expression}, 错误: {str(e)}")
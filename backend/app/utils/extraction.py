@@ -1,23 +1,41 @@
 import re
-from typing import Any, Dict
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
 import json
 
-def extract_json_path(data: Any, path: str) -> Any:
+# 预拆分的路径：每段为 (key, 数字下标或 None)
+JsonPath = Tuple[Tuple[str, Optional[int]], ...]
+
+def compile_json_path(path: str) -> JsonPath:
+    """
+    预拆分点号路径，数字段提前转换为下标
+    """
+    if not path:
+        return ()
+    return tuple((key, int(key) if key.isdigit() and key.isascii() else None) for key in path.split('.'))
+
+def extract_json_path(data: Any, path: Union[str, JsonPath]) -> Any:
     """
     从 JSON 数据中提取指定路径的值
-    支持点号分隔的路径，如 'data.user.name'
+    支持点号分隔的路径，如 'data.user.name'，也接受 compile_json_path 的结果。
+    '*' 段展开数组，如 'data.tasks.*.id' 返回每个元素的 id 组成的列表（缺失的跳过）
     """
     if not path:
         return data
 
-    keys = path.split('.')
+    keys = compile_json_path(path) if isinstance(path, str) else path
     current = data
 
-    for key in keys:
+    for pos, (key, idx) in enumerate(keys):
+        if key == '*':
+            if not isinstance(current, list):
+                return None
+            rest = keys[pos + 1:]
+            values = (extract_json_path(item, rest) if rest else item for item in current)
+            return [value for value in values if value is not None]
+
         if isinstance(current, dict):
             current = current.get(key)
-        elif isinstance(current, list) and key.isdigit():
-            idx = int(key)
+        elif isinstance(current, list) and idx is not None:
             current = current[idx] if 0 <= idx < len(current) else None
         else:
             return None
@@ -27,9 +45,15 @@ def extract_json_path(data: Any, path: str) -> Any:
 
     return current
 
-def extract_variables(response_data: Any, extract_rules: list, context: Dict[str, Any]) -> None:
+def extract_variables(
+    response_data: Any,
+    extract_rules: list,
+    context: Dict[str, Any],
+    headers: Optional[Mapping[str, str]] = None,
+) -> None:
     """
     根据提取规则从响应中提取变量到上下文
+    json 类型从响应体按路径提取，header 类型按 name 从响应头提取
     """
     for rule in extract_rules:
         var_name = rule.get('var')
@@ -37,5 +61,9 @@ def extract_variables(response_data: Any, extract_rules: list, context: Dict[str
         path = rule.get('path', '')
 
         if extract_type == 'json':
-            value = extract_json_path(response_data, path)
-            context[var_name] = value
+            if response_data:
+                value = extract_json_path(response_data, path)
+                context[var_name] = value
+        elif extract_type == 'header':
+            if headers is not None:
+                context[var_name] = headers.get(rule.get('name', ''))
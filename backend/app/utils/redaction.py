@@ -1,4 +1,5 @@
 import re
+import codecs
 from typing import Dict, Any
 
 SENSITIVE_HEADERS = ['authorization', 'cookie', 'x-csrf-token', 'x-api-key']
@@ -27,3 +28,23 @@ def redact_response(response_text: str, max_length: int = 500) -> str:
         return response_text[:max_length] + '...'
 
     return response_text
+
+def redact_response_bytes(data: bytes, encoding: str = 'utf-8', max_length: int = 500, truncated: bool = False) -> str:
+    """
+    只解码原始响应字节的前缀并截断，避免为了 500 个字符解码 / 序列化整个响应体
+    """
+    if not data:
+        return ''
+
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    # 每个字符最多 4 字节，多取一个字符用于判断是否需要截断
+    prefix = data[:(max_length + 1) * 4]
+    text = decoder.decode(prefix, final=len(prefix) == len(data))
+
+    if truncated and len(text) <= max_length:
+        return text + '...'
+    return redact_response(text, max_length)
@@ -1,5 +1,7 @@
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Set, Tuple
+
+VAR_PATTERN = re.compile(r'\$\{(\w+)\}')
 
 def render_template(template: str, context: Dict[str, Any]) -> str:
     """
@@ -13,7 +15,7 @@ def render_template(template: str, context: Dict[str, Any]) -> str:
         value = context.get(var_name, '')
         return str(value) if value is not None else ''
 
-    return re.sub(r'\$\{(\w+)\}', replace_var, template)
+    return VAR_PATTERN.sub(replace_var, template)
 
 def render_dict(data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -30,3 +32,86 @@ def render_dict(data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]
         else:
             result[key] = value
     return result
+
+class CompiledTemplate:
+    """
+    预解析的模板字符串
+    segments 为 (is_var, text) 列表，渲染时只做拼接，不再走正则
+    """
+    __slots__ = ('template', 'segments')
+
+    def __init__(self, template: str):
+        self.template = template
+        self.segments: List[Tuple[bool, str]] = []
+
+        if not template:
+            return
+
+        pos = 0
+        for match in VAR_PATTERN.finditer(template):
+            if match.start() > pos:
+                self.segments.append((False, template[pos:match.start()]))
+            self.segments.append((True, match.group(1)))
+            pos = match.end()
+        if pos < len(template):
+            self.segments.append((False, template[pos:]))
+
+    def render(self, context: Dict[str, Any]) -> str:
+        if not self.template:
+            return self.template
+
+        parts = []
+        for is_var, text in self.segments:
+            if is_var:
+                value = context.get(text, '')
+                parts.append(str(value) if value is not None else '')
+            else:
+                parts.append(text)
+        return ''.join(parts)
+
+def compile_dict(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    预解析字典中的字符串值（规则与 render_dict 一致）
+    """
+    result = {}
+    for key, value in data.items():
+        if isinstance(value, str):
+            result[key] = CompiledTemplate(value)
+        elif isinstance(value, dict):
+            result[key] = compile_dict(value)
+        elif isinstance(value, list):
+            result[key] = [CompiledTemplate(v) if isinstance(v, str) else v for v in value]
+        else:
+            result[key] = value
+    return result
+
+def render_compiled_dict(data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    渲染 compile_dict 的结果
+    """
+    result = {}
+    for key, value in data.items():
+        if isinstance(value, CompiledTemplate):
+            result[key] = value.render(context)
+        elif isinstance(value, dict):
+            result[key] = render_compiled_dict(value, context)
+        elif isinstance(value, list):
+            result[key] = [v.render(context) if isinstance(v, CompiledTemplate) else v for v in value]
+        else:
+            result[key] = value
+    return result
+
+def compiled_variables(data: Any) -> Set[str]:
+    """
+    compile_dict / CompiledTemplate 中引用的变量名
+    """
+    names: Set[str] = set()
+    if isinstance(data, CompiledTemplate):
+        names.update(text for is_var, text in data.segments if is_var)
+    elif isinstance(data, dict):
+        for value in data.values():
+            names |= compiled_variables(value)
+    elif isinstance(data, list):
+        for value in data:
+            names |= compiled_variables(value)
+    return names
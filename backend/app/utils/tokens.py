@@ -0,0 +1,30 @@
+import base64
+import json
+from typing import Any, Optional
+
+
+def jwt_expires_at(token: Any) -> Optional[float]:
+    """
+    读取 JWT 的 exp 声明（Unix 秒），只解码不校验签名
+
+    不是 JWT、payload 无法解析或没有 exp 时返回 None
+    """
+    if not isinstance(token, str):
+        return None
+    token = token.strip()
+    if token[:7].lower() == 'bearer ':
+        token = token[7:].strip()
+    parts = token.split('.')
+    if len(parts) != 3:
+        return None
+
+    payload = parts[1]
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (ValueError, TypeError):
+        return None
+
+    exp = claims.get('exp') if isinstance(claims, dict) else None
+    if isinstance(exp, bool) or not isinstance(exp, (int, float)):
+        return None
+    return float(exp)
@@ -0,0 +1,43 @@
+"""
+HAR 变量关联基准：N 个请求（每个响应约 50 个叶子值）生成 Flow 的耗时
+
+运行：cd backend && python -m benchmarks.har_correlation_bench
+"""
+import json
+import time
+
+from app.api.routers.har import _build_flow
+
+
+def _entries(count: int):
+    entries = []
+    for i in range(count):
+        body = {
+            'data': {
+                'token': f'tok_{i:012d}',
+                'items': [{'id': f'item-{i}-{j:04d}', 'name': f'name {j}', 'price': j * 100 + i} for j in range(15)],
+            },
+            'request_id': f'req-{i:010d}',
+        }
+        entries.append({
+            'method': 'POST',
+            'url': f'https://api.example.com/items/item-{max(i - 1, 0)}-0003?page=2',
+            'headers': {'authorization': f'Bearer tok_{max(i - 1, 0):012d}', 'content-type': 'application/json'},
+            'postData': json.dumps({'request_id': f'req-{max(i - 1, 0):010d}', 'count': 3}),
+            'responseHeaders': {'x-request-id': f'trace-{i:010d}'},
+            'responseBody': json.dumps(body),
+        })
+    return entries
+
+
+def main():
+    for count in (1000, 10000, 30000):
+        entries = _entries(count)
+        start = time.perf_counter()
+        result = _build_flow(entries)
+        elapsed = time.perf_counter() - start
+        print(f"{count:6d} 个请求: {elapsed:6.2f} s，{len(result['correlations'])} 个关联变量")
+
+
+if __name__ == "__main__":
+    main()
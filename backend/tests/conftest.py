@@ -0,0 +1,14 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db import session as db_session
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """把全局 engine / async_session 指向临时 SQLite 文件"""
+    engine = db_session.build_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(db_session, "engine", engine)
+    monkeypatch.setattr(db_session, "async_session", sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+    return engine
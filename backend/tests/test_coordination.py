@@ -0,0 +1,120 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.core.config import get_settings
+from app.db import session as db_session
+from app.db.models import Site
+from app.services.coordination import DbLease, FileLease
+from app.services.scheduler import Scheduler
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+CONTEND_SCRIPT = """
+import asyncio, sys
+from app.services.coordination import DbLease
+
+async def main():
+    lease = DbLease('scheduler-leader', sys.argv[1], 60)
+    print('leader' if await lease.acquire() else 'follower', flush=True)
+
+asyncio.run(main())
+"""
+
+
+def test_db_lease_renew_release_and_expiry(temp_db):
+    async def run():
+        await db_session.init_db()
+        a = DbLease('leader', 'a', 30)
+        b = DbLease('leader', 'b', 30)
+
+        assert await a.acquire()
+        assert not await b.acquire()
+        assert await a.acquire()
+
+        await a.release()
+        assert await b.acquire()
+        assert not await a.acquire()
+
+        # 持有者停止续租后，租约过期即可被抢占
+        c = DbLease('leader', 'c', 0)
+        await b.release()
+        assert await c.acquire()
+        await asyncio.sleep(0.01)
+        assert await a.acquire()
+
+    asyncio.run(run())
+
+
+def test_file_lease_is_exclusive(tmp_path):
+    async def run():
+        path = str(tmp_path / 'locks' / 'scheduler.lock')
+        a, b = FileLease(path, 'a'), FileLease(path, 'b')
+        assert await a.acquire()
+        assert not await b.acquire()
+        await a.release()
+        assert await b.acquire()
+        await b.release()
+
+    asyncio.run(run())
+
+
+def test_only_one_process_wins_the_lease(tmp_path):
+    db_path = tmp_path / 'shared.db'
+    url = f"sqlite+aiosqlite:///{db_path}"
+
+    async def init():
+        engine = db_session.build_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(db_session.SQLModel.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(init())
+
+    env = {**os.environ, 'DATABASE_URL': url}
+    procs = [
+        subprocess.Popen(
+            [sys.executable, '-c', CONTEND_SCRIPT, f'replica-{i}'],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, text=True,
+        )
+        for i in range(4)
+    ]
+    outputs = [proc.communicate(timeout=60)[0].strip().splitlines()[-1] for proc in procs]
+    assert sorted(outputs) == ['follower', 'follower', 'follower', 'leader']
+
+
+def test_only_leader_schedules_sites_and_failover(temp_db, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "scheduler_backend", "heap")
+    monkeypatch.setattr(settings, "scheduler_coordination", "lease")
+
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="site", base_url="https://example.com", schedule={'type': 'dailyAfter'})
+            session.add(site)
+            await session.commit()
+
+        monkeypatch.setattr(settings, "replica_id", "replica-a")
+        first = Scheduler()
+        await first.start()
+        monkeypatch.setattr(settings, "replica_id", "replica-b")
+        second = Scheduler()
+        await second.start()
+
+        assert first.is_leader and not second.is_leader
+        assert first.timer.next_run(site.id) is not None
+        assert len(second.timer) == 0
+        assert first.scheduler.get_job('retention') and not second.scheduler.get_job('retention')
+
+        # leader 停止时让出租约，另一个副本下一轮接管
+        await first.stop()
+        await second.elector.step()
+        assert second.is_leader
+        assert second.timer.next_run(site.id) is not None
+        assert second.scheduler.get_job('retention')
+        await second.stop()
+
+    asyncio.run(run())
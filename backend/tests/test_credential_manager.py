@@ -0,0 +1,109 @@
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.core.config import get_settings
+from app.db import session as db_session
+from app.db.models import Site
+from app.main import app
+from app.services.credential_manager import CredentialManager, get_credential_manager
+from app.utils.tokens import jwt_expires_at
+
+
+def test_decrypt_cache_and_invalidate(monkeypatch):
+    cm = CredentialManager("k" * 32, cache_ttl=60, cache_size=2)
+    encrypted = cm.encrypt("secret-token")
+    auth = {"type": "bearer", "encrypted": encrypted}
+
+    calls = []
+    original = cm.decrypt
+    monkeypatch.setattr(cm, "decrypt", lambda c, n: calls.append(c) or original(c, n))
+
+    assert cm.prewarm([auth, None, {"type": "none"}]) == 1
+    assert cm.resolve_secret(auth) == {"token": "secret-token"}
+    assert len(calls) == 1
+
+    cm.invalidate(auth)
+    assert cm.resolve_secret(auth) == {"token": "secret-token"}
+    assert len(calls) == 2
+
+
+def test_cache_is_size_bounded():
+    cm = CredentialManager("k" * 32, cache_ttl=60, cache_size=2)
+    for i in range(5):
+        blob = cm.encrypt(f"token-{i}")
+        cm.decrypt_cached(blob["ciphertext"], blob["nonce"])
+    assert len(cm._cache) == 2
+
+
+def _jwt(claims):
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+    return f"{encode({'alg': 'HS256'})}.{encode(claims)}.signature"
+
+
+def test_jwt_expiry_is_read_without_verification():
+    cm = CredentialManager("k" * 32)
+    assert jwt_expires_at(_jwt({"exp": 1700000000})) == 1700000000
+    assert jwt_expires_at("Bearer " + _jwt({"exp": 1700000000.5})) == 1700000000.5
+    assert jwt_expires_at(_jwt({"sub": "u1"})) is None
+    assert jwt_expires_at("opaque-token") is None
+    assert jwt_expires_at("a.!!!.c") is None
+    assert cm.token_expires_at({"type": "bearer", "encrypted": cm.encrypt(_jwt({"exp": 42}))}) == 42
+    assert cm.token_expires_at({"type": "bearer", "encrypted": {"ciphertext": "AAAA", "nonce": "AAAA"}}) is None
+
+
+def test_expiring_credentials_endpoint(temp_db, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "admin_token", "test-token")
+    cm = get_credential_manager()
+    now = time.time()
+
+    async def seed():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            for name, token in [
+                ("expired", _jwt({"exp": now - 60})),
+                ("soon", _jwt({"exp": now + 3600})),
+                ("later", _jwt({"exp": now + 30 * 86400})),
+                ("opaque", "opaque-token"),
+            ]:
+                session.add(Site(name=name, auth={"type": "bearer", "encrypted": cm.encrypt(token)}))
+            session.add(Site(name="no-auth"))
+            await session.commit()
+
+    asyncio.run(seed())
+    client = TestClient(app)
+    response = client.get("/api/system/credentials/expiring", headers={"Authorization": "Bearer test-token"})
+
+    assert response.status_code == 200
+    credentials = response.json()["credentials"]
+    assert [(item["siteName"], item["expired"]) for item in credentials] == [("expired", True), ("soon", False)]
+
+
+def test_prewarm_due_credentials_queries_in_chunks(temp_db, monkeypatch):
+    from app.services import scheduler as scheduler_module
+
+    now = datetime.now().astimezone()
+    sites = [Site(name=f"site-{i}", auth={"type": "bearer", "encrypted": {"ciphertext": f"c{i}", "nonce": "n"}}) for i in range(1200)]
+    jobs = [(site.id, f"site_{site.id}", now) for site in sites]
+    batches = []
+    manager = SimpleNamespace(prewarm=lambda auths: batches.append(len(auths)) or len(auths))
+    monkeypatch.setattr(scheduler_module.scheduler, "list_site_jobs", lambda: jobs)
+    monkeypatch.setattr(scheduler_module, "get_credential_manager", lambda: manager)
+
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            session.add_all(sites)
+            await session.commit()
+        await scheduler_module.scheduler.prewarm_due_credentials()
+
+    asyncio.run(run())
+    # 每批最多 IN_CHUNK_SIZE 个参数
+    assert batches == [500, 500, 200]
@@ -0,0 +1,123 @@
+import asyncio
+
+from app.core.config import get_settings
+from app.services.dispatcher import RunDispatcher
+
+
+class _RecordingWorker:
+    def __init__(self):
+        self.order = []
+        self.gate = asyncio.Event()
+
+    async def run_site(self, site_id, trigger='manual'):
+        await self.gate.wait()
+        self.order.append(site_id)
+        return {'status': 'success', 'trigger': trigger}
+
+
+def test_manual_runs_jump_scheduled_queue(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "dispatcher_concurrency", 1)
+    monkeypatch.setattr(settings, "dispatcher_queue_size", 3)
+
+    async def run():
+        worker = _RecordingWorker()
+        dispatcher = RunDispatcher(worker=worker)
+        await dispatcher.start()
+
+        first = dispatcher.submit("s0", trigger='scheduled')
+        await asyncio.sleep(0)  # s0 占用唯一的执行槽
+        scheduled = [dispatcher.submit(f"s{i}", trigger='scheduled') for i in range(1, 5)]
+        manual = dispatcher.submit("m1", trigger='manual')
+
+        worker.gate.set()
+        results = await asyncio.gather(first, manual, *scheduled)
+        stats = dispatcher.stats()
+        await dispatcher.stop()
+        return worker.order, results, stats
+
+    order, results, stats = asyncio.run(run())
+    assert order == ["s0", "m1", "s1", "s2", "s3"]
+    assert results[-1] == {'status': 'rejected', 'message': 'Dispatcher queue is full'}
+    assert stats['rejected'] == 1
+    assert stats['completed'] == 5
+    assert stats['queueDepth'] == 0
+
+
+def _busy_dispatcher(monkeypatch, queue_size):
+    """单并发分发器，唯一的执行槽被一个等待 gate 的任务占用"""
+    settings = get_settings()
+    monkeypatch.setattr(settings, "dispatcher_concurrency", 1)
+    monkeypatch.setattr(settings, "dispatcher_queue_size", queue_size)
+    worker = _RecordingWorker()
+    return worker, RunDispatcher(worker=worker)
+
+
+def test_queue_runs_by_priority_then_submission_order(monkeypatch):
+    async def run():
+        worker, dispatcher = _busy_dispatcher(monkeypatch, queue_size=10)
+        await dispatcher.start()
+        futures = [dispatcher.submit("busy", trigger='scheduled')]
+        await asyncio.sleep(0)
+        futures += [
+            dispatcher.submit("low-1", trigger='scheduled', priority=20),
+            dispatcher.submit("sched-1", trigger='scheduled'),
+            dispatcher.submit("high", trigger='scheduled', priority=5),
+            dispatcher.submit("sched-2", trigger='scheduled'),
+            dispatcher.submit("manual", trigger='manual'),
+            dispatcher.submit("low-2", trigger='scheduled', priority=20),
+        ]
+        worker.gate.set()
+        await asyncio.gather(*futures)
+        await dispatcher.stop()
+        return worker.order
+
+    assert asyncio.run(run()) == ["busy", "manual", "high", "sched-1", "sched-2", "low-1", "low-2"]
+
+
+def test_scheduled_runs_rejected_when_queue_full(monkeypatch):
+    async def run():
+        worker, dispatcher = _busy_dispatcher(monkeypatch, queue_size=2)
+        await dispatcher.start()
+        busy = dispatcher.submit("busy", trigger='scheduled')
+        await asyncio.sleep(0)
+        queued = [dispatcher.submit(f"s{i}", trigger='scheduled') for i in range(2)]
+        rejected = [dispatcher.submit(f"r{i}", trigger='scheduled', priority=1) for i in range(2)]
+        # 被拒绝的任务立即返回结果，不进入队列
+        assert all(future.done() for future in rejected)
+        assert not any(future.done() for future in queued)
+        full_stats = dispatcher.stats()
+
+        worker.gate.set()
+        await asyncio.gather(busy, *queued)
+        await dispatcher.stop()
+        return worker.order, [future.result() for future in rejected], full_stats
+
+    order, rejected, stats = asyncio.run(run())
+    assert order == ["busy", "s0", "s1"]
+    assert rejected == [{'status': 'rejected', 'message': 'Dispatcher queue is full'}] * 2
+    assert stats['queueDepth'] == 2 and stats['rejected'] == 2 and stats['submitted'] == 3
+
+
+def test_manual_runs_bypass_queue_limit(monkeypatch):
+    async def run():
+        worker, dispatcher = _busy_dispatcher(monkeypatch, queue_size=1)
+        await dispatcher.start()
+        busy = dispatcher.submit("busy", trigger='scheduled')
+        await asyncio.sleep(0)
+        scheduled = dispatcher.submit("s0", trigger='scheduled')
+        manual = [dispatcher.submit(f"m{i}", trigger='manual') for i in range(3)]
+        depth = dispatcher.stats()['queueDepth']
+
+        worker.gate.set()
+        results = await asyncio.gather(busy, scheduled, *manual)
+        stats = dispatcher.stats()
+        await dispatcher.stop()
+        return worker.order, results, depth, stats
+
+    order, results, depth, stats = asyncio.run(run())
+    # 队列上限为 1，但手动运行仍全部入队并先于定时任务执行
+    assert depth == 4
+    assert order == ["busy", "m0", "m1", "m2", "s0"]
+    assert all(result['status'] == 'success' for result in results)
+    assert stats['rejected'] == 0 and stats['completed'] == 5
@@ -0,0 +1,417 @@
+import asyncio
+import base64
+import json
+import random
+import time
+
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.services import flow_engine as flow_engine_module
+from app.services.flow_engine import FlowEngine
+from app.services.flow_plan import FlowPlanCache
+from app.services.host_guard import HostGuard
+from app.services.http_pool import HttpClientPool
+from app.utils.conditions import CompiledCondition
+from app.utils.templating import CompiledTemplate, render_template
+
+FLOW = [
+    {
+        "name": "status",
+        "method": "GET",
+        "url": "https://up.example.com/api/checkin/status",
+        "headers": {"authorization": "Bearer ${token}"},
+        "expect": {"type": "json", "path": "success", "equals": True},
+        "extract": [{"var": "can_spin", "type": "json", "path": "data.can_spin"}],
+    },
+    {
+        "name": "spin",
+        "condition": "can_spin == True",
+        "method": "POST",
+        "url": "https://up.example.com/api/checkin/spin",
+        "headers": {"authorization": "Bearer ${token}"},
+        "body": {"token": "${token}"},
+        "expect": {"type": "json", "path": "success", "equals": True},
+        "extract": [{"var": "reward", "type": "json", "path": "items.0.name"}],
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def host_guard(monkeypatch):
+    """每个测试使用独立的熔断状态，默认不限流"""
+    guard = HostGuard()
+    monkeypatch.setattr(flow_engine_module, "host_guard", guard)
+    monkeypatch.setattr(get_settings(), "host_rate_per_second", 0)
+    return guard
+
+
+@pytest.fixture
+def mock_upstream(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("/big"):
+            return httpx.Response(200, stream=httpx.ByteStream(b'{"success": true, "pad": "' + b"x" * 200_000 + b'"}'))
+        if request.url.path.endswith("/status"):
+            payload = {"success": True, "data": {"can_spin": True}}
+        else:
+            payload = {"success": True, "items": [{"name": "10 积分"}]}
+        return httpx.Response(200, stream=httpx.ByteStream(json.dumps(payload).encode()))
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    return requests
+
+
+def test_execute_flow_success(mock_upstream):
+    result = asyncio.run(FlowEngine().execute_flow(None, FLOW, {"type": "bearer", "token": "abc"}))
+
+    assert result.status == 'SUCCESS'
+    assert [step['status'] for step in result.steps] == ['SUCCESS', 'SUCCESS']
+    assert mock_upstream[0].headers["authorization"] == "Bearer abc"
+    assert json.loads(mock_upstream[1].content) == {"token": "abc"}
+
+
+def test_condition_skips_step(mock_upstream):
+    flow = [dict(FLOW[1], condition="1 == 2")]
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+
+    assert result.status == 'SKIPPED'
+    assert mock_upstream == []
+
+
+def test_large_body_is_capped(mock_upstream):
+    step = {"name": "big", "method": "GET", "url": "https://up.example.com/big", "maxBodyBytes": 1024}
+    result = asyncio.run(FlowEngine().execute_flow(None, [step], {}))
+
+    assert result.status == 'SUCCESS'
+    assert result.steps[0]['truncated'] is True
+    assert result.steps[0]['response'].startswith('{"success": true, "pad": "xxx')
+    assert len(result.steps[0]['response']) == 503
+
+    step["expect"] = {"type": "json", "path": "success", "equals": True}
+    result = asyncio.run(FlowEngine().execute_flow(None, [step], {}))
+    assert result.status == 'FAILED'
+    assert 'maxBodyBytes=1024' in result.steps[0]['error']
+
+
+def test_compiled_template_matches_regex_renderer():
+    context = {"a": 1, "b": None, "c": "x"}
+    for template in ["", "plain", "${a}", "p/${a}/${b}/${c}/${missing}", "${a}${c}tail"]:
+        assert CompiledTemplate(template).render(context) == render_template(template, context)
+
+
+def test_flow_plan_cache_keyed_by_updated_at():
+    cache = FlowPlanCache(max_size=2)
+    first = cache.get("site", 1, FLOW)
+    assert cache.get("site", 1, FLOW) is first
+    assert cache.get("site", 2, FLOW) is not first
+    assert len(cache) == 1
+
+    cache.invalidate("site")
+    assert len(cache) == 0
+
+
+def _slow_upstream(monkeypatch, delay=0.1, fail_path=None):
+    """每个请求耗时 delay 秒，记录同时在途的最大请求数"""
+    state = {"in_flight": 0, "peak": 0, "paths": []}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        state["paths"].append(request.url.path)
+        await asyncio.sleep(delay)
+        state["in_flight"] -= 1
+        if request.url.path == fail_path:
+            return httpx.Response(500)
+        return httpx.Response(200, json={"success": True, "data": {"id": request.url.path.rsplit("/", 1)[-1]}})
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    return state
+
+
+def _step(name, **extra):
+    return {"name": name, "method": "POST", "url": f"https://up.example.com/api/{name}", **extra}
+
+
+def test_independent_steps_run_concurrently(monkeypatch):
+    state = _slow_upstream(monkeypatch)
+    flow = [
+        _step("checkin", extract=[{"var": "checkin_id", "type": "json", "path": "data.id"}]),
+        _step("claim-a", dependsOn=["checkin"]),
+        _step("claim-b", dependsOn=["checkin"]),
+        _step("claim-c", dependsOn=["checkin"]),
+        # 只通过变量引用推断出依赖 checkin
+        _step("balance", dependsOn="auto", headers={"x-checkin": "${checkin_id}"}),
+    ]
+
+    started = time.monotonic()
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+    elapsed = time.monotonic() - started
+
+    assert result.status == 'SUCCESS'
+    assert [step['name'] for step in result.steps] == [step['name'] for step in flow]
+    assert state["paths"][0] == "/api/checkin" and state["peak"] == 4
+    # 关键路径两次往返，而不是五次
+    assert elapsed < 0.4
+
+
+def test_graph_stops_starting_steps_after_failure(monkeypatch):
+    state = _slow_upstream(monkeypatch, delay=0.01, fail_path="/api/claim-b")
+    flow = [
+        _step("claim-a", dependsOn=[]),
+        _step("claim-b", dependsOn=[]),
+        _step("summary", dependsOn=["claim-a", "claim-b"]),
+    ]
+
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+
+    assert result.status == 'FAILED'
+    assert result.summary.startswith("步骤 claim-b 失败")
+    assert "/api/summary" not in state["paths"]
+    assert [step['name'] for step in result.steps] == ["claim-a", "claim-b"]
+
+
+def test_flow_plan_dependencies():
+    plan = FlowPlanCache(max_size=1).get("site", 1, [
+        _step("login", extract=[{"var": "uid", "type": "json", "path": "data.id"}]),
+        _step("profile"),
+        _step("task", dependsOn="auto", condition="uid != None"),
+        _step("later", dependsOn=["task", "later"]),
+    ])
+
+    assert plan.parallel
+    assert plan.dependencies == [(), (0,), (0,), (2,)]
+    assert "later" in str(plan.steps[3].compile_error)
+
+
+def test_for_each_fans_out_over_extracted_items(monkeypatch):
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path == "/api/tasks":
+            tasks = [{"id": i, "done": i == 3} for i in range(50)]
+            return httpx.Response(200, json={"data": {"tasks": tasks}})
+        await asyncio.sleep(0.05)
+        if request.url.path == "/api/claim/7":
+            return httpx.Response(500)
+        return httpx.Response(200, json={"success": True})
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    flow = [
+        {
+            "name": "tasks", "method": "GET", "url": "https://up.example.com/api/tasks",
+            "extract": [{"var": "tasks", "type": "json", "path": "data.tasks"}],
+        },
+        {
+            "name": "claim", "method": "POST", "url": "https://up.example.com/api/claim/${task_id}",
+            "forEach": {"items": "tasks", "as": "task", "concurrency": 10},
+            "condition": "task_done == False",
+            "body": {"index": "${task_index}"},
+        },
+    ]
+
+    started = time.monotonic()
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+    elapsed = time.monotonic() - started
+
+    claim = result.steps[1]
+    assert result.status == 'FAILED'
+    assert claim['item_counts'] == {'SUCCESS': 48, 'FAILED': 1, 'SKIPPED': 1, 'CIRCUIT_OPEN': 0}
+    assert [item['index'] for item in claim['items']] == list(range(50))
+    assert claim['items'][7]['status_code'] == 500 and 'response' not in claim['items'][7]
+    assert claim['error'].startswith("1/50 个元素失败")
+    assert json.loads(requests[1].content) == {"index": "0"}
+    # 49 个请求、每个 50ms、并发 10：约 5 轮
+    assert elapsed < 1.0
+
+
+def test_for_each_rate_limit_and_wildcard_items(monkeypatch):
+    starts = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tasks":
+            return httpx.Response(200, json={"data": {"tasks": [{"id": "a"}, {"id": "b"}, {}, {"id": "c"}]}})
+        starts.append(time.monotonic())
+        return httpx.Response(200, json={})
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    flow = [
+        {
+            "name": "tasks", "method": "GET", "url": "https://up.example.com/api/tasks",
+            "extract": [{"var": "task_ids", "type": "json", "path": "data.tasks.*.id"}],
+        },
+        {
+            "name": "claim", "method": "POST", "url": "https://up.example.com/api/claim/${item}",
+            "forEach": {"items": "task_ids", "concurrency": 3, "ratePerSecond": 10},
+        },
+    ]
+
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+
+    assert result.status == 'SUCCESS'
+    assert result.steps[1]['item_counts']['SUCCESS'] == 3
+    assert starts[-1] - starts[0] >= 0.18
+
+
+def test_for_each_counts_auth_failed_items(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        item = request.url.path.rsplit("/", 1)[-1]
+        if item == "tasks":
+            return httpx.Response(200, json={"ids": ["a", "expired", "b"]})
+        if item == "expired":
+            return httpx.Response(401)
+        return httpx.Response(200, json={})
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    monkeypatch.setattr(flow_engine_module, "host_guard", HostGuard())
+    flow = [
+        {
+            "name": "tasks", "method": "GET", "url": "https://up.example.com/api/tasks",
+            "extract": [{"var": "ids", "type": "json", "path": "ids"}],
+        },
+        {
+            "name": "claim", "method": "GET", "url": "https://up.example.com/api/claim/${item}",
+            "forEach": {"items": "ids", "concurrency": 2},
+        },
+    ]
+
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+
+    # 元素认证失败：步骤失败并标记 auth_failed，计数中不会缺少状态
+    claim = result.steps[1]
+    assert result.status == 'FAILED' and result.auth_failed
+    assert claim['items'][1]['auth_failed']
+    assert claim['item_counts'] == {'SUCCESS': 2, 'FAILED': 1, 'SKIPPED': 0, 'CIRCUIT_OPEN': 0}
+
+
+def test_step_timeout_and_run_deadline(monkeypatch):
+    _slow_upstream(monkeypatch, delay=0.2)
+    monkeypatch.setattr(get_settings(), "flow_run_deadline_seconds", 0.3)
+
+    flow = [_step("fast", timeoutMs=50)]
+    started = time.monotonic()
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+    assert result.status == 'FAILED' and 'timeoutMs=50' in result.steps[0]['error']
+    assert time.monotonic() - started < 0.15
+    assert result.deadline_step is None
+
+    # 第二步开始时只剩约 0.1s 预算，被取消并记录为耗尽截止时间的步骤
+    flow = [_step("first"), _step("second"), _step("third")]
+    started = time.monotonic()
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+    assert time.monotonic() - started < 0.4
+    assert result.status == 'FAILED'
+    assert result.deadline_step == "second"
+    assert result.steps[1]['deadline_exceeded'] is True
+    assert len(result.steps) == 2
+
+
+def test_compiled_step_timeouts():
+    plan = FlowPlanCache(max_size=1).get("site", 1, [
+        _step("a", timeoutMs={"connect": 1000, "read": 5000, "total": 8000}),
+        _step("b"),
+    ])
+    first, second = plan.steps
+    assert (first.timeout.connect, first.timeout.read, first.total_timeout) == (1.0, 5.0, 8.0)
+    assert second.total_timeout == get_settings().flow_step_timeout_ms / 1000
+
+
+def test_retry_policy_backoff_and_idempotency(monkeypatch):
+    calls = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        calls[path] = calls.get(path, 0) + 1
+        if path == "/api/status" and calls[path] <= 2:
+            return httpx.Response(503)
+        if path == "/api/spin" and calls[path] == 1:
+            raise httpx.ConnectError("connection refused")
+        if path == "/api/bonus":
+            return httpx.Response(502)
+        return httpx.Response(200, json={"success": True})
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    retry = {"backoffMs": 10}
+    flow = [
+        {"name": "status", "method": "GET", "url": "https://up.example.com/api/status", "retry": retry},
+        _step("spin", retry=retry),
+        _step("bonus", retry=retry),
+    ]
+
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+
+    status, spin, bonus = result.steps
+    assert status['status'] == 'SUCCESS'
+    assert [attempt['status_code'] for attempt in status['attempts']] == [503, 503, 200]
+    assert all(attempt['backoff_ms'] <= 20 for attempt in status['attempts'][:2])
+    # 非幂等步骤：连接失败（请求未发出）可以重试，502 不重试
+    assert spin['status'] == 'SUCCESS' and "connection refused" in spin['attempts'][0]['error']
+    assert bonus['status'] == 'FAILED' and 'attempts' not in bonus
+    assert calls == {"/api/status": 3, "/api/spin": 2, "/api/bonus": 1}
+
+
+def test_long_backoff_defers_run_and_budget_limits_retries(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "flow_retry_inline_max_seconds", 0.05)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(503)
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    flow = [{
+        "name": "status", "method": "GET", "url": "https://up.example.com/api/status",
+        "retry": {"maxAttempts": 5, "backoffMs": 60_000, "maxBackoffMs": 60_000},
+    }]
+
+    # 退避过长：不在运行内等待，结束运行并交给调度器重跑
+    monkeypatch.setattr(random, "uniform", lambda a, b: b)
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}))
+    assert result.status == 'RETRYING' and result.retry_after == 60
+    assert len(requests) == 1 and result.steps[0]['attempts'][0]['backoff_ms'] == 60_000
+
+    # 重试预算耗尽后直接失败
+    monkeypatch.setattr(settings, "host_retry_ratio", 0)
+    monkeypatch.setattr(settings, "host_retry_burst", 1)
+    guard = HostGuard()
+    monkeypatch.setattr(flow_engine_module, "host_guard", guard)
+    flow[0]["retry"] = {"maxAttempts": 5, "backoffMs": 1}
+    results = [asyncio.run(FlowEngine().execute_flow(None, flow, {})) for _ in range(2)]
+    assert [len(step.get('attempts', [])) for result in results for step in result.steps] == [2, 0]
+    assert results[1].status == 'FAILED'
+
+
+def test_expired_jwt_short_circuits_before_any_request(mock_upstream):
+    def jwt(exp):
+        payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).rstrip(b"=").decode()
+        return f"eyJhbGciOiJIUzI1NiJ9.{payload}.sig"
+
+    result = asyncio.run(FlowEngine().execute_flow(None, FLOW, {"type": "bearer", "token": jwt(time.time() - 10)}))
+    assert result.status == 'FAILED' and result.auth_failed
+    assert "过期" in result.summary and result.steps == []
+    assert mock_upstream == []
+
+    result = asyncio.run(FlowEngine().execute_flow(None, FLOW, {"type": "bearer", "token": jwt(time.time() + 3600)}))
+    assert result.status == 'SUCCESS' and len(mock_upstream) == 2
+
+
+def test_compiled_condition_keeps_no_run_variables():
+    condition = CompiledCondition("can_spin == True and token != ''")
+    assert condition.evaluate({"can_spin": True, "token": "secret"})
+    assert not condition.evaluate({"can_spin": False, "token": "secret"})
+    # 缓存的编译结果中不残留上一次运行的变量
+    assert not any(
+        "secret" in repr(getattr(condition, slot)) for slot in CompiledCondition.__slots__
+    )
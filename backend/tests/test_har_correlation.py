@@ -0,0 +1,69 @@
+import json
+
+from app.api.routers.har import _build_flow
+from app.utils.extraction import extract_json_path
+
+
+def test_generate_flow_correlates_response_values():
+    entries = [
+        {
+            'method': 'POST', 'url': 'https://api.example.com/login', 'headers': {'Content-Type': 'application/json'},
+            'postData': '{"user": "demo"}',
+            'responseHeaders': {'X-Csrf-Token': 'csrf-9f8e7d6c5b', 'Content-Type': 'application/json'},
+            'responseBody': json.dumps({'data': {'token': 'tok_123456789', 'user': {'id': 4242424}, 'ok': 'success'}}),
+        },
+        {
+            'method': 'POST', 'url': 'https://api.example.com/users/4242424/checkin?sig=abc',
+            'headers': {'Authorization': 'Bearer tok_123456789', 'X-CSRF-Token': 'csrf-9f8e7d6c5b', 'X-Trace': 'static-value'},
+            'postData': json.dumps({'user_id': 4242424, 'token': 'tok_123456789', 'status': 'success'}),
+            'responseBody': '{"items": [{"id": "item-00001"}]}',
+        },
+        {'method': 'GET', 'url': 'https://api.example.com/items/item-00001', 'headers': {}},
+    ]
+
+    flow = _build_flow(entries)['flow']
+
+    assert sorted(flow[0]['extract'], key=lambda rule: rule['var']) == [
+        {'var': 'id', 'type': 'json', 'path': 'data.user.id'},
+        {'var': 'token', 'type': 'json', 'path': 'data.token'},
+        {'var': 'x_csrf_token', 'type': 'header', 'name': 'X-Csrf-Token'},
+    ]
+
+    assert flow[1]['url'] == 'https://api.example.com/users/${id}/checkin?sig=abc'
+    assert flow[1]['headers']['authorization'] == 'Bearer ${token}'
+    assert flow[1]['headers']['x-csrf-token'] == '${x_csrf_token}'
+    assert 'x-trace' not in flow[1]['headers']
+    # 非字符串值保持原样，普通单词不参与关联
+    assert flow[1]['body'] == {'user_id': 4242424, 'token': '${token}', 'status': 'success'}
+    assert flow[1]['extract'] == [{'var': 'id_2', 'type': 'json', 'path': 'items.0.id'}]
+    assert flow[2]['url'] == 'https://api.example.com/items/${id_2}'
+
+    body = json.loads(entries[0]['responseBody'])
+    for rule in flow[0]['extract']:
+        if rule['type'] == 'json':
+            assert extract_json_path(body, rule['path']) is not None
+
+
+def test_shared_dates_versions_and_timestamps_are_not_correlated():
+    entries = [
+        {
+            'method': 'GET', 'url': 'https://api.example.com/config', 'headers': {},
+            'responseBody': json.dumps({
+                'today': '2024-05-01', 'version': '2.10.3', 'serverTime': 1714550400, 'session': 'sess-77aa99',
+            }),
+        },
+        {
+            'method': 'POST', 'url': 'https://api.example.com/checkin?date=2024-05-01&v=2.10.3&ts=1714550400',
+            'headers': {'X-App-Version': '2.10.3', 'X-Session': 'sess-77aa99'},
+            'postData': json.dumps({'day': '2024-05-01', 'ts': '1714550400'}),
+        },
+    ]
+
+    flow = _build_flow(entries)['flow']
+
+    # 只有真正的动态值被关联，日期、版本号、时间戳保留原值
+    assert flow[0]['extract'] == [{'var': 'session', 'type': 'json', 'path': 'session'}]
+    assert flow[1]['url'] == 'https://api.example.com/checkin?date=2024-05-01&v=2.10.3&ts=1714550400'
+    assert flow[1]['headers'].get('x-session') == '${session}'
+    assert flow[1]['headers'].get('x-app-version') in (None, '2.10.3')
+    assert flow[1]['body'] == {'day': '2024-05-01', 'ts': '1714550400'}
@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import get_settings
+from app.main import app
+from app.services import har_parser
+from app.services.har_parser import HarParseError, HarRequestFilter, iter_har_entries
+
+
+def _entry(url, method="GET", post=None):
+    request = {"url": url, "method": method, "headers": [{"name": "Accept", "value": "application/json"}]}
+    if post is not None:
+        request["postData"] = {"text": post}
+    return {"request": request, "response": {"status": 200, "content": {"text": "x" * 100}}, "time": 12.5}
+
+
+HAR = {
+    "log": {
+        "version": 1.2,
+        "creator": {"name": "test", "version": "1"},
+        "pages": [{"id": "page_1", "title": "数据"}],
+        "entries": [
+            _entry("https://api.example.com/checkin", "POST", '{"a": 1}'),
+            _entry("https://cdn.example.com/app.js"),
+            _entry("https://cdn.example.com/app.js?v=3"),
+            _entry("https://www.google-analytics.com/collect"),
+            _entry("https://api.example.com/user/info"),
+        ],
+    },
+    "extra": [1, 2, 3],
+}
+
+
+def _chunks(raw, size=7):
+    # 每块只有几个字节，覆盖跨块的值和被截断的数字
+    return (raw[i:i + size] for i in range(0, len(raw), size))
+
+
+def test_stream_matches_full_parse():
+    raw = json.dumps(HAR, ensure_ascii=False, indent=2).encode("utf-8")
+    assert list(iter_har_entries(_chunks(b"\xef\xbb\xbf" + raw), 1 << 20)) == HAR["log"]["entries"]
+
+    parser = HarRequestFilter(1 << 20)
+    requests = [entry for chunk in _chunks(raw) for entry in parser.feed(chunk)] + parser.close()
+    assert [entry["url"] for entry in requests] == ["https://api.example.com/checkin", "https://api.example.com/user/info"]
+
+
+def test_rejects_truncated_and_oversized(monkeypatch):
+    raw = json.dumps(HAR).encode("utf-8")
+    with pytest.raises(HarParseError):
+        list(iter_har_entries(_chunks(raw[:-20]), 1 << 20))
+    monkeypatch.setattr(har_parser, "CHUNK_SIZE", 16)
+    with pytest.raises(HarParseError):
+        list(iter_har_entries(_chunks(raw), 64))
+
+
+def test_parse_endpoint_ndjson(monkeypatch):
+    monkeypatch.setattr(get_settings(), "admin_token", "test-token")
+    client = TestClient(app)
+    files = {"file": ("session.har", json.dumps(HAR).encode("utf-8"), "application/json")}
+    headers = {"Authorization": "Bearer test-token"}
+
+    response = client.post("/api/har/parse", params={"format": "ndjson"}, files=files, headers=headers)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["method"] for line in lines] == ["POST", "GET"]
+    assert lines[0]["postData"] == '{"a": 1}'
+
+    # 直接以请求体上传，分页返回
+    body = client.post("/api/har/parse", params={"offset": 1, "limit": 1}, content=json.dumps(HAR), headers=headers).json()
+    assert body["total"] == 2 and [entry["url"] for entry in body["entries"]] == ["https://api.example.com/user/info"]
+
+    files = {"file": ("bad.har", b'{"log": {"entries": [', "application/json")}
+    assert client.post("/api/har/parse", files=files, headers=headers).status_code == 400
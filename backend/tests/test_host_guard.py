@@ -0,0 +1,120 @@
+import asyncio
+import time
+from uuid import uuid4
+
+import httpx
+import pytest
+
+import app.services.scheduler as scheduler_module
+from app.core.config import get_settings
+from app.services import flow_engine as flow_engine_module
+from app.services.flow_engine import FlowEngine
+from app.services.host_guard import HALF_OPEN, OPEN, HostGuard, HostUnavailableError
+from app.services.http_pool import HttpClientPool
+from app.services.scheduler import Scheduler
+
+
+@pytest.fixture
+def guard(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "host_breaker_failures", 3)
+    monkeypatch.setattr(settings, "host_breaker_open_seconds", 0.2)
+    monkeypatch.setattr(settings, "host_rate_per_second", 0)
+    guard = HostGuard()
+    monkeypatch.setattr(flow_engine_module, "host_guard", guard)
+    return guard
+
+
+def test_breaker_opens_and_half_open_probe_closes(guard):
+    async def run():
+        for _ in range(3):
+            await guard.acquire("a.example.com")
+            guard.record("a.example.com", False)
+        with pytest.raises(HostUnavailableError):
+            await guard.acquire("a.example.com")
+        # 其他主机不受影响
+        await guard.acquire("b.example.com")
+
+        await asyncio.sleep(0.25)
+        await guard.acquire("a.example.com")
+        assert guard.stats()["a.example.com"]["state"] == HALF_OPEN
+        # 半开状态只放行一个探测请求
+        with pytest.raises(HostUnavailableError):
+            await guard.acquire("a.example.com")
+        guard.record("a.example.com", True)
+        await guard.acquire("a.example.com")
+
+    asyncio.run(run())
+
+
+def test_token_bucket_paces_and_rejects_long_waits(guard, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "host_rate_per_second", 20)
+    monkeypatch.setattr(settings, "host_burst", 2)
+    monkeypatch.setattr(settings, "host_max_wait_seconds", 0.15)
+
+    async def run():
+        started = time.monotonic()
+        for _ in range(4):
+            await guard.acquire("a.example.com")
+        assert time.monotonic() - started >= 0.09
+        # 已经排到 0.15s 之后的请求直接失败，不占着 worker 等待
+        tasks = [asyncio.ensure_future(guard.acquire("a.example.com")) for _ in range(5)]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert any(isinstance(result, HostUnavailableError) for result in results)
+
+    asyncio.run(run())
+
+
+def test_open_circuit_fails_run_fast(guard, monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(502)
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    flow = [{"name": "checkin", "method": "POST", "url": "https://up.example.com/api/checkin"}]
+
+    async def run():
+        engine = FlowEngine()
+        for _ in range(3):
+            assert (await engine.execute_flow(None, flow, {})).status == 'FAILED'
+        return await engine.execute_flow(None, flow, {})
+
+    result = asyncio.run(run())
+    assert result.status == 'CIRCUIT_OPEN'
+    assert 0 < result.retry_after <= 0.2
+    assert len(requests) == 3
+    assert guard.stats()["up.example.com"]["state"] == OPEN
+
+
+def test_scheduler_retries_circuit_open_runs(temp_db, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "scheduler_backend", "heap")
+    monkeypatch.setattr(settings, "circuit_retry_max", 2)
+    rescheduled = []
+
+    async def submit(site_id, trigger='manual'):
+        return {'status': 'success', 'run_status': 'CIRCUIT_OPEN', 'retry_after': 30}
+
+    async def reschedule(site_id):
+        rescheduled.append(site_id)
+
+    monkeypatch.setattr(scheduler_module.dispatcher, "submit", submit)
+
+    async def run():
+        scheduler = Scheduler()
+        monkeypatch.setattr(scheduler, "_reschedule_site", reschedule)
+        site_id = uuid4()
+
+        await scheduler._run_site_job(site_id)
+        assert 30 < scheduler.timer.next_run(site_id) - time.time() <= 32
+        await scheduler._run_site_job(site_id)
+        assert rescheduled == []
+        # 超过重试次数后恢复正常调度
+        await scheduler._run_site_job(site_id)
+        assert rescheduled == [site_id]
+
+    asyncio.run(run())
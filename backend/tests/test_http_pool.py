@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+
+from app.services.http_pool import HttpClientPool
+
+
+def _make_pool(created: list) -> HttpClientPool:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={"set-cookie": f"sid={request.url.path.strip('/')}"},
+            stream=httpx.ByteStream(b'{"ok": true}'),
+        )
+
+    def factory(key):
+        created.append(key)
+        return httpx.MockTransport(handler)
+
+    return HttpClientPool(transport_factory=factory)
+
+
+def test_transport_reused_per_host():
+    created = []
+    pool = _make_pool(created)
+
+    async def run():
+        for _ in range(3):
+            async with pool.client() as client:
+                await client.get("https://a.example.com/x")
+                await client.get("https://b.example.com/y")
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    assert [key[1] for key in created] == ["a.example.com", "b.example.com"]
+    assert stats == {"hosts": 2, "active": 0}
+
+
+def test_cookies_isolated_between_clients():
+    pool = _make_pool([])
+
+    async def run():
+        async with pool.client() as first:
+            await first.get("https://a.example.com/site1")
+            async with pool.client() as second:
+                return dict(first.cookies), dict(second.cookies)
+
+    first_cookies, second_cookies = asyncio.run(run())
+    assert first_cookies == {"sid": "site1"}
+    assert second_cookies == {}
+
+
+def test_env_proxy_goes_through_pool(monkeypatch):
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy.internal:3128")
+    monkeypatch.delenv("NO_PROXY", raising=False)
+    monkeypatch.delenv("no_proxy", raising=False)
+    created, seen = [], []
+
+    def factory(key):
+        created.append(key)
+        return httpx.MockTransport(lambda request: seen.append(str(request.url)) or httpx.Response(200))
+
+    pool = HttpClientPool(transport_factory=factory)
+
+    async def run():
+        async with pool.client() as client:
+            assert client.trust_env is False
+            response = await client.get("https://a.example.com/x")
+            return response.status_code
+
+    assert asyncio.run(run()) == 200
+    # 请求直接到达共享 transport（目标 URL 未被改写为代理），代理由连接池按 host 解析
+    assert seen == ["https://a.example.com/x"]
+    assert [key[4] for key in created] == ["http://proxy.internal:3128"]
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.core.config import get_settings
+from app.db import session as db_session
+from app.db.models import Run, Site
+from app.main import app
+
+
+def _seed():
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            sites = [Site(name=f"site-{i % 3}", flow=[{"url": "https://example.com"}]) for i in range(7)]
+            session.add_all(sites)
+            base = datetime(2026, 1, 1)
+            # 同一时间戳的多条记录，验证 id 作为游标的第二排序键
+            runs = [Run(site_id=sites[0].id, status='SUCCESS', started_at=base + timedelta(minutes=i // 2)) for i in range(9)]
+            session.add_all(runs)
+            await session.commit()
+            return sites, runs
+
+    return asyncio.run(run())
+
+
+def _walk(client, url, params, headers):
+    items, cursor, pages = [], None, 0
+    while True:
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert response.status_code == 200
+        items.extend(response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return items, pages
+
+
+def test_keyset_pagination_and_projection(temp_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "admin_token", "test-token")
+    sites, runs = _seed()
+    client = TestClient(app)
+    headers = {"Authorization": "Bearer test-token"}
+
+    listed, pages = _walk(client, "/api/sites", {"limit": 3, "fields": "summary"}, headers)
+    assert pages == 3
+    assert sorted(site["id"] for site in listed) == sorted(str(site.id) for site in sites)
+    assert [site["name"] for site in listed] == sorted(site["name"] for site in listed)
+    assert "flow" not in listed[0] and "auth" not in listed[0]
+
+    assert set(client.get("/api/sites", params={"fields": "enabled"}, headers=headers).json()[0]) == {"id", "name", "enabled"}
+    assert client.get("/api/sites", params={"fields": "bogus"}, headers=headers).status_code == 400
+    assert client.get("/api/sites", params={"cursor": "!!"}, headers=headers).status_code == 400
+
+    listed, pages = _walk(client, f"/api/sites/{sites[0].id}/runs", {"limit": 2}, headers)
+    assert pages == 5
+    assert [run["id"] for run in listed] == [
+        str(run.id) for run in sorted(runs, key=lambda run: (run.started_at, run.id.hex), reverse=True)
+    ]
+
+    body = client.get("/api/system/runs/recent", params={"limit": 4}, headers=headers).json()
+    assert len(body["runs"]) == 4 and body["nextCursor"]
+    body = client.get("/api/system/runs/recent", params={"limit": 10, "cursor": body["nextCursor"]}, headers=headers).json()
+    assert len(body["runs"]) == 5 and body["nextCursor"] is None
+
+
+def test_site_list_is_bounded_summary_by_default(temp_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "admin_token", "test-token")
+
+    async def seed():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            session.add_all(Site(name=f"site-{i:03d}", auth={"token": "x"}, flow=[{"url": "https://example.com"}]) for i in range(101))
+            await session.commit()
+
+    asyncio.run(seed())
+    client = TestClient(app)
+    headers = {"Authorization": "Bearer test-token"}
+
+    # 不传 limit / fields 的旧客户端：默认 100 条摘要，仍然拿到下一页游标
+    response = client.get("/api/sites", headers=headers)
+    page = response.json()
+    assert len(page) == 100 and response.headers["X-Next-Cursor"]
+    assert "auth" not in page[0] and "flow" not in page[0]
+
+    rest = client.get("/api/sites", params={"cursor": response.headers["X-Next-Cursor"], "fields": "all"}, headers=headers)
+    assert [site["name"] for site in rest.json()] == ["site-100"]
+    assert rest.json()[0]["auth"] == {"token": "x"} and "X-Next-Cursor" not in rest.headers
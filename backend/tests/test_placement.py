@@ -0,0 +1,87 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.core.config import get_settings
+from app.services.placement import LoadPlacer, site_host
+
+
+def _settings(monkeypatch, global_rate=60, host_rate=6):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "schedule_slot_seconds", 10)
+    monkeypatch.setattr(settings, "schedule_global_rate_per_minute", global_rate)
+    monkeypatch.setattr(settings, "schedule_host_rate_per_minute", host_rate)
+
+
+def test_placement_is_deterministic_and_within_window(monkeypatch):
+    _settings(monkeypatch)
+    window_start = datetime.now().replace(hour=8, minute=5, second=0, microsecond=0) + timedelta(days=1)
+    site_ids = sorted((uuid4() for _ in range(50)), key=str)
+
+    first, second = LoadPlacer(), LoadPlacer()
+    runs = [first.place(site_id, "api.example.com", window_start, 600) for site_id in site_ids]
+    assert runs == [second.place(site_id, "api.example.com", window_start, 600) for site_id in site_ids]
+    # 重复调度同一站点同一天得到相同时间
+    assert first.place(site_ids[0], "api.example.com", window_start, 600) == runs[0]
+    assert all(window_start <= run <= window_start + timedelta(seconds=600) for run in runs)
+
+
+def test_placement_respects_host_and_global_caps(monkeypatch):
+    _settings(monkeypatch, global_rate=60, host_rate=6)
+    window_start = datetime.now().replace(hour=8, minute=5, second=0, microsecond=0) + timedelta(days=1)
+    placer = LoadPlacer()
+
+    # 同一主机 60 个站点、10 分钟窗口：每分钟最多 6 个
+    host_runs = [placer.place(uuid4(), "a.example.com", window_start, 600) for _ in range(60)]
+    per_minute = Counter(run.replace(second=0) for run in host_runs)
+    assert max(per_minute.values()) <= 6
+
+    # 其余主机的站点继续填充，全局每 10 秒槽位不超过 10 个
+    others = [placer.place(uuid4(), f"h{i % 50}.example.com", window_start, 600) for i in range(500)]
+    per_slot = Counter(
+        (run - window_start).total_seconds() // 10 for run in host_runs + others
+    )
+    assert max(per_slot.values()) <= 10
+
+
+def test_release_frees_slot_and_site_host(monkeypatch):
+    _settings(monkeypatch, global_rate=6, host_rate=6)
+    window_start = datetime.now().replace(hour=8, minute=5, second=0, microsecond=0) + timedelta(days=1)
+    placer = LoadPlacer()
+    site_id = uuid4()
+    placer.place(site_id, "a.example.com", window_start, 0)
+    placer.release(site_id)
+    assert placer.host_of(site_id) is None
+    assert placer._slot_load == {}
+
+    site = SimpleNamespace(base_url=None, flow=[{"url": "https://API.example.com/checkin"}])
+    assert site_host(site) == "api.example.com"
+    assert site_host(SimpleNamespace(base_url="https://${host}/x", flow=None)) == ""
+
+
+def test_release_reopens_globally_full_slot_for_other_hosts(monkeypatch):
+    # 每个 10 秒槽位全局只允许 1 个，窗口包含两个槽位
+    _settings(monkeypatch, global_rate=6, host_rate=60)
+    window_start = datetime.now().replace(hour=8, minute=5, second=0, microsecond=0) + timedelta(days=1)
+    placer = LoadPlacer()
+    a_sites = [uuid4(), uuid4()]
+    a_runs = [placer.place(site_id, "a.example.com", window_start, 10) for site_id in a_sites]
+    assert len({run.replace(second=run.second // 10 * 10) for run in a_runs}) == 2
+
+    # b 主机探测时两个槽位都已满，跳表把它们标记为已满
+    placer.place(uuid4(), "b.example.com", window_start, 10)
+    slot_of = lambda site_id: placer._assignments[site_id][1]
+    freed = next(site_id for site_id in a_sites if placer._slot_load[(window_start.date(), slot_of(site_id))] == 1)
+    freed_slot = slot_of(freed)
+    placer.release(freed)
+
+    # 首选槽位不是被释放槽位的 b 站点也应探测到并复用它
+    while True:
+        site_id = uuid4()
+        candidate = LoadPlacer()
+        candidate.place(site_id, "b.example.com", window_start, 10)
+        if candidate._assignments[site_id][1] != freed_slot:
+            break
+    placer.place(site_id, "b.example.com", window_start, 10)
+    assert slot_of(site_id) == freed_slot
@@ -0,0 +1,116 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, func
+
+from app.core.config import get_settings
+from app.db import session as db_session
+from app.db.models import Site, Run, RunStep, SiteDailyStats
+from app.main import app
+from app.services.retention import run_retention
+from app.services.run_store import build_step_rows
+
+
+def test_retention_rolls_up_compacts_and_purges(temp_db, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "retention_detail_days", 7)
+    monkeypatch.setattr(settings, "retention_summary_days", 30)
+    monkeypatch.setattr(settings, "retention_batch_size", 2)
+
+    now = datetime.now()
+
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="demo")
+            session.add(site)
+            for days_ago in (60, 60, 10, 1):
+                started = now - timedelta(days=days_ago)
+                status = 'FAILED' if days_ago == 10 else 'SUCCESS'
+                run = Run(site_id=site.id, status=status, started_at=started,
+                          finished_at=started + timedelta(seconds=2))
+                session.add(run)
+                session.add_all(build_step_rows(run.id, [{'name': 's', 'status': status, 'response': 'x'}]))
+            legacy = Run(site_id=site.id, status='SUCCESS', started_at=now - timedelta(days=9),
+                         finished_at=now - timedelta(days=9), steps=[{'name': 'old'}])
+            session.add(legacy)
+            await session.commit()
+
+        stats = await run_retention()
+        again = await run_retention()
+
+        async with db_session.async_session() as session:
+            runs = (await session.execute(select(func.count(Run.id)))).scalar()
+            steps = (await session.execute(select(func.count(RunStep.id)))).scalar()
+            daily = (await session.execute(select(SiteDailyStats).order_by(SiteDailyStats.day))).scalars().all()
+            legacy_steps = (await session.execute(select(Run.steps).where(Run.id == legacy.id))).scalar()
+        return stats, again, runs, steps, daily, legacy_steps
+
+    stats, again, runs, steps, daily, legacy_steps = asyncio.run(run())
+    assert stats['purgedRuns'] == 2
+    assert stats['compactedSteps'] == 1
+    assert stats['compactedLegacyRuns'] == 1
+    assert again['rolledUpDays'] == 0 and again['purgedRuns'] == 0 and again['compactedLegacyRuns'] == 0
+    assert runs == 3
+    assert steps == 1
+    assert legacy_steps is None
+    assert [(d.total, d.success, d.failed) for d in daily] == [(2, 2, 0), (1, 0, 1), (1, 1, 0), (1, 1, 0)]
+    assert daily[0].p95_ms == 2000
+
+
+def test_status_success_rate_includes_unrolled_days(temp_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "admin_token", "test-token")
+    now = datetime.now()
+
+    async def seed():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="demo")
+            session.add(site)
+            # 三天前已汇总：1 次成功、1 次失败
+            session.add(SiteDailyStats(site_id=site.id, day=(now - timedelta(days=3)).date(), total=2, success=1, failed=1))
+            # 7 天前不在近 7 日（含今天）范围内
+            session.add(SiteDailyStats(site_id=site.id, day=(now - timedelta(days=7)).date(), total=4, success=0, failed=4))
+            # 汇总之后（今天）的运行直接统计，进行中的运行不计入
+            for status in ('SUCCESS', 'SUCCESS', 'FAILED', 'RUNNING'):
+                session.add(Run(site_id=site.id, status=status, started_at=now))
+            await session.commit()
+
+    asyncio.run(seed())
+    body = TestClient(app).get("/api/system/status", headers={"Authorization": "Bearer test-token"}).json()
+
+    assert body["runs"]["total"] == 5
+    assert body["runs"]["success"] == 3
+    assert body["runs"]["successRate"] == 0.6
+
+
+def test_new_database_uses_incremental_auto_vacuum(temp_db):
+    async def run():
+        await db_session.init_db()
+        await db_session.init_db()
+        async with temp_db.connect() as conn:
+            mode = (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar()
+            journal = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+            tables = (await conn.exec_driver_sql("SELECT count(*) FROM sqlite_master WHERE type = 'table'")).scalar()
+        return mode, journal, tables
+
+    mode, journal, tables = asyncio.run(run())
+    # 2 = INCREMENTAL；连接钩子仍然启用 WAL
+    assert mode == 2 and journal == "wal" and tables > 0
+
+
+def test_existing_database_keeps_auto_vacuum_mode(tmp_path, monkeypatch):
+    path = tmp_path / "existing.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+    engine = db_session.build_engine(f"sqlite+aiosqlite:///{path}")
+    monkeypatch.setattr(db_session, "engine", engine)
+
+    asyncio.run(db_session.init_db())
+
+    # 已有数据的库不在启动时整库 VACUUM
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone() == (0,)
+        assert conn.execute("SELECT count(*) FROM sqlite_master WHERE name = 'sites'").fetchone() == (1,)
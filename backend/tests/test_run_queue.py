@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from app.core.config import get_settings
+from app.db import session as db_session
+from app.db.models import Site, RunQueueItem
+from app.services import run_queue
+
+
+def test_claim_lease_and_requeue(temp_db):
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="demo")
+            session.add(site)
+            await session.commit()
+
+        scheduled_id = await run_queue.enqueue(site.id, trigger='scheduled', priority=10)
+        manual_id = await run_queue.enqueue(site.id, trigger='manual', priority=0)
+
+        # 高优先级先被领取，同一行不会被两个 owner 领到
+        first = await run_queue.claim("worker-a", lease_seconds=-1)
+        second = await run_queue.claim("worker-b", lease_seconds=60)
+        third = await run_queue.claim("worker-c", lease_seconds=60)
+
+        # worker-a 的租约已过期，应被放回队列并可再次领取
+        requeued = await run_queue.requeue_expired(max_attempts=3)
+        reclaimed = await run_queue.claim("worker-c", lease_seconds=60)
+        lost = await run_queue.heartbeat(manual_id, "worker-a", lease_seconds=60)
+
+        await run_queue.complete(manual_id, "worker-c", {'status': 'success'})
+        async with db_session.async_session() as session:
+            item = (await session.execute(select(RunQueueItem).where(RunQueueItem.id == manual_id))).scalar_one()
+
+        return scheduled_id, manual_id, first, second, third, requeued, reclaimed, lost, item
+
+    scheduled_id, manual_id, first, second, third, requeued, reclaimed, lost, item = asyncio.run(run())
+    assert first[0] == manual_id and first[2] == 'manual'
+    assert second[0] == scheduled_id
+    assert third is None
+    assert requeued == 1
+    assert reclaimed[0] == manual_id
+    assert lost is False
+    assert item.status == run_queue.QUEUE_DONE
+    assert item.attempts == 2
+
+
+def test_consumer_defers_circuit_open_and_retrying_runs(temp_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "circuit_retry_max", 2)
+    results = iter([
+        {'status': 'success', 'run_status': 'CIRCUIT_OPEN', 'retry_after': 30},
+        {'status': 'success', 'run_status': 'RETRYING', 'retry_after': 5},
+        {'status': 'success', 'run_status': 'RETRYING', 'retry_after': 5},
+    ])
+
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="demo")
+            session.add(site)
+            await session.commit()
+
+        consumer = run_queue.QueueConsumer(concurrency=1, owner="worker-a")
+
+        async def run_site(site_id, trigger='manual'):
+            return next(results)
+
+        monkeypatch.setattr(consumer.worker, "run_site", run_site)
+        item_id = await run_queue.enqueue(site.id)
+        states = []
+        for _ in range(3):
+            async with db_session.async_session() as session:
+                # 跳过 available_at，直接领取
+                await session.execute(update(RunQueueItem).values(available_at=datetime.utcnow()))
+                await session.commit()
+            claimed = await run_queue.claim("worker-a", lease_seconds=60)
+            await consumer._slots.acquire()
+            await consumer._execute(*claimed)
+            async with db_session.async_session() as session:
+                item = await session.get(RunQueueItem, item_id)
+                states.append((item.status, (item.available_at - datetime.utcnow()).total_seconds()))
+        return states
+
+    states = asyncio.run(run())
+    assert states[0][0] == run_queue.QUEUE_PENDING and 29 < states[0][1] <= 31
+    assert states[1][0] == run_queue.QUEUE_PENDING and 4 < states[1][1] <= 6
+    # 超过 circuit_retry_max 后不再重跑
+    assert states[2][0] == run_queue.QUEUE_DONE
@@ -0,0 +1,32 @@
+import asyncio
+from uuid import uuid4
+
+from app.db import session as db_session
+from app.db.models import Site, Run
+from app.services.run_store import build_step_rows, load_run_steps
+
+STEPS = [
+    {
+        'name': 'status', 'status': 'SUCCESS', 'started_at': '2026-01-01T08:05:00',
+        'status_code': 200, 'elapsed_ms': 12.5,
+        'headers': {'content-type': 'application/json'}, 'response': '{"success": true}',
+    },
+    {'name': 'spin', 'status': 'SKIPPED', 'started_at': '2026-01-01T08:05:01', 'reason': '条件不满足'},
+]
+
+
+def test_steps_round_trip(temp_db):
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="demo")
+            run = Run(site_id=site.id, status='SUCCESS')
+            session.add_all([site, run])
+            session.add_all(build_step_rows(run.id, STEPS))
+            await session.commit()
+
+            return await load_run_steps(session, run.id), await load_run_steps(session, uuid4())
+
+    loaded, missing = asyncio.run(run())
+    assert loaded == STEPS
+    assert missing == []
@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import select, func
+
+from app.db import session as db_session
+from app.db.models import Site, Run, RunStep
+from app.services.run_store import RunOutcome
+from app.services.run_writer import RunWriter
+
+
+def test_concurrent_outcomes_are_grouped_into_one_transaction(temp_db):
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="demo")
+            runs = [Run(site_id=site.id, status='RUNNING') for _ in range(20)]
+            session.add(site)
+            session.add_all(runs)
+            await session.commit()
+
+        writer = RunWriter()
+        await writer.start()
+        now = datetime.now()
+        await asyncio.gather(*[
+            writer.submit(RunOutcome(run.id, site.id, 'SUCCESS', now, 'ok', steps=[{'name': 's', 'status': 'SUCCESS'}]))
+            for run in runs
+        ])
+        await writer.stop()
+
+        async with db_session.async_session() as session:
+            statuses = (await session.execute(select(Run.status).distinct())).scalars().all()
+            steps = (await session.execute(select(func.count(RunStep.id)))).scalar()
+            last_status = (await session.execute(select(Site.last_run_status))).scalar()
+        return writer.stats(), statuses, steps, last_status
+
+    stats, statuses, steps, last_status = asyncio.run(run())
+    assert stats['batches'] == 1 and stats['written'] == 20
+    assert statuses == ['SUCCESS']
+    assert steps == 20
+    assert last_status == 'SUCCESS'
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+import app.services.scheduler as scheduler_module
+from app.core.config import get_settings
+from app.db import session as db_session
+from app.db.models import Site
+from app.services.scheduler import Scheduler
+
+
+async def _seed(**fields):
+    await db_session.init_db()
+    async with db_session.async_session() as session:
+        site = Site(name="site", base_url="https://example.com", **fields)
+        session.add(site)
+        await session.commit()
+        return site
+
+
+async def _stored_next_run(site_id):
+    async with db_session.async_session() as session:
+        result = await session.execute(select(Site.next_run_at).where(Site.id == site_id))
+        return result.scalar_one()
+
+
+def _fake_submit(monkeypatch, calls):
+    async def submit(site_id, trigger='manual'):
+        calls.append(site_id)
+        return {'status': 'success', 'run_status': 'SUCCESS'}
+
+    monkeypatch.setattr(scheduler_module.dispatcher, "submit", submit)
+
+
+def test_schedule_site_persists_next_run_at(temp_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "scheduler_backend", "heap")
+
+    async def run():
+        site = await _seed(schedule={'type': 'dailyAfter', 'hour': 8, 'minute': 5})
+        scheduler = Scheduler()
+        scheduler.schedule_site(site)
+        await scheduler._flush_next_runs()
+        stored = await _stored_next_run(site.id)
+        assert stored is not None and stored == site.next_run_at
+        assert scheduler.timer.next_run(site.id) == stored.timestamp()
+
+        site.paused = True
+        scheduler.schedule_site(site)
+        await scheduler._flush_next_runs()
+        assert await _stored_next_run(site.id) is None
+        assert len(scheduler.timer) == 0
+
+    asyncio.run(run())
+
+
+def test_restart_keeps_future_time_and_catches_up_misfires(temp_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "scheduler_backend", "heap")
+    monkeypatch.setattr(get_settings(), "scheduler_misfire_grace_seconds", 3600)
+    calls = []
+    _fake_submit(monkeypatch, calls)
+    now = datetime.now().replace(microsecond=0)
+
+    async def run():
+        schedule = {'type': 'dailyAfter', 'hour': 8, 'minute': 5}
+        future = await _seed(schedule=schedule, next_run_at=now + timedelta(minutes=3))
+        recent = await _seed(schedule=schedule, next_run_at=now - timedelta(minutes=10))
+        stale = await _seed(schedule=schedule, next_run_at=now - timedelta(days=2))
+
+        scheduler = Scheduler()
+        await scheduler._load_site_schedules()
+        # 未来时间原样保留，即使今天的窗口起点已过
+        assert scheduler.timer.next_run(future.id) == (now + timedelta(minutes=3)).timestamp()
+        # 错过太久的重新计算，不补跑
+        assert scheduler.timer.next_run(stale.id) > now.timestamp()
+
+        await asyncio.gather(*scheduler._tasks)
+        await scheduler._flush_next_runs()
+        assert calls == [recent.id]
+        assert await _stored_next_run(recent.id) > now
+        assert await _stored_next_run(stale.id) > now
+
+    asyncio.run(run())
+
+
+def test_due_queue_runs_each_due_site_once_across_processes(temp_db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "scheduler_backend", "db")
+    monkeypatch.setattr(get_settings(), "scheduler_misfire_grace_seconds", 3600)
+    calls = []
+    _fake_submit(monkeypatch, calls)
+    now = datetime.now().replace(microsecond=0)
+
+    async def run():
+        schedule = {'type': 'cron', 'cron': '0 8 * * *'}
+        due = await _seed(schedule=schedule, next_run_at=now - timedelta(seconds=30))
+        missed = await _seed(schedule=schedule, next_run_at=now - timedelta(days=1))
+        later = await _seed(schedule=schedule, next_run_at=now + timedelta(hours=1))
+
+        # 两个调度器实例模拟两个进程共享同一个数据库
+        first, second = Scheduler(), Scheduler()
+        fetched = await asyncio.gather(first.poll_due(), second.poll_due())
+        await asyncio.gather(*first._tasks, *second._tasks)
+
+        assert sum(fetched) >= 2
+        assert calls == [due.id]
+        for site in (due, missed):
+            assert await _stored_next_run(site.id) > now
+        assert await _stored_next_run(later.id) == now + timedelta(hours=1)
+        assert await first.poll_due() == 0
+
+    asyncio.run(run())
@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.db import session as db_session
+from app.db.models import Run, Secret, Site
+from app.services import flow_engine as flow_engine_module
+from app.services.flow_engine import FlowEngine
+from app.services.host_guard import HostGuard
+from app.services.http_pool import HttpClientPool
+from app.services.session_store import SiteSession
+from app.services import worker as worker_module
+from app.services.worker import Worker
+
+FLOW = [
+    {
+        "name": "login",
+        "method": "POST",
+        "url": "https://shop.example.com/api/login",
+        "skipIfSessionValid": True,
+        "extract": [{"var": "uid", "type": "json", "path": "uid"}],
+    },
+    {
+        "name": "checkin",
+        "method": "POST",
+        "url": "https://shop.example.com/api/checkin/${uid}",
+    },
+]
+
+
+def test_session_reused_across_runs(temp_db, monkeypatch):
+    server = {"sid": "secret-1", "paths": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        server["paths"].append(request.url.path)
+        if request.url.path == "/api/login":
+            return httpx.Response(200, json={"uid": 42}, headers={"set-cookie": f"sid={server['sid']}; Path=/; Max-Age=3600"})
+        if request.headers.get("cookie") != f"sid={server['sid']}":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"success": True})
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    monkeypatch.setattr(flow_engine_module, "host_guard", HostGuard())
+
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="shop", base_url="https://shop.example.com", flow=FLOW)
+            session.add(site)
+            await session.commit()
+
+        worker = Worker()
+        results = []
+        for expire in (False, False, True):
+            if expire:
+                # 服务端让会话失效：复用的 cookie 得到 401 后重新登录，不暂停站点
+                server["sid"] = "secret-2"
+            server["paths"].clear()
+            result = await worker.run_site(site.id)
+            results.append((result["run_status"], list(server["paths"])))
+
+        async with db_session.async_session() as session:
+            secrets = (await session.execute(select(Secret))).scalars().all()
+            paused = (await session.get(Site, site.id)).paused
+        return results, secrets, paused
+
+    results, secrets, paused = asyncio.run(run())
+
+    assert results[0] == ('SUCCESS', ["/api/login", "/api/checkin/42"])
+    assert results[1] == ('SUCCESS', ["/api/checkin/42"])
+    assert results[2] == ('SUCCESS', ["/api/checkin/42", "/api/login", "/api/checkin/42"])
+    assert not paused
+    # 会话加密保存，每个站点只有一行
+    assert len(secrets) == 1 and "secret-2" not in secrets[0].ciphertext
+
+
+def test_session_expiry(monkeypatch):
+    now = time.time()
+    session = SiteSession([
+        {"name": "a", "value": "1", "domain": "example.com", "domain_specified": False, "path": "/", "secure": False, "expires": int(now) - 10},
+        {"name": "b", "value": "2", "domain": "example.com", "domain_specified": False, "path": "/", "secure": False, "expires": None},
+    ])
+    assert session.valid() and [cookie["name"] for cookie in session.cookies] == ["b"]
+
+    monkeypatch.setattr(get_settings(), "session_max_age_seconds", 60)
+    assert not SiteSession(session.cookies, saved_at=now - 120).valid()
+    assert not SiteSession(saved_at=now).valid()
+
+
+def test_stale_session_is_not_replayed_after_non_idempotent_step(monkeypatch):
+    paths = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        if request.url.path == "/api/profile":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"uid": 42})
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    monkeypatch.setattr(flow_engine_module, "host_guard", HostGuard())
+    flow = FLOW + [{"name": "profile", "method": "GET", "url": "https://shop.example.com/api/profile"}]
+    session = SiteSession(variables={"uid": 42})
+
+    result = asyncio.run(FlowEngine().execute_flow(None, flow, {}, session=session))
+
+    # checkin（POST）已经发出，不能整体重跑：直接报告认证失败并丢弃会话
+    assert result.status == 'FAILED' and result.auth_failed
+    assert paths == ["/api/checkin/42", "/api/profile"]
+    assert result.session is None
+
+
+def test_session_load_failure_leaves_no_running_row(temp_db, monkeypatch):
+    async def broken(db, site_id):
+        raise RuntimeError("secrets table unavailable")
+
+    monkeypatch.setattr(worker_module, "load_session", broken)
+
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="shop", flow=FLOW)
+            session.add(site)
+            await session.commit()
+        with pytest.raises(RuntimeError):
+            await Worker().run_site(site.id)
+        async with db_session.async_session() as session:
+            return (await session.execute(select(Run))).scalars().all()
+
+    assert asyncio.run(run()) == []
+
+
+def test_session_save_failure_keeps_successful_run(temp_db, monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"uid": 42}, headers={"set-cookie": "sid=secret-1; Path=/; Max-Age=3600"})
+
+    async def broken(site_id, session, previous=None):
+        raise RuntimeError("secrets table unavailable")
+
+    pool = HttpClientPool(transport_factory=lambda key: httpx.MockTransport(handler))
+    monkeypatch.setattr(flow_engine_module, "http_pool", pool)
+    monkeypatch.setattr(flow_engine_module, "host_guard", HostGuard())
+    monkeypatch.setattr(worker_module, "save_session", broken)
+
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            site = Site(name="shop", base_url="https://shop.example.com", flow=FLOW)
+            session.add(site)
+            await session.commit()
+        result = await Worker().run_site(site.id)
+        async with db_session.async_session() as session:
+            runs = (await session.execute(select(Run))).scalars().all()
+        return result, runs
+
+    result, runs = asyncio.run(run())
+    # 会话保存失败不会把已写入的 SUCCESS 改写为 FAILED
+    assert result["status"] == "success" and result["run_status"] == "SUCCESS"
+    assert [run.status for run in runs] == ["SUCCESS"]
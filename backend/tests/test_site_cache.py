@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import app.api.routers.system as system_router
+from app.db import session as db_session
+from app.db.models import Site
+from app.main import app
+from app.services.site_cache import SiteMetaCache, site_cache
+from app.core.config import get_settings
+
+
+def test_get_names_bulk_and_cached(temp_db):
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            sites = [Site(name=f"site-{i}") for i in range(1200)]
+            session.add_all(sites)
+            await session.commit()
+
+            cache = SiteMetaCache()
+            ids = [site.id for site in sites] + [uuid4()]
+            names = await cache.get_names(session, ids)
+            assert names[sites[0].id] == "site-0"
+            assert names[ids[-1]] is None
+
+            cache.put(sites[1].id, "renamed")
+            names = await cache.get_names(session, [sites[1].id])
+            assert names[sites[1].id] == "renamed"
+
+    asyncio.run(run())
+
+
+def test_system_jobs_paginates_10k_jobs(temp_db, monkeypatch):
+    now = datetime.now().astimezone()
+    sites = [Site(name=f"site-{i:05d}") for i in range(10000)]
+    jobs = [(site.id, f"site_{site.id}", now + timedelta(seconds=i)) for i, site in enumerate(sites)]
+    monkeypatch.setattr(system_router.scheduler, "list_site_jobs", lambda: list(jobs))
+    monkeypatch.setattr(get_settings(), "admin_token", "test-token")
+    site_cache.clear()
+
+    async def seed():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            session.add_all(sites)
+            await session.commit()
+
+    asyncio.run(seed())
+
+    statements = []
+    event.listen(temp_db.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    client = TestClient(app)
+    headers = {"Authorization": "Bearer test-token"}
+
+    # 冷缓存：一页只需一次批量查询名称，与任务总数无关
+    response = client.get("/api/system/jobs", params={"offset": 100, "limit": 50}, headers=headers)
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == 10000
+    assert [job["siteName"] for job in body["jobs"][:2]] == ["site-00100", "site-00101"]
+    assert len(statements) == 1
+
+    # 已缓存的页面不再访问数据库
+    statements.clear()
+    body = client.get("/api/system/jobs", params={"offset": 100, "limit": 50}, headers=headers).json()
+    assert len(body["jobs"]) == 50 and statements == []
+
+    body = client.get("/api/system/jobs", params={"q": "SITE-0999"}, headers=headers).json()
+    assert body["total"] == 10
+    site_cache.clear()
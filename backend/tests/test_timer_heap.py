@@ -0,0 +1,45 @@
+import asyncio
+import time
+from uuid import uuid4
+
+from app.services.timer_heap import TimerHeap
+
+
+def test_reschedule_and_unschedule_fire_only_latest_entries():
+    async def run():
+        fired = []
+
+        async def callback(site_id):
+            fired.append(site_id)
+
+        timer = TimerHeap(callback)
+        await timer.start()
+        a, b, c = uuid4(), uuid4(), uuid4()
+        now = time.time()
+
+        timer.schedule(a, now + 60)
+        timer.schedule(b, now + 0.05)
+        timer.schedule(c, now + 0.1)
+        # 重新调度到更早：需要唤醒循环；取消 c
+        timer.schedule(a, now + 0.02)
+        timer.unschedule(c)
+        assert len(timer) == 2
+
+        await asyncio.sleep(0.3)
+        await timer.stop()
+        return fired, timer, (a, b, c)
+
+    fired, timer, (a, b, c) = asyncio.run(run())
+    assert fired == [a, b]
+    assert len(timer) == 0 and timer.next_run(c) is None
+
+
+def test_compaction_keeps_only_live_entries():
+    timer = TimerHeap(None)
+    site_ids = [uuid4() for _ in range(100)]
+    for round_ in range(30):
+        for i, site_id in enumerate(site_ids):
+            timer.schedule(site_id, 1000 + round_ * 100 + i)
+    assert len(timer) == 100
+    assert len(timer._heap) <= 2 * 100 + 1024
+    assert timer._pop_due(1000 + 29 * 100 + 99) == site_ids
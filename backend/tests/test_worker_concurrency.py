@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import event, select
+
+from app.core.config import get_settings
+from app.db import session as db_session
+from app.db.models import Site, Run
+from app.services import flow_engine as flow_engine_module
+from app.services.http_pool import HttpClientPool
+from app.services.worker import Worker
+
+PARALLEL_RUNS = 40
+
+
+def test_no_db_connection_held_during_network_io(temp_db, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "http_pool_max_connections_per_host", PARALLEL_RUNS)
+    monkeypatch.setattr(flow_engine_module, "http_pool", HttpClientPool())
+
+    pool = temp_db.sync_engine.pool
+    # 所有运行都进入网络请求阶段后才放行，此时采样连接池占用
+    barrier = threading.Barrier(PARALLEL_RUNS, timeout=15)
+    samples = []
+    peak = {"current": 0, "max": 0}
+
+    def on_checkout(*args):
+        peak["current"] += 1
+        peak["max"] = max(peak["max"], peak["current"])
+
+    def on_checkin(*args):
+        peak["current"] -= 1
+
+    event.listen(temp_db.sync_engine, "checkout", on_checkout)
+    event.listen(temp_db.sync_engine, "checkin", on_checkin)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            barrier.wait()
+            samples.append(pool.checkedout())
+            body = json.dumps({"success": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/checkin"
+
+    async def run():
+        await db_session.init_db()
+        async with db_session.async_session() as session:
+            sites = [
+                Site(name=f"site-{i}", flow=[{
+                    "name": "checkin", "method": "GET", "url": url,
+                    "expect": {"type": "json", "path": "success", "equals": True},
+                }])
+                for i in range(PARALLEL_RUNS)
+            ]
+            session.add_all(sites)
+            await session.commit()
+
+        worker = Worker()
+        results = await asyncio.gather(*[worker.run_site(site.id) for site in sites])
+
+        async with db_session.async_session() as session:
+            statuses = (await session.execute(select(Run.status))).scalars().all()
+        return results, statuses
+
+    try:
+        results, statuses = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert [r['run_status'] for r in results] == ['SUCCESS'] * PARALLEL_RUNS
+    assert statuses == ['SUCCESS'] * PARALLEL_RUNS
+    # 网络 I/O 期间不占用任何数据库连接
+    assert samples == [0] * PARALLEL_RUNS
+    # 并发远高于连接池容量时，连接占用仍受池大小约束
+    assert peak["max"] <= pool.size() + pool._max_overflow
@@ -16,7 +16,8 @@ client.interceptors.request.use((config) => {
 })
 
 client.interceptors.response.use(
-    (response) => response.data,
+    // rawResponse: true 时返回完整响应（需要读取 X-Next-Cursor 等响应头）
+    (response) => (response.config.rawResponse ? response : response.data),
     (error) => {
         const msg = error.response?.data?.detail || error.message
         message.error(`请求失败: ${msg}`)
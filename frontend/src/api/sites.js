@@ -1,6 +1,19 @@
 import client from './client'
 
-export const getSites = () => client.get('/sites')
+// 按 X-Next-Cursor 逐页读取全部站点（每页 500 条）
+export const getSites = async () => {
+    const sites = []
+    let cursor
+    do {
+        const response = await client.get('/sites', {
+            params: { fields: 'summary', limit: 500, ...(cursor ? { cursor } : {}) },
+            rawResponse: true,
+        })
+        sites.push(...response.data)
+        cursor = response.headers['x-next-cursor']
+    } while (cursor)
+    return sites
+}
 
 export const getSite = (id) => client.get(`/sites/${id}`)
 
@@ -2,7 +2,7 @@ import client from './client'
 
 export const getSystemStatus = () => client.get('/system/status')
 
-export const getScheduledJobs = () => client.get('/system/jobs')
+export const getScheduledJobs = (offset = 0, limit = 100) => client.get('/system/jobs', { params: { offset, limit } })
 
 export const getRecentRuns = (limit = 10) => client.get(`/system/runs/recent?limit=${limit}`)
 
@@ -16,10 +16,11 @@ export default function Settings() {
         queryFn: getSystemStatus,
     })
 
-    // 调度任务
+    // 调度任务（服务端分页）
+    const [jobsPage, setJobsPage] = useState({ current: 1, pageSize: 100 })
     const { data: jobs, isLoading: jobsLoading, refetch: refetchJobs } = useQuery({
-        queryKey: ['scheduled-jobs'],
-        queryFn: getScheduledJobs,
+        queryKey: ['scheduled-jobs', jobsPage.current, jobsPage.pageSize],
+        queryFn: () => getScheduledJobs((jobsPage.current - 1) * jobsPage.pageSize, jobsPage.pageSize),
     })
 
     // 最近执行
@@ -155,6 +156,16 @@ export default function Settings() {
                                         value={`${status.sites?.enabled || 0} / ${status.sites?.paused || 0}`}
                                     />
                                 </Col>
+                                <Col span={6} style={{ marginTop: 16 }}>
+                                    <Statistic
+                                        title={`近 ${status.runs?.days || 7} 日成功率`}
+                                        value={status.runs?.successRate != null ? (status.runs.successRate * 100).toFixed(1) : '-'}
+                                        suffix={status.runs?.successRate != null ? '%' : undefined}
+                                    />
+                                </Col>
+                                <Col span={6} style={{ marginTop: 16 }}>
+                                    <Statistic title={`近 ${status.runs?.days || 7} 日运行数`} value={status.runs?.total || 0} />
+                                </Col>
                             </Row>
                         )}
                     </Card>
@@ -167,7 +178,13 @@ export default function Settings() {
                             dataSource={jobs?.jobs || []}
                             columns={jobColumns}
                             rowKey="id"
-                            pagination={false}
+                            pagination={{
+                                current: jobsPage.current,
+                                pageSize: jobsPage.pageSize,
+                                total: jobs?.total || 0,
+                                showTotal: (total) => `共 ${total} 个任务`,
+                                onChange: (current, pageSize) => setJobsPage({ current, pageSize }),
+                            }}
                             loading={jobsLoading}
                             size="small"
                         />